@@ -0,0 +1,46 @@
+'''Per-PDU cost of the crypto used by network layer.
+
+Run from the repository root: PYTHONPATH=. python benchmarks/bench_crypto.py'''
+from bluebees.common.crypto import Crypto
+from Crypto.Cipher import AES
+from Crypto.Hash import CMAC
+from Crypto.Random import get_random_bytes
+import timeit
+
+
+def uncached_e(key: bytes, plaintext: bytes):
+    return AES.new(key, mode=AES.MODE_ECB).encrypt(plaintext)[0:6]
+
+
+def uncached_cmac(key: bytes, text: bytes):
+    cobj = CMAC.new(key=key, ciphermod=AES)
+    cobj.update(text)
+    return cobj.digest()
+
+
+def bench(name: str, func, number=20000):
+    seconds = timeit.timeit(func, number=number)
+    print(f'{name:<32} {seconds / number * 1e6:8.2f} us/op '
+          f'{number / seconds:10.0f} op/s')
+
+
+if __name__ == '__main__':
+    crypto = Crypto()
+    privacy_key = get_random_bytes(16)
+    encryption_key = get_random_bytes(16)
+    privacy_plaintext = get_random_bytes(16)
+    nonce = get_random_bytes(13)
+    transport_pdu = get_random_bytes(18)
+
+    bench('e (PECB), new cipher', lambda: uncached_e(privacy_key,
+                                                     privacy_plaintext))
+    bench('e (PECB), cached cipher', lambda: crypto.e(privacy_key,
+                                                      privacy_plaintext))
+    bench('aes_cmac, new cmac', lambda: uncached_cmac(encryption_key,
+                                                      transport_pdu))
+    bench('aes_cmac, cached cmac', lambda: crypto.aes_cmac(encryption_key,
+                                                           transport_pdu))
+    # ! CCM objects can't be reused, they are bound to the nonce
+    bench('aes_ccm_complete', lambda: crypto.aes_ccm_complete(
+        key=encryption_key, nonce=nonce, text=transport_pdu, adata=b'',
+        mic_size=4))
@@ -0,0 +1,22 @@
+'''Cost of key generation and ECDH of each EC backend available.
+
+Run from the repository root: PYTHONPATH=. python benchmarks/bench_ec.py'''
+from bluebees.common.ec import backends
+import timeit
+
+
+def bench(name: str, func, number=50):
+    seconds = timeit.timeit(func, number=number)
+    print(f'{name:<32} {seconds / number * 1e3:8.2f} ms/op '
+          f'{number / seconds:10.0f} op/s')
+
+
+if __name__ == '__main__':
+    for backend_cls in [b for b in backends if b.available()]:
+        backend = backend_cls()
+        peer_key_pair = backend.generate()
+        key_pair = backend.generate()
+
+        bench(f'{backend.name} generate', backend.generate)
+        bench(f'{backend.name} ecdh', lambda: backend.ecdh(
+            key_pair.private_key, peer_key_pair.public_key))
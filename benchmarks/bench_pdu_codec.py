@@ -0,0 +1,64 @@
+'''Throughput of the network PDU framing, without crypto.
+
+Run from the repository root: PYTHONPATH=. python benchmarks/bench_pdu_codec.py'''
+from bluebees.client.mesh_layers.pdu_codec import xor, pack_net_header, \
+    unpack_net_header, net_nonce, privacy_plaintext, pack_network_pdu
+from Crypto.Random import get_random_bytes
+import timeit
+
+
+IV_INDEX = bytes.fromhex('12345678')
+SRC = b'\x00\x01'
+
+
+def concat_xor(a: bytes, b: bytes):
+    c = b''
+    for x in range(len(a)):
+        c += int(a[x] ^ b[x]).to_bytes(1, 'big')
+    return c
+
+
+def concat_frame(seq: int, pecb: bytes, enc_dst: bytes, enc_pdu: bytes,
+                 net_mic: bytes):
+    ctl, ttl = 0x00, 0x02
+    nonce = b'\x00' + (ctl | ttl).to_bytes(1, 'big') + \
+        seq.to_bytes(3, 'big') + SRC + b'\x00\x00' + IV_INDEX
+    plaintext = b'\x00\x00\x00\x00\x00' + IV_INDEX + \
+        (enc_dst + enc_pdu + net_mic)[0:7]
+    obfuscated = concat_xor((ctl | ttl).to_bytes(1, 'big') +
+                            seq.to_bytes(3, 'big') + SRC, pecb)
+    pdu = (0x68).to_bytes(1, 'big') + obfuscated + enc_dst + enc_pdu + \
+        net_mic
+    clean = concat_xor(pdu[1:7], pecb)
+    return nonce, plaintext, pdu, int.from_bytes(clean[1:4], 'big')
+
+
+def codec_frame(seq: int, pecb: bytes, enc_dst: bytes, enc_pdu: bytes,
+                net_mic: bytes):
+    nonce = net_nonce(False, 2, seq, SRC, IV_INDEX)
+    plaintext = privacy_plaintext(IV_INDEX,
+                                  (enc_dst + enc_pdu + net_mic)[0:7])
+    obfuscated = xor(pack_net_header(False, 2, seq, SRC), pecb)
+    pdu = pack_network_pdu(0, 0x68, obfuscated, enc_dst, enc_pdu, net_mic)
+    clean = xor(pdu[1:7], pecb)
+    return nonce, plaintext, pdu, unpack_net_header(clean)[2]
+
+
+def bench(name: str, func, number=50000):
+    seconds = timeit.timeit(func, number=number)
+    print(f'{name:<24} {number / seconds:10.0f} PDUs/s')
+
+
+if __name__ == '__main__':
+    pecb = get_random_bytes(6)
+    enc_dst = get_random_bytes(2)
+    enc_pdu = get_random_bytes(12)
+    net_mic = get_random_bytes(4)
+
+    assert concat_frame(7, pecb, enc_dst, enc_pdu, net_mic)[2] == \
+        codec_frame(7, pecb, enc_dst, enc_pdu, net_mic)[2]
+
+    bench('bytes concatenation', lambda: concat_frame(7, pecb, enc_dst,
+                                                      enc_pdu, net_mic))
+    bench('pdu_codec', lambda: codec_frame(7, pecb, enc_dst, enc_pdu,
+                                           net_mic))
@@ -2,7 +2,8 @@ from dataclasses import dataclass
 from bluebees.common.serializable import Serializable
 from typing import List
 from bluebees.client.data_paths import base_dir, app_dir
-from bluebees.common.file import file_helper
+from bluebees.common.storage import storage
+from bluebees.common.crypto import crypto
 
 
 @dataclass
@@ -27,9 +28,13 @@ class ApplicationData(Serializable):
                f'Key Index: {self.key_index.hex()}\nNetwork: {self.network}\n'\
                f'Nodes: {self.nodes}'
 
+    def index_columns(self) -> dict:
+        aid = crypto.k4(n=self.key)[0] & 0x3f
+        return {'name': self.name, 'aid': aid, 'key_index': self.key_index}
+
 
 def app_name_list() -> list:
-    filenames = file_helper.list_files(base_dir + app_dir)
+    filenames = storage.list_files(base_dir + app_dir)
     if not filenames:
         return False
 
@@ -42,24 +47,8 @@ def app_name_list() -> list:
 
 
 def app_key_list() -> list:
-    filenames = file_helper.list_files(base_dir + app_dir)
-    if not filenames:
-        return []
-
-    appkeys = []
-    for file in filenames:
-        app = ApplicationData.load(base_dir + app_dir + file)
-        appkeys.append(app.key)
-    return appkeys
+    return [app.key for app in ApplicationData.load_all(base_dir + app_dir)]
 
 
 def app_key_index_list() -> list:
-    filenames = file_helper.list_files(base_dir + app_dir)
-    if not filenames:
-        return []
-
-    app_key_indexes = []
-    for file in filenames:
-        app = ApplicationData.load(base_dir + app_dir + file)
-        app_key_indexes.append(app.key_index)
-    return app_key_indexes
+    return ApplicationData.values(base_dir + app_dir, 'key_index')
@@ -5,6 +5,7 @@ from bluebees.client.application.application_data import ApplicationData, \
 from bluebees.client.network.network_data import NetworkData, net_name_list
 from bluebees.client.data_paths import base_dir, net_dir
 from bluebees.common.file import file_helper
+from bluebees.common.storage import storage
 from bluebees.common.template import template_helper
 from bluebees.common.utils import check_hex_string
 from random import randint
@@ -116,12 +117,13 @@ def parse_template(ctx, param, value):
     app_data = ApplicationData(name=name, key=key,
                                key_index=bytes.fromhex(key_index),
                                network=network)
-    app_data.save()
+    with storage.transaction():
+        app_data.save()
 
-    net_data = NetworkData.load(base_dir + net_dir + network + '.yml')
-    if app_data.name not in net_data.apps:
-        net_data.apps.append(app_data.name)
-    net_data.save()
+        net_data = NetworkData.load(base_dir + net_dir + network + '.yml')
+        if app_data.name not in net_data.apps:
+            net_data.apps.append(app_data.name)
+        net_data.save()
 
     if name_is_seq:
         template_helper.update_sequence(template, 'name')
@@ -161,12 +163,13 @@ def new(name, network, key, template):
     app_data = ApplicationData(name=name, key=key,
                                key_index=bytes.fromhex(key_index),
                                network=network)
-    app_data.save()
+    with storage.transaction():
+        app_data.save()
 
-    net_data = NetworkData.load(base_dir + net_dir + network + '.yml')
-    if app_data.name not in net_data.apps:
-        net_data.apps.append(app_data.name)
-    net_data.save()
+        net_data = NetworkData.load(base_dir + net_dir + network + '.yml')
+        if app_data.name not in net_data.apps:
+            net_data.apps.append(app_data.name)
+        net_data.save()
 
     click.echo(click.style('A new application was created', fg='green'))
     click.echo(click.style(str(app_data), fg='green'))
@@ -0,0 +1,36 @@
+import click
+import warnings
+import asyncio
+from bluebees.client.core.daemon import Daemon, daemon_url
+from zmq import ZMQError
+
+
+@click.command()
+@click.option('--url', '-u', type=str, default=daemon_url,
+              help='The address used by the commands to talk with daemon',
+              show_default=True)
+def daemon(url):
+    '''Run a resident client. The node commands (send, req and add_appkey)
+    use this client, when it's running, instead of starting a new one'''
+
+    loop = asyncio.get_event_loop()
+
+    click.echo(click.style(f'Daemon address: {url}', fg='yellow'))
+    click.echo('Running daemon... (the core must be running)')
+    try:
+        warnings.simplefilter('ignore')
+        bluebees_daemon = Daemon(url=url)
+        loop.run_until_complete(bluebees_daemon.element.spwan_tasks(loop))
+        bluebees_daemon.publish()
+        loop.run_forever()
+    except KeyboardInterrupt:
+        bluebees_daemon.disconnect()
+    except ZMQError:
+        click.echo(click.style(f'Address {url} not available', fg='red'))
+    except RuntimeError:
+        pass
+    finally:
+        for t in asyncio.Task.all_tasks():
+            t.cancel()
+        loop.stop()
+        click.echo('Stop daemon')
@@ -15,7 +15,16 @@ from asyncserial import Serial
               help='The serial port of dongle', show_default=True)
 @click.option('--search-dongle', '-s', is_flag=True,
               help='Search automatically the dongle serial port')
-def run(baudrate, port, search_dongle):
+@click.option('--window', '-w', type=click.IntRange(min=1), default=4,
+              help='Maximum number of frames waiting the dongle echo',
+              show_default=True)
+@click.option('--echo-timeout', type=float, default=1.0,
+              help='Time, in seconds, waiting the echo of a frame',
+              show_default=True)
+@click.option('--frame-interval', type=float, default=0.0,
+              help='Minimum time, in seconds, between two frames',
+              show_default=True)
+def run(baudrate, port, search_dongle, window, echo_timeout, frame_interval):
     '''Run the main features of bluebees. This features are:
          - Dongle Communication
          - Internal Broker'''
@@ -38,7 +47,9 @@ def run(baudrate, port, search_dongle):
     try:
         warnings.simplefilter('ignore')
         broker = Broker(loop=loop)
-        dongle = Dongle(loop=loop, serial_port=port, baudrate=baudrate)
+        dongle = Dongle(loop=loop, serial_port=port, baudrate=baudrate,
+                        window=window, echo_timeout=echo_timeout,
+                        frame_interval=frame_interval)
         asyncio.gather(dongle.spwan_tasks(loop), broker.tasks())
         loop.run_forever()
     except KeyboardInterrupt:
@@ -0,0 +1,54 @@
+from bluebees.client.network.network_data import NetworkData
+from bluebees.client.application.application_data import ApplicationData
+from bluebees.client.node.node_data import NodeData
+from bluebees.client.node.group_data import GroupData
+from bluebees.client.data_paths import base_dir, net_dir, app_dir, node_dir, \
+                                       group_dir, db_file
+from bluebees.common.storage import YamlStorage, SqliteStorage
+from bluebees.common.file import file_helper
+from dataclasses import asdict
+import click
+
+data_classes = {
+    net_dir: NetworkData,
+    app_dir: ApplicationData,
+    node_dir: NodeData,
+    group_dir: GroupData
+}
+
+
+def migrate(src, dst, base=base_dir) -> int:
+    '''Copy the networks, applications, nodes and groups of src storage to dst
+    storage. Returns the number of records copied'''
+    count = 0
+    with dst.transaction():
+        for dirname, cls in data_classes.items():
+            for filename, content in src.read_all(base + dirname).items():
+                data = cls(**content)
+                dst.write(base + dirname + filename, asdict(data),
+                          data.index_columns)
+                count += 1
+    return count
+
+
+@click.command()
+@click.argument('action', type=click.Choice(['import', 'export']))
+def storage(action):
+    '''Import the YAML files to a single SQLite file or export the SQLite file
+    to YAML files. The SQLite file is used while it exists'''
+
+    if action == 'import':
+        count = migrate(YamlStorage(), SqliteStorage(base_dir + db_file))
+        click.echo(click.style(f'{count} records imported to '
+                               f'{base_dir + db_file}', fg='green'))
+        click.echo(click.style('The YAML files are not used anymore. Restart '
+                               'the daemon, if it is running', fg='yellow'))
+    else:
+        if not file_helper.file_exist(base_dir + db_file):
+            raise click.BadParameter(f'File "{base_dir + db_file}" not found')
+
+        count = migrate(SqliteStorage(base_dir + db_file), YamlStorage())
+        click.echo(click.style(f'{count} records exported to {base_dir}',
+                               fg='green'))
+        click.echo(click.style(f'Remove {base_dir + db_file} to use the YAML '
+                               f'files', fg='yellow'))
@@ -1,5 +1,7 @@
 import click
 from bluebees.client.core.commands.run import run
+from bluebees.client.core.commands.daemon import daemon
+from bluebees.client.core.commands.storage import storage
 
 
 @click.group()
@@ -9,3 +11,5 @@ def core():
 
 
 core.add_command(run)
+core.add_command(daemon)
+core.add_command(storage)
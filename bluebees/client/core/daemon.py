@@ -0,0 +1,182 @@
+from bluebees.client.mesh_layers.mesh_context import SoftContext
+from bluebees.client.data_paths import base_dir, config_dir
+from bluebees.common.file import file_helper
+from bluebees.common.logging import log_sys, INFO
+from dataclasses import asdict
+import zmq
+import zmq.asyncio
+import asyncio
+import json
+import os
+
+
+daemon_filename = base_dir + config_dir + 'daemon.yml'
+daemon_url = 'tcp://127.0.0.1:9510'
+
+
+class DaemonTimeout(Exception):
+    pass
+
+
+class DaemonError(Exception):
+    pass
+
+
+def ctx_to_dict(ctx: SoftContext) -> dict:
+    content = asdict(ctx)
+    content['src_addr'] = ctx.src_addr.hex()
+    content['dst_addr'] = ctx.dst_addr.hex()
+    return content
+
+
+def ctx_from_dict(content: dict) -> SoftContext:
+    content = dict(content)
+    content['src_addr'] = bytes.fromhex(content['src_addr'])
+    content['dst_addr'] = bytes.fromhex(content['dst_addr'])
+    return SoftContext(**content)
+
+
+# ! Keeps an Element (and so the keyrings and the SEQ blocks) alive between
+# !   CLI commands. The commands talk with the daemon using JSON messages
+# !   over a zmq socket, the bytes fields are sent as hex strings
+class Daemon:
+
+    def __init__(self, url=daemon_url):
+        self.log = log_sys.get_logger('daemon')
+        self.log.set_level(INFO)
+
+        # * imported here, so the commands calling the daemon don't import
+        # *   the mesh layers
+        from bluebees.client.mesh_layers.element import Element
+
+        self.url = url
+        self.element = Element()
+
+        self.ctx = zmq.asyncio.Context.instance()
+        self.rpc_sock = self.ctx.socket(zmq.ROUTER)
+        self.rpc_sock.bind(self.url)
+
+        self.methods = {
+            'ping': self._ping,
+            'send': self._send,
+            'request': self._request
+        }
+
+        self.element.all_tasks += [self._rpc_task()]
+
+    def publish(self):
+        file_helper.write(daemon_filename, {'url': self.url,
+                                            'pid': os.getpid()})
+
+    def unpublish(self):
+        content = file_helper.read(daemon_filename)
+        if content and content['pid'] == os.getpid():
+            os.remove(daemon_filename)
+
+    def disconnect(self):
+        self.unpublish()
+        self.rpc_sock.close()
+        self.element.disconnect()
+
+    async def _ping(self, params: dict) -> dict:
+        return {'pid': os.getpid()}
+
+    async def _send(self, params: dict) -> dict:
+        success = await self.element.send_message(
+            opcode=bytes.fromhex(params['opcode']),
+            parameters=bytes.fromhex(params['parameters']),
+            ctx=ctx_from_dict(params['ctx']))
+        return {'success': success}
+
+    async def _request(self, params: dict) -> dict:
+        content = await self.element.request(
+            opcode=bytes.fromhex(params['opcode']),
+            parameters=bytes.fromhex(params['parameters']),
+            r_opcode=bytes.fromhex(params['r_opcode']),
+            ctx=ctx_from_dict(params['ctx']),
+            segment_timeout=params['segment_timeout'],
+            timeout=params['timeout'])
+        return {'content': content.hex() if content is not None else None}
+
+    async def _handle(self, identity: bytes, data: bytes):
+        try:
+            call = json.loads(data)
+            result = await self.methods[call['method']](call['params'])
+        except Exception as e:
+            self.log.error(f'RPC call failed [{e}]')
+            result = {'error': str(e)}
+
+        await self.rpc_sock.send_multipart([identity, b'',
+                                            json.dumps(result).encode()])
+
+    async def _rpc_task(self):
+        while True:
+            [identity, _, data] = await self.rpc_sock.recv_multipart()
+
+            # * each call runs in its own task, so a slow request doesn't
+            # *   block the other commands
+            asyncio.ensure_future(self._handle(identity, data))
+
+
+def _call(url: str, method: str, params: dict, timeout: float) -> dict:
+    ctx = zmq.Context.instance()
+    sock = ctx.socket(zmq.REQ)
+    sock.setsockopt(zmq.LINGER, 0)
+    sock.connect(url)
+
+    try:
+        sock.send(json.dumps({'method': method, 'params': params}).encode())
+        if not sock.poll(int(timeout * 1000)):
+            raise DaemonTimeout
+        return json.loads(sock.recv())
+    finally:
+        sock.close()
+
+
+def _pid_alive(pid: int) -> bool:
+    # * signal 0 only checks the process. On Windows, os.kill terminates the
+    # *   process, so the ping is used instead
+    if os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _remove_stale_file(content: dict):
+    # a new daemon could have rewritten the file meanwhile
+    if file_helper.read(daemon_filename) != content:
+        return
+    try:
+        os.remove(daemon_filename)
+    except FileNotFoundError:
+        pass
+
+
+def daemon_call(method: str, params: dict, timeout: float) -> dict:
+    '''Call a method of the running daemon. Returns None if the daemon is not
+    running, so the caller can run the command itself.'''
+
+    content = file_helper.read(daemon_filename)
+    if not content:
+        return None
+
+    # ! the daemon file is left behind when the daemon is killed, so it's
+    # !   removed when the daemon process is dead or doesn't answer the ping
+    if not _pid_alive(content['pid']):
+        _remove_stale_file(content)
+        return None
+    try:
+        _call(content['url'], 'ping', {}, timeout=.5)
+    except DaemonTimeout:
+        _remove_stale_file(content)
+        return None
+
+    result = _call(content['url'], method, params, timeout)
+    if 'error' in result:
+        raise DaemonError(result['error'])
+    return result
@@ -3,10 +3,13 @@ import base64 as b64
 from asyncserial import Serial
 from dataclasses import dataclass
 from bluebees.common.client import Client
+from bluebees.common.dedup_cache import DedupCache
 from bluebees.common.logging import log_sys, INFO, DEBUG
 from serial.tools.list_ports import comports
 from asyncio import wait_for
 from serial import SerialException
+from collections import deque
+import time
 
 
 @dataclass
@@ -24,6 +27,137 @@ class SerialMessage:
     address: bytes
 
 
+def serial_frame(msg: SerialMessage) -> bytes:
+    return b'@' + b' '.join([msg.msg_type, msg.xmit, msg.intms,
+                             msg.content_b64]) + b'\r\n'
+
+
+# ! Read all bytes available on serial at once and split the complete frames
+class LineFramer:
+
+    def __init__(self, serial):
+        self.serial = serial
+        self._buffer = bytearray()
+        self._frames = deque()
+
+        self.frames = 0
+        self.bytes = 0
+        self._start = None
+
+    def feed(self, data: bytes):
+        if self._start is None:
+            self._start = time.monotonic()
+        self.bytes += len(data)
+        self._buffer += data
+
+        start = 0
+        # * the frames are copied once, from the view. The view is released
+        # *   before the buffer is resized
+        with memoryview(self._buffer) as view:
+            while True:
+                end = self._buffer.find(b'\r\n', start)
+                if end < 0:
+                    break
+                self._frames.append(bytes(view[start:end + 2]))
+                self.frames += 1
+                start = end + 2
+
+        if start:
+            del self._buffer[:start]
+
+    def pop(self) -> bytes:
+        return self._frames.popleft() if self._frames else None
+
+    async def read_frame(self) -> bytes:
+        while not self._frames:
+            data = await self.serial.read(max(1, self.serial.in_waiting))
+            self.feed(data)
+        return self._frames.popleft()
+
+    def stats(self) -> dict:
+        elapsed = time.monotonic() - self._start if self._start else 0
+        return {
+            'frames': self.frames,
+            'bytes': self.bytes,
+            'frames_per_sec': self.frames / elapsed if elapsed else 0.0,
+            'bytes_per_sec': self.bytes / elapsed if elapsed else 0.0
+        }
+
+
+def parse_frame(frame: bytes) -> SerialMessage:
+    parts = frame[1:-2].split(b' ')
+    if frame[0:1] != b'@' or len(parts) != 3:
+        return None
+
+    return SerialMessage(msg_type=parts[0], xmit=None, intms=None,
+                         content_b64=parts[1], address=parts[2])
+
+
+# ! The dongle echoes each frame written on serial. The echo is used as the
+# !   acknowledgement of frame, so up to `window` frames can be waiting the
+# !   echo. A frame without echo is released after `echo_timeout` seconds.
+class PipelinedWriter:
+
+    def __init__(self, serial, window=4, echo_timeout=1.0, frame_interval=0.0):
+        self.log = log_sys.get_logger('dongle.serial')
+
+        self.serial = serial
+        self.window = window
+        self.echo_timeout = echo_timeout
+        self.frame_interval = frame_interval
+
+        self._slots = asyncio.Semaphore(window)
+        # [frame, timer handle]
+        self._pending = deque()
+        self._last_write = 0.0
+
+        self.frames_written = 0
+        self.echoes = 0
+        self.echo_timeouts = 0
+
+    def _release(self, entry: list):
+        entry[1].cancel()
+        self._pending.remove(entry)
+        self._slots.release()
+
+    def _expire(self, entry: list):
+        self.echo_timeouts += 1
+        self.log.debug(f'Echo timeout of frame {entry[0]}')
+        self._release(entry)
+
+    async def write(self, frame: bytes):
+        await self._slots.acquire()
+
+        loop = asyncio.get_event_loop()
+        if self.frame_interval:
+            delay = self._last_write + self.frame_interval - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        entry = [frame, None]
+        entry[1] = loop.call_later(self.echo_timeout, self._expire, entry)
+        self._pending.append(entry)
+
+        await self.serial.write(frame)
+        self._last_write = loop.time()
+        self.frames_written += 1
+
+    def echo(self, frame: bytes) -> bool:
+        index = None
+        for i, entry in enumerate(self._pending):
+            if entry[0] == frame:
+                index = i
+                break
+        if index is None:
+            return False
+
+        self.echoes += 1
+        # * frames written before this one had their echo lost
+        for _ in range(index + 1):
+            self._release(self._pending[0])
+        return True
+
+
 class SearchDongle:
 
     def __init__(self, loop, baudrate=115200):
@@ -32,51 +166,19 @@ class SearchDongle:
 
         self.loop = loop
         self.baudrate = baudrate
-        self.expected_result = b'@reset 0 00 bm9uZQ==\r\n***** BLE Mesh Dongle v1.0 *****\r\n'
+        self.expected_result = b'***** BLE Mesh Dongle v1.0 *****\r\n'
 
     async def _wait_response(self, ser, port: str) -> bool:
-        line = b''
+        framer = LineFramer(ser)
         while True:
-            data = await ser.read()
-            line += data
-            if b'\r\n' in line:
-                self.log.debug(f'Result: {line}')
-                if self.expected_result in line:
-                    self.log.success(f'Dongle found at {port}')
-                    return True
-
-    def _split_data(self, data: bytes):
-        datas = []
-        part = b''
-
-        for byte in data:
-            if len(part) >= 5:
-                datas.append(part)
-                part = b''
-            part += byte.to_bytes(1, 'big')
-
-        if len(part) > 0:
-            datas.append(part)
-
-        return datas
+            line = await framer.read_frame()
+            self.log.debug(f'Result: {line}')
+            if line == self.expected_result:
+                self.log.success(f'Dongle found at {port}')
+                return True
 
     async def _write_on_serial(self, ser, msg: SerialMessage):
-        data = b'@'
-        data += msg.msg_type
-        data += b' '
-        data += msg.xmit
-        data += b' '
-        data += msg.intms
-        data += b' '
-        data += msg.content_b64
-        data += b'\r\n'
-
-        datas = self._split_data(data)
-        for d in datas:
-            await ser.write(d)
-            await asyncio.sleep(0.005)
-
-        await asyncio.sleep(1)
+        await ser.write(serial_frame(msg))
 
     async def _try_connect(self, ser, port: str, timeout: int) -> bool:
         # send reset cmd
@@ -121,7 +223,8 @@ class SearchDongle:
 
 class Dongle(Client):
 
-    def __init__(self, loop, serial_port, baudrate=115200):
+    def __init__(self, loop, serial_port, baudrate=115200, window=4,
+                 echo_timeout=1.0, frame_interval=0.0):
         super().__init__(sub_topic_list=[b'message_s', b'prov_s'],
                          pub_topic_list=[b'message', b'prov', b'beacon'])
 
@@ -135,22 +238,24 @@ class Dongle(Client):
         self.baudrate = baudrate
         self.serial = Serial(self.loop, self.serial_port, self.baudrate)
         self.write_serial_queue = asyncio.Queue()
+        self.framer = LineFramer(self.serial)
+        self.writer = PipelinedWriter(self.serial, window=window,
+                                      echo_timeout=echo_timeout,
+                                      frame_interval=frame_interval)
 
         self.caches = {
-            b'message': [],
-            b'beacon': [],
-            b'prov': []
+            b'message': DedupCache(),
+            b'beacon': DedupCache(),
+            b'prov': DedupCache()
         }
 
         self.loop.run_until_complete(self._reset_dongle())
 
         self.all_tasks += [self._read_serial_task(),
                            self._transport_message_task(),
-                           self._write_serial_task(),
-                           self._clear_caches_task()]
+                           self._write_serial_task()]
 
     async def _reset_dongle(self):
-        line = b''
         expected_result = b'***** BLE Mesh Dongle v1.0 *****\r\n'
         for x in range(3):
             self.ser_log.info('Trying reset dongle...')
@@ -161,30 +266,15 @@ class Dongle(Client):
             await self._write_on_serial(serial_msg)
 
             # clear send message
-            data = await self.serial.read(22)
+            line = await self.framer.read_frame()
+            if line.startswith(b'@reset'):
+                line = await self.framer.read_frame()
 
-            while True:
-                data = await self.serial.read()
-                line += data
-                if b'\r\n' in line:
-                    if line == expected_result:
-                        self.ser_log.success('Dongle resetted')
-                        return
-                    line = b''
-                    break
+            if line == expected_result:
+                self.ser_log.success('Dongle resetted')
+                return
         self.ser_log.warning('Give-up to reset dongle')
 
-    async def _clear_caches_task(self):
-        while True:
-            await asyncio.sleep(5 * 60)
-            self.ser_log.info('Cleaning caches...')
-            self.caches = {
-                b'message': [],
-                b'beacon': [],
-                b'prov': []
-            }
-            self.ser_log.info('Caches clean')
-
     async def _read_serial_task(self):
         while True:
             serial_msg = await self._read_from_serial()
@@ -213,72 +303,34 @@ class Dongle(Client):
             self.ser_log.debug(f'Send a message with type {serial_msg.msg_type} and '
                                f'content {b64.b64decode(serial_msg.content_b64).hex()}')
 
-            await self._write_on_serial(serial_msg)
+            await self.writer.write(serial_frame(serial_msg))
 
     async def _read_from_serial(self):
-        line = b''
         while True:
-            data = await self.serial.read()
-            line += data
-            if b'\r\n' in line:
-                if line[0:1] == b'*':
-                    self.ser_log.info(line.decode('utf-8'))
-                if line[0:1] == b'!':
-                    self.ser_log.warning(line[1:].decode('utf-8'))
-                elif line[0:1] != b'@':
-                    line = b''
-                    continue
-
-                parts = line.split(b' ')
-
-                if len(parts) != 3:
-                    line = b''
-                    continue
-
-                msg = SerialMessage(msg_type=parts[0][1:], xmit=None,
-                                    intms=None,
-                                    content_b64=parts[1],
-                                    address=parts[2][:-2])
-
-                if msg in self.caches[msg.msg_type]:
-                    line = b''
-                    continue
-                self.caches[msg.msg_type].append(msg)
-
-                return msg
-
-    def _split_data(self, data: bytes):
-        datas = []
-        part = b''
-
-        for byte in data:
-            if len(part) >= 5:
-                datas.append(part)
-                part = b''
-            part += byte.to_bytes(1, 'big')
-
-        if len(part) > 0:
-            datas.append(part)
-
-        return datas
+            line = await self.framer.read_frame()
+            if line[0:1] == b'*':
+                self.ser_log.info(line.decode('utf-8'))
+            if line[0:1] == b'!':
+                self.ser_log.warning(line[1:].decode('utf-8'))
+            elif line[0:1] != b'@':
+                continue
+
+            if line.count(b' ') == 3:
+                self.writer.echo(line)
+                continue
+
+            msg = parse_frame(line)
+            if msg is None:
+                continue
+
+            cache = self.caches.get(msg.msg_type)
+            if cache is None or cache.seen(msg.content_b64):
+                continue
+
+            return msg
 
     async def _write_on_serial(self, msg: SerialMessage):
-        data = b'@'
-        data += msg.msg_type
-        data += b' '
-        data += msg.xmit
-        data += b' '
-        data += msg.intms
-        data += b' '
-        data += msg.content_b64
-        data += b'\r\n'
-
-        datas = self._split_data(data)
-        for d in datas:
-            await self.serial.write(d)
-            await asyncio.sleep(0.005)
-
-        await asyncio.sleep(1)
+        await self.serial.write(serial_frame(msg))
 
     def _translate_serial_message(self, msg: SerialMessage) -> DongleMessage:
         dongle_msg = DongleMessage(msg_type=msg.msg_type,
@@ -5,3 +5,4 @@ app_dir = 'app/'
 net_dir = 'net/'
 group_dir = 'group/'
 config_dir = 'config/'
+db_file = 'bluebees.db'
@@ -0,0 +1,186 @@
+from bluebees.client.node.provisioning_manager import ProvisioningManager
+from bluebees.client.node.provisioner import LinkOpenError, ProvisioningError
+from bluebees.client.node.node_data import NodeData, node_name_list
+from bluebees.client.node.commands.new import random_addr, validate_addr
+from bluebees.client.node.commands.config import config_task
+from bluebees.client.network.network_data import NetworkData
+from bluebees.client.data_paths import base_dir, net_dir
+from bluebees.common.template import template_helper
+from bluebees.common.storage import storage
+from bluebees.common.logging import log_sys, INFO, DEBUG
+import asyncio
+import fnmatch
+import click
+
+
+class NodeNameError(Exception):
+    pass
+
+
+# ! Pipeline of unprovisioned device beacons: the UUIDs are deduplicated and
+# !   filtered, then wait on a bounded queue for a free provisioning session.
+# !   The name and the address of each node come from the node template.
+class AutoProvisioner(ProvisioningManager):
+
+    def __init__(self, network: str, template: dict, patterns=None,
+                 allow_list=None, element=None, config=None, max_sessions=4,
+                 max_attempts=3, debug=False):
+        super().__init__(max_sessions=max_sessions, debug=debug,
+                         sub_topic_list=[b'beacon'])
+
+        self.log = log_sys.get_logger('auto_provisioner')
+        if debug:
+            self.log.set_level(DEBUG)
+        else:
+            self.log.set_level(INFO)
+
+        self.network = network
+        self.template = template
+        # the uuids are matched in lower case hex
+        self.patterns = [p.lower() for p in patterns or []]
+        self.allow_list = set(u.lower() for u in allow_list or [])
+        # the nodes are configured after provisioned, when config is set
+        self.element = element
+        self.config = config
+        self.max_attempts = max_attempts
+        # names drawn from template until a free one is found
+        self.max_name_draws = 1000
+
+        # uuids queued, provisioned or discarded
+        self.seen = set()
+        # uuid -> number of fails
+        self.attempts = {}
+        self.pending = asyncio.Queue(maxsize=max_sessions * 4)
+        # uuid -> (node name, address), reused when the provisioning is
+        #   retried
+        self.reservations = {}
+        # uuid -> (node name, error), the error is empty on success
+        self.results = {}
+        # uuid -> config error of the nodes provisioned, empty on success
+        self.config_results = {}
+
+        self.all_tasks += [self._session_task(i) for i in
+                           range(max_sessions)]
+
+    def accept(self, uuid: bytes) -> bool:
+        if not self.allow_list and not self.patterns:
+            return True
+        if uuid.hex() in self.allow_list:
+            return True
+        return any(fnmatch.fnmatch(uuid.hex(), p) for p in self.patterns)
+
+    async def _on_message(self, msg_type: bytes, content: bytes):
+        if msg_type != b'beacon' or len(content) < 17 or content[0] != 0:
+            return
+
+        uuid = bytes(content[1:17])
+        if uuid in self.seen:
+            return
+
+        if not self.accept(uuid):
+            self.log.debug(f'Device {uuid.hex()} filtered')
+            self.seen.add(uuid)
+            return
+
+        try:
+            self.pending.put_nowait(uuid)
+            self.seen.add(uuid)
+            self.log.info(f'Device {uuid.hex()} queued')
+        except asyncio.QueueFull:
+            # * the device beacons again, so it is queued later
+            self.log.debug('Queue full')
+
+    def _next_node(self, uuid: bytes) -> (str, bytes):
+        if uuid in self.reservations:
+            return self.reservations[uuid]
+
+        names = node_name_list() or []
+        reserved_names = [n for n, _ in self.reservations.values()]
+        reserved_addrs = [a for _, a in self.reservations.values()]
+        name_is_random = template_helper.is_random(self.template, 'name')
+        for _ in range(self.max_name_draws):
+            name, name_is_seq = template_helper.get_field(self.template,
+                                                          'name')
+            # the names are reserved, since many sessions run at same time
+            if name_is_seq:
+                template_helper.update_sequence(self.template, 'name')
+            if name not in names and name not in reserved_names:
+                break
+            # * the sequential and random names are drawn again
+            if not name_is_seq and not name_is_random:
+                raise NodeNameError(f'The "{name}" node already exist')
+        else:
+            raise NodeNameError('There isn\'t a free node name in template')
+
+        if 'address' in self.template:
+            address, addr_is_seq = template_helper.get_field(
+                self.template, 'address', custom_pattern=self.template['name'])
+            if addr_is_seq:
+                template_helper.update_sequence(
+                    self.template, 'address',
+                    custom_pattern=self.template['name'])
+            address = bytes.fromhex(validate_addr(None, None, address))
+        else:
+            address = bytes.fromhex(validate_addr(
+                None, None, random_addr(reserved_addrs)))
+
+        self.reservations[uuid] = (name, address)
+        return name, address
+
+    def _save_node(self, name: str, uuid: bytes, address: bytes,
+                   devkey: bytes):
+        with storage.transaction():
+            NodeData(name=name, addr=address, network=self.network,
+                     device_uuid=uuid, devkey=devkey).save()
+
+            net_data = NetworkData.load(base_dir + net_dir + self.network +
+                                        '.yml')
+            net_data.nodes.append(name)
+            net_data.save()
+
+    def _provisioning_fail(self, uuid: bytes):
+        attempts = self.attempts.get(uuid, 0) + 1
+        self.attempts[uuid] = attempts
+        if attempts < self.max_attempts:
+            # retried on the next beacon
+            self.seen.discard(uuid)
+
+    async def _session_task(self, position: int):
+        while True:
+            uuid = await self.pending.get()
+
+            try:
+                name, address = self._next_node(uuid)
+            except (NodeNameError, click.BadParameter) as e:
+                self.log.error(f'Node template error [{e}]')
+                self.results[uuid] = (None, f'Node template error [{e}]')
+                continue
+
+            net_data = NetworkData.load(base_dir + net_dir + self.network +
+                                        '.yml')
+            try:
+                devkey = await self.provision(uuid, net_data.key,
+                                              net_data.key_index,
+                                              net_data.iv_index, address,
+                                              position)
+            except (LinkOpenError, ProvisioningError):
+                self._provisioning_fail(uuid)
+                self.results[uuid] = (name, 'Provisioning fail')
+                continue
+            except Exception as e:
+                self._provisioning_fail(uuid)
+                self.results[uuid] = (name, f'Unknown error [{e}]')
+                continue
+
+            self._save_node(name, uuid, address, devkey)
+            self.results[uuid] = (name, '')
+            self.log.success(f'Device {uuid.hex()} provisioned as "{name}"')
+
+            # * the node exists even when its config fails
+            if self.element and self.config:
+                try:
+                    error = await config_task(name, self.element, self.config,
+                                              position)
+                except Exception as e:
+                    error = f'Unknown error [{e}]'
+                self.config_results[uuid] = error
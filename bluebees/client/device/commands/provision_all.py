@@ -0,0 +1,138 @@
+from bluebees.client.device.auto_provisioner import AutoProvisioner
+from bluebees.client.node.commands.new import validate_network, validate_uuid
+from bluebees.client.node.commands.config import parse_config
+from bluebees.client.mesh_layers.element import Element
+from bluebees.common.file import file_helper
+from bluebees.common.template import template_helper
+from bluebees.common.utils import run_seq
+import click
+import asyncio
+
+
+def parse_template(ctx, param, value):
+    template = file_helper.read(value)
+    if not template:
+        raise click.BadParameter(f'File "{value}" not found')
+    if 'name' not in template:
+        raise click.BadParameter('The template file must contain the "name" '
+                                 'keyword')
+    return template
+
+
+def parse_allow_list(ctx, param, value):
+    if not value:
+        return []
+    if not file_helper.file_exist(value):
+        raise click.BadParameter(f'File "{value}" not found')
+
+    with open(value, 'r') as f:
+        lines = [line.split('#')[0].strip() for line in f.readlines()]
+
+    uuids = []
+    for line in [line for line in lines if line]:
+        uuid = validate_uuid(ctx, param, line.lower())
+        uuids.append(uuid + '0' * (32 - len(uuid)))
+    return uuids
+
+
+def parse_optional_config(ctx, param, value):
+    if not value:
+        return None
+    return parse_config(ctx, param, value)
+
+
+def report(results: dict, config_results: dict):
+    click.echo(click.style('\nProvisioning report:', fg='cyan'))
+    for uuid, (name, error) in results.items():
+        # the name is None when the template hasn't a free name
+        device = f'{name} ({uuid.hex()})' if name else uuid.hex()
+        if error:
+            click.echo(click.style(f'  {device}: {error}', fg='red'))
+        elif uuid not in config_results:
+            click.echo(click.style(f'  {device}: success', fg='green'))
+        elif not config_results[uuid]:
+            click.echo(click.style(f'  {device}: success, configured',
+                                   fg='green'))
+        else:
+            click.echo(click.style(f'  {device}: created, config fail '
+                                   f'[{config_results[uuid]}]', fg='yellow'))
+
+    fails = len([e for _, e in results.values() if e])
+    click.echo(click.style(f'{len(results) - fails} of {len(results)} nodes '
+                           f'created', fg='red' if fails else 'green'))
+
+    if config_results:
+        config_fails = len([e for e in config_results.values() if e])
+        click.echo(click.style(f'{len(config_results) - config_fails} of '
+                               f'{len(config_results)} nodes configured',
+                               fg='red' if config_fails else 'green'))
+
+
+@click.command(name='provision-all')
+@click.option('--template', '-t', type=str, default='node_template.yml',
+              help='Specify the YAML template file used to name and address '
+                   'the nodes. A file example is shown in node_template.yml',
+              callback=parse_template, show_default=True)
+@click.option('--network', '-w', type=str, default='',
+              help='Specify the name of network. By default, the network of '
+                   'template is used')
+@click.option('--pattern', '-p', type=str, multiple=True,
+              help='Provision only the UUIDs that match a glob pattern, like '
+                   '"0011*". This option can be repeated')
+@click.option('--allow-list', '-f', type=str, default='',
+              help='Specify a file with one UUID per line. Only these devices '
+                   'are provisioned', callback=parse_allow_list)
+@click.option('--config', '-c', type=str, default='',
+              help='Specify a YAML config file, applied to each node after '
+                   'provisioned. A file example is shown in node_config.yml',
+              callback=parse_optional_config)
+@click.option('--concurrency', '-j', type=click.IntRange(min=1), default=4,
+              help='Maximum number of devices provisioned at same time',
+              show_default=True)
+def provision_all(template, network, pattern, allow_list, config,
+                  concurrency):
+    '''Provision all unprovisioned devices found'''
+
+    if not network and 'network' in template:
+        network, _ = template_helper.get_field(template, 'network')
+    validate_network(None, None, network)
+
+    click.echo(click.style(f'Provisioning the devices found to network '
+                           f'"{network}"', fg='green'))
+    click.echo(click.style('Press Ctrl+C to finish', fg='yellow'))
+
+    element = None
+    auto_prov = None
+    loop = asyncio.get_event_loop()
+    try:
+        if config:
+            element = Element()
+        auto_prov = AutoProvisioner(network=network, template=template,
+                                    patterns=list(pattern),
+                                    allow_list=allow_list, element=element,
+                                    config=config[0] if config else None,
+                                    max_sessions=concurrency)
+
+        spwan_tasks = [auto_prov.spwan_tasks(loop)]
+        if element:
+            spwan_tasks.append(element.spwan_tasks(loop))
+        loop.run_until_complete(run_seq(spwan_tasks))
+        loop.run_forever()
+    except KeyboardInterrupt:
+        click.echo(click.style('Interruption by user', fg='yellow'))
+        if auto_prov:
+            loop.run_until_complete(auto_prov.close_links(b'\x02'))
+    except RuntimeError:
+        click.echo('Runtime error')
+    finally:
+        if auto_prov:
+            auto_prov.disconnect()
+        if element:
+            element.disconnect()
+        tasks_running = asyncio.Task.all_tasks()
+        for t in tasks_running:
+            t.cancel()
+        loop.stop()
+
+    if auto_prov:
+        report(auto_prov.results, auto_prov.config_results)
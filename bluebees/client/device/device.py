@@ -1,5 +1,6 @@
 import click
 from bluebees.client.device.commands.list import list
+from bluebees.client.device.commands.provision_all import provision_all
 
 
 @click.group()
@@ -9,3 +10,4 @@ def device():
 
 
 device.add_command(list)
+device.add_command(provision_all)
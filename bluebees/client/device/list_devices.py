@@ -10,7 +10,7 @@ class ListDevices(Client):
         self.log = log_sys.get_logger('list_devices')
         self.log.set_level(INFO)
         self.index = 1
-        self.cache = []
+        self.cache = set()
 
         self.all_tasks += [self.list_devices_task()]
 
@@ -33,5 +33,6 @@ class ListDevices(Client):
                 self.log.debug(f'UUID already in cache')
                 continue
 
-            self.cache.append(content[1:])
+            self.cache.add(content[1:])
             self.log.info(f'{self.index}. {content[1:].hex()}')
+            self.index += 1
@@ -1,13 +1,17 @@
 from bluebees.client.mesh_layers.transport_layer import TransportLayer, AckTimeout
 from bluebees.client.mesh_layers.mesh_context import SoftContext
 from bluebees.client.mesh_layers.address import address_type, UNICAST_ADDRESS, \
-                                       UNASSIGNED_ADDRESS
+                                       UNASSIGNED_ADDRESS, GROUP_ADDRESS
 from bluebees.client.mesh_layers.access_layer import check_opcode, check_parameters, \
                                             OpcodeLengthError, \
                                             OpcodeBadFormat, OpcodeReserved, \
-                                            ParametersLengthError, opcode_len
+                                            ParametersLengthError
+from bluebees.client.mesh_layers.pdu_codec import split_access_pdu
+from bluebees.client.mesh_layers.rtt_estimator import RttTable
 from bluebees.common.logging import log_sys, INFO, DEBUG
 from bluebees.common.client import Client
+from bluebees.client.node.group_data import find_group_by_addr
+from dataclasses import replace
 import asyncio
 import traceback
 
@@ -24,14 +28,26 @@ class Element(Client):
 
     def __init__(self):
         super().__init__(sub_topic_list=[b'message'],
-                         pub_topic_list=[b'message_s'])
+                         pub_topic_list=[b'message_s'], zero_copy=True)
         self.log = log_sys.get_logger('element')
         self.log.set_level(INFO)
 
         self.tr_layer = TransportLayer(send_queue=self.messages_to_send,
                                        recv_queue=self.messages_received)
 
-        self.all_tasks += [self.tr_layer.net_layer.recv_pdu()]
+        # (addr, opcode) -> [(future, ctx: SoftContext)]
+        self.response_waiters = {}
+
+        # the timeouts equals to None are derived from the rtt of dst
+        self.rtt_table = RttTable()
+
+        self.all_tasks += [self.tr_layer.net_layer.recv_pdu(),
+                           self.tr_layer.recv_task(),
+                           self._dispatch_task()]
+
+    def disconnect(self):
+        self.rtt_table.flush()
+        super().disconnect()
 
     async def send_message(self, opcode: bytes, parameters: bytes,
                            ctx: SoftContext):
@@ -48,6 +64,11 @@ class Element(Client):
 
             pdu = opcode + parameters
 
+            if ctx.ack_timeout is None or ctx.segment_timeout is None:
+                estimator = self.rtt_table.estimator(ctx.dst_addr)
+                ctx = replace(ctx, ack_timeout=estimator.ack_timeout(),
+                              segment_timeout=estimator.segment_timeout())
+
             success = await self.tr_layer.send_pdu(pdu, ctx)
         except OpcodeLengthError:
             self.log.error('Opcode length wrong')
@@ -68,46 +89,145 @@ class Element(Client):
         finally:
             return success
 
-    async def _recv_message_atomic(self, opcode: bytes,
-                                   segment_timeout: int,
-                                   ctx: SoftContext) -> bytes:
+    def _match_addresses(self, r_ctx: SoftContext, ctx: SoftContext) -> bool:
+        if r_ctx.dst_addr != ctx.src_addr:
+            return False
+
+        if address_type(ctx.dst_addr) == GROUP_ADDRESS:
+            group = find_group_by_addr(ctx.dst_addr)
+            return bool(group) and r_ctx.src_addr in group.sub_addrs
+
+        return r_ctx.src_addr == ctx.dst_addr
+
+    def _find_response_waiter(self, r_ctx: SoftContext,
+                              opcode: bytes) -> asyncio.Future:
+        keys = [(r_ctx.src_addr, opcode)]
+        keys += [k for k in self.response_waiters.keys()
+                 if k[1] == opcode and k[0] != r_ctx.src_addr and
+                 address_type(k[0]) == GROUP_ADDRESS]
+
+        for key in keys:
+            for future, ctx in self.response_waiters.get(key, []):
+                if not future.done() and self._match_addresses(r_ctx, ctx):
+                    return future
+
+        return None
+
+    async def _dispatch_task(self):
         while True:
-            self.log.debug('Waiting message atomic...')
-            content, _ = await self.tr_layer.recv_pdu(segment_timeout, ctx)
-            if not content:
-                self.log.debug('No content')
+            access_pdu, r_ctx = await self.tr_layer.access_pdus.get()
+
+            opcode, parameters = split_access_pdu(access_pdu)
+            self.log.debug(f'Got opcode {opcode.hex()} from '
+                           f'{r_ctx.src_addr.hex()}')
+
+            future = self._find_response_waiter(r_ctx, opcode)
+            if not future:
+                self.log.debug('Nobody waiting this message')
                 continue
-            self.log.debug('Get opcode len')
-            op_len = opcode_len(content[0:1])
-            self.log.debug(f'Opcode len: {op_len}')
-            self.log.debug(f'Opcode: {content[0:op_len].hex()}')
-            if content[0:op_len] == opcode:
-                return content[op_len:]
 
-    async def recv_message(self, opcode: bytes, ctx: SoftContext,
-                           segment_timeout=10, timeout=30) -> bytes:
+            future.set_result(parameters)
+
+    def _expect_message(self, opcode: bytes, ctx: SoftContext,
+                        segment_timeout: int) -> (tuple, tuple):
+        check_opcode(opcode)
+
+        if segment_timeout is None:
+            estimator = self.rtt_table.estimator(ctx.dst_addr)
+            segment_timeout = estimator.segment_timeout()
+
+        self.tr_layer.local_addrs.add(ctx.src_addr)
+        self.tr_layer.expect_segments(ctx.dst_addr, segment_timeout)
+
+        key = (ctx.dst_addr, opcode)
+        # the ctx of waiter keeps the segment timeout used by this message
+        waiter = (asyncio.get_event_loop().create_future(),
+                  replace(ctx, segment_timeout=segment_timeout))
+        self.response_waiters.setdefault(key, []).append(waiter)
+
+        return key, waiter
+
+    def _forget_message(self, key: tuple, waiter: tuple):
+        self.tr_layer.forget_segments(key[0], waiter[1].segment_timeout)
+
+        waiters = self.response_waiters[key]
+        waiters.remove(waiter)
+        if not waiters:
+            del self.response_waiters[key]
+
+    async def _wait_message(self, key: tuple, waiter: tuple,
+                            timeout: int) -> bytes:
         content = None
 
-        self.log.debug('Start recv...')
+        if timeout is None:
+            estimator = self.rtt_table.estimator(key[0])
+            timeout = estimator.response_timeout()
 
         try:
-            self.log.debug('Checking opcode...')
-            check_opcode(opcode)
-            self.log.debug('Opcode is ok')
-            content = await asyncio.wait_for(self._recv_message_atomic(
-                opcode, segment_timeout, ctx), timeout=timeout)
+            content = await asyncio.wait_for(waiter[0], timeout=timeout)
             self.log.debug('End receive')
+        except asyncio.TimeoutError:
+            self.log.debug(f'The maximum time to receive a message with '
+                           f'opcode equals to "{key[1].hex()}" was reached')
+        finally:
+            self._forget_message(key, waiter)
+
+        if content:
+            self.log.debug(f'Content: {content.hex()}')
+
+        return content
+
+    async def recv_message(self, opcode: bytes, ctx: SoftContext,
+                           segment_timeout=None, timeout=None) -> bytes:
+        self.log.debug('Start recv...')
+
+        try:
+            key, waiter = self._expect_message(opcode, ctx, segment_timeout)
         except OpcodeLengthError:
             self.log.error('Opcode length wrong')
+            return None
         except OpcodeReserved:
             self.log.error('Opcode reserved for future use')
+            return None
         except OpcodeBadFormat:
             self.log.error('Opcode bad format')
-        except asyncio.TimeoutError:
-            self.log.debug(f'The maximum time to receive a message with '
-                           f'opcode equals to "{opcode.hex()}" was reached')
+            return None
 
-        if content:
-            self.log.debug(f'Content: {content.hex()}')
+        return await self._wait_message(key, waiter, timeout)
+
+    async def request(self, opcode: bytes, parameters: bytes,
+                      r_opcode: bytes, ctx: SoftContext, segment_timeout=None,
+                      timeout=None) -> bytes:
+        try:
+            key, waiter = self._expect_message(r_opcode, ctx,
+                                               segment_timeout)
+        except OpcodeLengthError:
+            self.log.error('Response opcode length wrong')
+            return None
+        except OpcodeReserved:
+            self.log.error('Response opcode reserved for future use')
+            return None
+        except OpcodeBadFormat:
+            self.log.error('Response opcode bad format')
+            return None
+
+        # the response waiter is registered before send, so a fast response
+        # is not lost
+        success = await self.send_message(opcode, parameters, ctx)
+        if not success:
+            self._forget_message(key, waiter)
+            return None
+
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        content = await self._wait_message(key, waiter, timeout)
+
+        # the responses of a group came from many nodes, so only the rtt of
+        #   unicast addresses is measured
+        if address_type(ctx.dst_addr) == UNICAST_ADDRESS:
+            if content is not None:
+                self.rtt_table.update(ctx.dst_addr, loop.time() - start)
+            else:
+                self.rtt_table.timeout(ctx.dst_addr)
 
         return content
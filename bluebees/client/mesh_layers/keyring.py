@@ -0,0 +1,90 @@
+from dataclasses import dataclass
+from bluebees.client.network.network_data import NetworkData
+from bluebees.client.application.application_data import ApplicationData
+from bluebees.client.data_paths import base_dir, net_dir, app_dir
+from bluebees.common.crypto import crypto
+from bluebees.common.file_index import FileIndex
+from typing import List
+
+
+@dataclass
+class NetworkKeys:
+    net_data: NetworkData
+    nid: int
+    encryption_key: bytes
+    privacy_key: bytes
+
+
+@dataclass
+class ApplicationKeys:
+    app_data: ApplicationData
+    aid: int
+
+
+class NetworkKeyring(FileIndex):
+
+    def __init__(self, check_interval=1.0):
+        super().__init__(dirpath=base_dir + net_dir,
+                         check_interval=check_interval)
+
+        # filename -> NetworkKeys
+        self._keys = {}
+        # nid -> [NetworkKeys]
+        self._nids = {}
+
+    def _load_file(self, filename: str):
+        net_data = NetworkData.load(self.dirpath + filename)
+        materials = crypto.k2(n=net_data.key, p=b'\x00')
+        self._keys[filename] = NetworkKeys(net_data=net_data,
+                                           nid=materials[0] & 0x7f,
+                                           encryption_key=materials[1:17],
+                                           privacy_key=materials[17:33])
+
+    def _drop_file(self, filename: str):
+        del self._keys[filename]
+
+    def _on_change(self):
+        nids = {}
+        for filename in sorted(self._keys.keys()):
+            keys = self._keys[filename]
+            nids.setdefault(keys.nid, []).append(keys)
+        self._nids = nids
+
+    def search_by_nid(self, nid: int) -> List[NetworkKeys]:
+        self.refresh()
+        return self._nids.get(nid, [])
+
+    def search_by_name(self, name: str) -> NetworkKeys:
+        self.refresh()
+        return self._keys.get(name + '.yml')
+
+
+class ApplicationKeyring(FileIndex):
+
+    def __init__(self, check_interval=1.0):
+        super().__init__(dirpath=base_dir + app_dir,
+                         check_interval=check_interval)
+
+        # filename -> ApplicationKeys
+        self._keys = {}
+        # aid -> [ApplicationKeys]
+        self._aids = {}
+
+    def _load_file(self, filename: str):
+        app_data = ApplicationData.load(self.dirpath + filename)
+        self._keys[filename] = ApplicationKeys(
+            app_data=app_data, aid=crypto.k4(n=app_data.key)[0] & 0x3f)
+
+    def _drop_file(self, filename: str):
+        del self._keys[filename]
+
+    def _on_change(self):
+        aids = {}
+        for filename in sorted(self._keys.keys()):
+            keys = self._keys[filename]
+            aids.setdefault(keys.aid, []).append(keys)
+        self._aids = aids
+
+    def search_by_aid(self, aid: int) -> List[ApplicationKeys]:
+        self.refresh()
+        return self._aids.get(aid, [])
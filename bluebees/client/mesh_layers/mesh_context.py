@@ -1,15 +1,17 @@
 from dataclasses import dataclass
+from typing import Optional
+import asyncio
 
 
-@dataclass
-class HardContext:
+# ! Each network PDU carries its own metadata, so the sends and the receives
+# !   of the same element can run at same time
+@dataclass(frozen=True)
+class NetworkMeta:
+    __slots__ = ('seq', 'ttl', 'is_ctrl_msg')
+
     seq: int
     ttl: int
     is_ctrl_msg: bool
-    seq_zero: int
-    seg_o: int
-    seg_n: int
-    szmic: int
 
 
 @dataclass
@@ -22,3 +24,26 @@ class SoftContext:
     is_devkey: bool
     ack_timeout: int
     segment_timeout: int
+
+
+@dataclass
+class ReassemblyContext:
+    soft_ctx: SoftContext
+    seq_zero: int
+    seg_n: int
+    szmic: int
+    first_seq: int
+    aid: int
+    # upper transport pdu, each segment is written at its offset
+    buffer: bytearray
+    size: int
+    block_ack: int
+    # time, in seconds, to give up of the message
+    incomplete_timeout: float
+    # restarted on each new segment, the message is dropped when it expires
+    incomplete_timer: Optional[asyncio.TimerHandle] = None
+    # running while there are received segments not acknowledged yet
+    ack_timer: Optional[asyncio.TimerHandle] = None
+
+    def is_complete(self) -> bool:
+        return self.block_ack == (2 ** (self.seg_n + 1)) - 1
@@ -1,10 +1,13 @@
-from bluebees.client.mesh_layers.mesh_context import HardContext, SoftContext
+from bluebees.client.mesh_layers.mesh_context import NetworkMeta, SoftContext
+from bluebees.client.mesh_layers.keyring import NetworkKeyring, NetworkKeys
+from bluebees.client.mesh_layers.seq_allocator import SeqAllocator
+from bluebees.client.mesh_layers.pdu_codec import xor, pack_net_header, \
+    unpack_net_header, privacy_plaintext, pack_network_pdu, net_nonce
 from bluebees.client.network.network_data import NetworkData
-from bluebees.client.node.node_data import NodeData
-from bluebees.client.data_paths import base_dir, net_dir, node_dir
+from bluebees.client.node.node_data import node_index
+from bluebees.client.data_paths import base_dir, net_dir
 from bluebees.common.logging import log_sys, INFO, DEBUG
 from bluebees.common.crypto import crypto
-from bluebees.common.file import file_helper
 import asyncio
 
 
@@ -13,22 +16,20 @@ import asyncio
 class NetworkLayer:
 
     def __init__(self, send_queue, recv_queue):
-        self.hard_ctx = HardContext(seq=0, ttl=2, is_ctrl_msg=True,
-                                    seq_zero=0, seg_o=0, seg_n=0, szmic=0)
+        self.default_ttl = 2
         self.send_queue = send_queue
         self.recv_queue = recv_queue
 
         self.log = log_sys.get_logger('network_layer')
         self.log.set_level(INFO)
 
-        # (transport_pdu: bytes, soft_ctx: SoftContext)
+        # (transport_pdu: bytes, soft_ctx: SoftContext, meta: NetworkMeta)
         self.transport_pdus = asyncio.Queue()
 
-    def __increment_seq(self, soft_ctx: SoftContext):
-        node_name = soft_ctx.node_name
-        node_data = NodeData.load(base_dir + node_dir + node_name + '.yml')
-        node_data.seq += 1
-        node_data.save()
+        self.keyring = NetworkKeyring()
+        self.keyring.refresh(force=True)
+
+        self.seq_allocator = SeqAllocator()
 
     # send methods
     def _gen_security_material(self,
@@ -40,9 +41,9 @@ class NetworkLayer:
         return nid, encryption_key, privacy_key
 
     def _encrypt(self, soft_ctx: SoftContext, transport_pdu: bytes,
-                 encryption_key: bytes,
-                 net_nonce: bytes) -> (bytes, bytes, bytes):
-        mic_size = 8 if self.hard_ctx.is_ctrl_msg else 4
+                 encryption_key: bytes, net_nonce: bytes,
+                 meta: NetworkMeta) -> (bytes, bytes, bytes):
+        mic_size = 8 if meta.is_ctrl_msg else 4
         aes_ccm_result, mic = crypto.aes_ccm_complete(key=encryption_key,
                                                       nonce=net_nonce,
                                                       text=soft_ctx.dst_addr +
@@ -54,104 +55,77 @@ class NetworkLayer:
         net_mic = mic
         return enc_dst, encrypted_data, net_mic
 
-    def __xor(self, a: bytes, b: bytes):
-        c = b''
-        for x in range(len(a)):
-            c += int(a[x] ^ b[x]).to_bytes(1, 'big')
-        return c
-
-    def _obsfucate(self, ctl: int, ttl: int, seq: int, src: bytes,
-                   enc_dst: bytes, enc_transport_pdu: bytes, net_mic: bytes,
+    def _obsfucate(self, meta: NetworkMeta, src: bytes, enc_dst: bytes,
+                   enc_transport_pdu: bytes, net_mic: bytes,
                    privacy_key: bytes, net_data: NetworkData) -> bytes:
         privacy_random = (enc_dst + enc_transport_pdu + net_mic)[0:7]
-        pecb = crypto.e(key=privacy_key, plaintext=b'\x00\x00\x00\x00\x00' +
-                                                   net_data.iv_index +
-                                                   privacy_random)
-        obsfucated_data = self.__xor((ctl | ttl).to_bytes(1, 'big') +
-                                     seq.to_bytes(3, 'big') + src, pecb[0:6])
+        pecb = crypto.e(key=privacy_key,
+                        plaintext=privacy_plaintext(net_data.iv_index,
+                                                    privacy_random))
+        obsfucated_data = xor(pack_net_header(meta.is_ctrl_msg, meta.ttl,
+                                              meta.seq, src), pecb[0:6])
         return obsfucated_data
 
-    async def send_pdu(self, transport_pdu: bytes, soft_ctx: SoftContext):
+    def new_meta(self, soft_ctx: SoftContext, is_ctrl_msg: bool,
+                 seq=None) -> NetworkMeta:
+        if seq is None:
+            seq = self.seq_allocator.allocate(soft_ctx.node_name)
+        return NetworkMeta(seq=seq, ttl=self.default_ttl,
+                           is_ctrl_msg=is_ctrl_msg)
+
+    async def send_pdu(self, transport_pdu: bytes, soft_ctx: SoftContext,
+                       meta: NetworkMeta):
         net_data = NetworkData.load(base_dir + net_dir + soft_ctx.network_name
                                     + '.yml')
-        node_data = NodeData.load(base_dir + node_dir + soft_ctx.node_name
-                                  + '.yml')
-        self.hard_ctx.seq = node_data.seq
 
         nid, encryption_key, privacy_key = \
             self._gen_security_material(net_data)
 
-        ivi = ((int.from_bytes(net_data.iv_index, 'big') & 0x01) << 7)
-        ctl = 0x80 if self.hard_ctx.is_ctrl_msg else 0x00
-        ttl = 0x02
-        seq = self.hard_ctx.seq
+        ivi = net_data.iv_index[-1] & 0x01
         src = soft_ctx.src_addr
 
-        net_nonce = b'\x00' + (ctl | ttl).to_bytes(1, 'big') + \
-            seq.to_bytes(3, 'big') + src + b'\x00\x00' + net_data.iv_index
+        nonce = net_nonce(meta.is_ctrl_msg, meta.ttl, meta.seq, src,
+                          net_data.iv_index)
 
         enc_dst, enc_transport_pdu, net_mic = self._encrypt(soft_ctx,
                                                             transport_pdu,
                                                             encryption_key,
-                                                            net_nonce)
+                                                            nonce, meta)
 
-        obsfucated = self._obsfucate(ctl, ttl, seq, src, enc_dst,
-                                     enc_transport_pdu, net_mic, privacy_key,
-                                     net_data)
+        obsfucated = self._obsfucate(meta, src, enc_dst, enc_transport_pdu,
+                                     net_mic, privacy_key, net_data)
 
-        network_pdu = (ivi | nid).to_bytes(1, 'big') + obsfucated + enc_dst + \
-            enc_transport_pdu + net_mic
+        network_pdu = pack_network_pdu(ivi, nid, obsfucated, enc_dst,
+                                       enc_transport_pdu, net_mic)
 
         await self.send_queue.put((b'message_s', network_pdu))
 
-        self.__increment_seq(soft_ctx)
-
     # receive methods
-    def __search_network_by_nid(self, nid: int) -> NetworkData:
-        filenames = file_helper.list_files(base_dir + net_dir)
-
-        for f in filenames:
-            net_data = NetworkData.load(base_dir + net_dir + f)
-            net_nid, _, _ = self._gen_security_material(net_data)
-            if net_nid == nid:
-                return net_data
-
-        return None
-
-    def __search_node_by_addr(self, addr: bytes) -> NodeData:
-        filenames = file_helper.list_files(base_dir + node_dir)
-
-        for f in filenames:
-            node_data = NodeData.load(base_dir + node_dir + f)
-            if addr == node_data.addr:
-                return node_data
-
-        return None
-
-    def _clean_message(self, net_pdu: bytes, net_data: NetworkData) -> bytes:
-        _, _, privacy_key = self._gen_security_material(net_data)
+    def _clean_message(self, net_pdu: bytes, net_keys: NetworkKeys) -> bytes:
         privacy_random = net_pdu[7:14]
         obsfucated_data = net_pdu[1:7]
-        pecb = crypto.e(key=privacy_key, plaintext=b'\x00\x00\x00\x00\x00' +
-                        net_data.iv_index + privacy_random)
-        clean_result = self.__xor(obsfucated_data, pecb[0:6])
+        pecb = crypto.e(key=net_keys.privacy_key,
+                        plaintext=privacy_plaintext(
+                            net_keys.net_data.iv_index, privacy_random))
+        clean_result = xor(obsfucated_data, pecb[0:6])
         return clean_result
 
     # TODO [Enhancement] Check the seq number
-    def _fill_hard_ctx(self, clean_pdu: bytes):
-        self.hard_ctx.is_ctrl_msg = ((clean_pdu[0] & 0x80) >> 7) == 1
-        self.hard_ctx.ttl = clean_pdu[0] & 0x7f
-        self.hard_ctx.seq = int.from_bytes(clean_pdu[1:4], 'big')
+    def _parse_meta(self, clean_pdu: bytes) -> (NetworkMeta, bytes):
+        is_ctrl_msg, ttl, seq, src = unpack_net_header(clean_pdu)
+        return NetworkMeta(seq=seq, ttl=ttl, is_ctrl_msg=is_ctrl_msg), src
 
     def _decrypt(self, encrypted_pdu: bytes, src: bytes,
-                 net_data: NetworkData, net_mic: bytes) -> (bytes, bool):
-        _, encryption_key, _ = self._gen_security_material(net_data)
+                 net_keys: NetworkKeys, net_mic: bytes,
+                 meta: NetworkMeta) -> (bytes, bool):
+        net_data = net_keys.net_data
+        encryption_key = net_keys.encryption_key
 
-        ctl = 0x80 if self.hard_ctx.is_ctrl_msg else 0x00
-        ttl = self.hard_ctx.ttl
-        seq = self.hard_ctx.seq
-        network_nonce = b'\x00' + (ctl | ttl).to_bytes(1, 'big') + \
-            seq.to_bytes(3, 'big') + src + b'\x00\x00' + net_data.iv_index
+        ctl = 0x80 if meta.is_ctrl_msg else 0x00
+        ttl = meta.ttl
+        seq = meta.seq
+        network_nonce = net_nonce(meta.is_ctrl_msg, ttl, seq, src,
+                                  net_data.iv_index)
 
         decrypted_pdu, mic_is_ok = crypto.aes_ccm_decrypt(
             key=encryption_key, nonce=network_nonce, text=encrypted_pdu,
@@ -173,38 +147,40 @@ class NetworkLayer:
             if msg_type != b'message':
                 continue
 
-            # get network by nid
+            # get candidate networks by nid
             nid = net_pdu[0] & 0x7f
-            net_data = self.__search_network_by_nid(nid)
-            if not net_data:
-                continue
+            net_data = None
+            for net_keys in self.keyring.search_by_nid(nid):
+                # remove obsfucation
+                clean_pdu = self._clean_message(net_pdu, net_keys)
+
+                # get seq, ttl, is_ctrl_msg and src
+                meta, src_addr = self._parse_meta(clean_pdu)
+
+                # decrypting
+                mic_size = 8 if meta.is_ctrl_msg else 4
+                net_mic = net_pdu[-mic_size:]
+                encrypted_pdu = net_pdu[7:-mic_size]
+                decrypted_pdu, mic_is_ok = self._decrypt(encrypted_pdu,
+                                                         src_addr, net_keys,
+                                                         net_mic, meta)
+                if mic_is_ok:
+                    net_data = net_keys.net_data
+                    break
 
-            # remove obsfucation
-            clean_pdu = self._clean_message(net_pdu, net_data)
-
-            # update seq, is_ctrl_msg
-            self._fill_hard_ctx(clean_pdu)
-
-            # decrypting
-            src_addr = clean_pdu[-2:]
-            mic_size = 8 if self.hard_ctx.is_ctrl_msg else 4
-            net_mic = net_pdu[-mic_size:]
-            encrypted_pdu = net_pdu[7:-mic_size]
-            decrypted_pdu, mic_is_ok = self._decrypt(encrypted_pdu, src_addr,
-                                                     net_data, net_mic)
-            if not mic_is_ok:
                 self.log.debug(f'Src addr: {src_addr.hex()}')
                 self.log.debug(f'NetMIC wrong. Receive "{net_mic.hex()}"')
+
+            if not net_data:
                 continue
 
-            # update seq number in node_data YAML file
-            node_data = self.__search_node_by_addr(src_addr)
+            # update seq number of node
+            node_data = node_index.search_by_addr(src_addr)
             if not node_data:
                 self.log.debug(f'Node with addr {src_addr} is unknown')
                 continue
 
-            node_data.seq = self.hard_ctx.seq
-            node_data.save()
+            self.seq_allocator.observe(node_data.name, meta.seq)
 
             soft_ctx = SoftContext(src_addr=b'', dst_addr=b'', node_name='',
                                    network_name='', application_name='',
@@ -215,6 +191,5 @@ class NetworkLayer:
             soft_ctx.node_name = node_data.name
             soft_ctx.network_name = net_data.name
 
-            transport_pdu = decrypted_pdu[2:]
-            await self.transport_pdus.put((transport_pdu, soft_ctx,
-                                           self.hard_ctx.seq))
+            transport_pdu = memoryview(decrypted_pdu)[2:]
+            await self.transport_pdus.put((transport_pdu, soft_ctx, meta))
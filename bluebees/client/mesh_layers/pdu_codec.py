@@ -0,0 +1,98 @@
+from bluebees.client.mesh_layers.access_layer import opcode_len
+import struct
+
+
+NETWORK_NONCE = 0x00
+APPLICATION_NONCE = 0x01
+DEVICE_NONCE = 0x02
+
+# nonce type, ctl/ttl or aszmic with seq, src, dst, iv index
+_nonce = struct.Struct('>BI2s2s4s')
+# padding, iv index, privacy random
+_privacy_plaintext = struct.Struct('>5x4s7s')
+# opcode, seq zero, block ack
+_segment_ack = struct.Struct('>BHI')
+
+
+def xor(a: bytes, b: bytes) -> bytes:
+    size = len(a)
+    return (int.from_bytes(a, 'big') ^
+            int.from_bytes(b[0:size], 'big')).to_bytes(size, 'big')
+
+
+# * Network PDU
+def pack_net_header(ctl: bool, ttl: int, seq: int, src: bytes) -> bytes:
+    '''CTL, TTL, SEQ and SRC fields, before obfuscation'''
+    header = (((0x80 if ctl else 0x00) | (ttl & 0x7f)) << 40) | \
+        ((seq & 0xffffff) << 16) | int.from_bytes(src, 'big')
+    return header.to_bytes(6, 'big')
+
+
+def unpack_net_header(header: bytes) -> (bool, int, int, bytes):
+    return (header[0] & 0x80) == 0x80, header[0] & 0x7f, \
+        int.from_bytes(header[1:4], 'big'), bytes(header[4:6])
+
+
+def net_nonce(ctl: bool, ttl: int, seq: int, src: bytes,
+              iv_index: bytes) -> bytes:
+    ctl_ttl = (0x80 if ctl else 0x00) | (ttl & 0x7f)
+    return _nonce.pack(NETWORK_NONCE, (ctl_ttl << 24) | (seq & 0xffffff),
+                       src, b'\x00\x00', iv_index)
+
+
+def privacy_plaintext(iv_index: bytes, privacy_random: bytes) -> bytes:
+    return _privacy_plaintext.pack(bytes(iv_index), bytes(privacy_random))
+
+
+def pack_network_pdu(ivi: int, nid: int, obfuscated: bytes, enc_dst: bytes,
+                     enc_transport_pdu: bytes, net_mic: bytes) -> bytes:
+    return b''.join([(((ivi & 0x01) << 7) | (nid & 0x7f)).to_bytes(1, 'big'),
+                     obfuscated, enc_dst, enc_transport_pdu, net_mic])
+
+
+# * Transport PDU
+def app_nonce(is_devkey: bool, szmic: int, seq: int, src: bytes, dst: bytes,
+              iv_index: bytes) -> bytes:
+    nonce_type = DEVICE_NONCE if is_devkey else APPLICATION_NONCE
+    return _nonce.pack(nonce_type, ((szmic & 0x01) << 31) | (seq & 0xffffff),
+                       src, dst, iv_index)
+
+
+def pack_unseg_header(akf: int, aid: int) -> bytes:
+    return (((akf & 0x01) << 6) | (aid & 0x3f)).to_bytes(1, 'big')
+
+
+def pack_seg_header(akf: int, aid: int, szmic: int, seq_zero: int,
+                    seg_o: int, seg_n: int) -> bytes:
+    header = (0x80 | ((akf & 0x01) << 6) | (aid & 0x3f)) << 24
+    header |= (szmic & 0x01) << 23
+    header |= (seq_zero & 0x1fff) << 10
+    header |= (seg_o & 0x1f) << 5
+    header |= seg_n & 0x1f
+    return header.to_bytes(4, 'big')
+
+
+def unpack_seg_header(pdu: bytes) -> (int, int, int, int, int, int):
+    '''Returns akf, aid, szmic, seq zero, seg o and seg n'''
+    header = int.from_bytes(pdu[0:4], 'big')
+    return (header >> 30) & 0x01, (header >> 24) & 0x3f, \
+        (header >> 23) & 0x01, (header >> 10) & 0x1fff, \
+        (header >> 5) & 0x1f, header & 0x1f
+
+
+def pack_segment_ack(seq_zero: int, block_ack: int, obo=0) -> bytes:
+    return _segment_ack.pack(0x00, ((obo & 0x01) << 15) |
+                             ((seq_zero & 0x1fff) << 2), block_ack)
+
+
+def unpack_segment_ack(pdu: bytes) -> (int, int):
+    '''Returns seq zero and block ack'''
+    _, seq_zero, block_ack = _segment_ack.unpack_from(pdu)
+    return (seq_zero >> 2) & 0x1fff, block_ack
+
+
+# * Access PDU
+def split_access_pdu(access_pdu: bytes) -> (bytes, bytes):
+    '''Returns opcode and parameters'''
+    op_len = opcode_len(access_pdu[0:1])
+    return access_pdu[0:op_len], access_pdu[op_len:]
@@ -0,0 +1,135 @@
+from bluebees.client.node.node_data import NodeData, node_index
+from bluebees.client.data_paths import base_dir, node_dir
+from bluebees.common.storage import storage
+import time
+
+# time limits, in seconds, of the retransmission timeout
+MIN_RTO = 0.5
+MAX_RTO = 10.0
+INITIAL_RTO = 3.0
+# upper bound of a send followed by a response, used by the daemon calls
+MAX_CALL_TIMEOUT = 4 * MAX_RTO + 10
+
+
+# ! RTT smoothed as in TCP (RFC 6298). The samples are the time between the
+# !   end of a request send and its response, so they include the processing
+# !   time of the node and the hops of the mesh.
+class RttEstimator:
+
+    alpha = 1 / 8
+    beta = 1 / 4
+
+    def __init__(self, srtt=None, rttvar=None, min_rto=MIN_RTO,
+                 max_rto=MAX_RTO, initial_rto=INITIAL_RTO):
+        self.srtt = srtt
+        self.rttvar = rttvar
+
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.initial_rto = initial_rto
+
+        # doubled on each timeout, reset by the next sample
+        self.backoff = 1
+
+    def update(self, sample: float):
+        if self.srtt is None:
+            self.srtt = sample
+            self.rttvar = sample / 2
+        else:
+            self.rttvar = (1 - self.beta) * self.rttvar + \
+                self.beta * abs(self.srtt - sample)
+            self.srtt = (1 - self.alpha) * self.srtt + self.alpha * sample
+        self.backoff = 1
+
+    def timeout(self):
+        if self.rto() < self.max_rto:
+            self.backoff *= 2
+
+    def rto(self) -> float:
+        if self.srtt is None:
+            rto = self.initial_rto
+        else:
+            rto = self.srtt + 4 * self.rttvar
+        return min(max(rto * self.backoff, self.min_rto), self.max_rto)
+
+    def ack_timeout(self) -> float:
+        return 3 * self.rto()
+
+    def segment_timeout(self) -> float:
+        return 2 * self.rto()
+
+    def response_timeout(self) -> float:
+        return self.rto()
+
+
+# ! The estimators live in memory. The srtt and rttvar are persisted in the
+# !   node files in batch, at most once every `flush_interval` seconds and at
+# !   disconnect, and only the nodes whose srtt moved more than `min_change`
+# !   (relative) since the last save
+class RttTable:
+
+    def __init__(self, flush_interval=30.0, min_change=0.1):
+        self.flush_interval = flush_interval
+        self.min_change = min_change
+
+        # dst addr -> RttEstimator
+        self._estimators = {}
+        # dst addr -> srtt saved in node file
+        self._saved = {}
+        # dst addr of the estimators not saved yet
+        self._dirty = set()
+        self._last_flush = time.monotonic()
+
+    def estimator(self, addr: bytes) -> RttEstimator:
+        estimator = self._estimators.get(addr)
+        if estimator is None:
+            # group addresses hasn't node file, so its rtt lives only in memory
+            node_data = node_index.search_by_addr(addr)
+            if node_data:
+                estimator = RttEstimator(srtt=node_data.srtt,
+                                         rttvar=node_data.rttvar)
+                self._saved[addr] = node_data.srtt
+            else:
+                estimator = RttEstimator()
+            self._estimators[addr] = estimator
+        return estimator
+
+    def _moved(self, addr: bytes) -> bool:
+        saved = self._saved.get(addr)
+        if saved is None:
+            return True
+        srtt = self._estimators[addr].srtt
+        return abs(srtt - saved) > self.min_change * saved
+
+    def update(self, addr: bytes, sample: float):
+        self.estimator(addr).update(sample)
+
+        if self._moved(addr):
+            self._dirty.add(addr)
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def timeout(self, addr: bytes):
+        self.estimator(addr).timeout()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if not self._dirty:
+            return
+
+        with storage.transaction():
+            for addr in self._dirty:
+                node_data = node_index.search_by_addr(addr)
+                if not node_data:
+                    continue
+
+                # the seq allocator could have saved the node file after the
+                #   index
+                node_data = NodeData.load(base_dir + node_dir +
+                                          node_data.name + '.yml')
+                estimator = self._estimators[addr]
+                node_data.srtt = round(estimator.srtt, 4)
+                node_data.rttvar = round(estimator.rttvar, 4)
+                node_data.save()
+                self._saved[addr] = node_data.srtt
+        self._dirty.clear()
@@ -0,0 +1,69 @@
+from bluebees.client.node.node_data import NodeData, node_index
+from bluebees.client.data_paths import base_dir, node_dir
+from bluebees.common.storage import storage
+
+
+# ! The seq saved in node YAML file is the end of the last reserved block.
+# ! So, after a crash, the allocation restarts on the next block and a SEQ
+# !   number is never reused.
+class SeqAllocator:
+
+    def __init__(self, block_size=256):
+        self.block_size = block_size
+
+        # node name -> [next seq, end of reserved block]
+        self._blocks = {}
+        # node name -> biggest seq observed before the first reserve. Kept
+        #   in memory, so the receive path never touches the disk
+        self._observed = {}
+
+    def _reserve(self, node_name: str, start: int) -> list:
+        start = max(start, self._observed.pop(node_name, 0))
+
+        with storage.transaction():
+            node_data = NodeData.load(base_dir + node_dir + node_name +
+                                      '.yml')
+
+            # another process could have reserved a block after this one
+            start = max(start, node_data.seq)
+            end = start + self.block_size
+
+            node_data.seq = end
+            node_data.save()
+
+        self._blocks[node_name] = [start, end]
+        return self._blocks[node_name]
+
+    def _reserved_by_other(self, node_name: str, block: list) -> bool:
+        # ! another process (a command running without the daemon) reserved a
+        # !   block after this one, so its SEQs are bigger and the nodes would
+        # !   drop the SEQs left in this block as replays
+        node_data = node_index.search_by_name(node_name)
+        return node_data is not None and node_data.seq > block[1]
+
+    def _block(self, node_name: str) -> list:
+        block = self._blocks.get(node_name)
+        if block is None:
+            block = self._reserve(node_name, 0)
+        elif block[0] >= block[1] or self._reserved_by_other(node_name,
+                                                             block):
+            block = self._reserve(node_name, block[0])
+        return block
+
+    def current(self, node_name: str) -> int:
+        return self._block(node_name)[0]
+
+    def allocate(self, node_name: str) -> int:
+        block = self._block(node_name)
+        seq = block[0]
+        block[0] += 1
+        return seq
+
+    def observe(self, node_name: str, seq: int):
+        block = self._blocks.get(node_name)
+        if block is None:
+            if seq > self._observed.get(node_name, 0):
+                self._observed[node_name] = seq
+        elif seq > block[0]:
+            # * a seq beyond the block end is reserved on the next allocate
+            block[0] = seq
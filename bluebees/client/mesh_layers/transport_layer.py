@@ -1,21 +1,34 @@
 from bluebees.client.mesh_layers.network_layer import NetworkLayer
-from bluebees.client.mesh_layers.mesh_context import SoftContext
+from bluebees.client.mesh_layers.keyring import ApplicationKeyring
+from bluebees.client.mesh_layers.pdu_codec import app_nonce, \
+    pack_unseg_header, pack_seg_header, unpack_seg_header, \
+    pack_segment_ack, unpack_segment_ack
+from bluebees.client.mesh_layers.mesh_context import SoftContext, \
+                                            ReassemblyContext, NetworkMeta
 from bluebees.client.network.network_data import NetworkData
 from bluebees.client.application.application_data import ApplicationData
-from bluebees.client.node.node_data import NodeData
+from bluebees.client.node.node_data import NodeData, node_index
 from bluebees.client.data_paths import base_dir, net_dir, app_dir, node_dir
 from bluebees.common.logging import log_sys, INFO, DEBUG
-from bluebees.client.mesh_layers.address import address_type, UNICAST_ADDRESS, \
-                                       GROUP_ADDRESS
-from bluebees.client.node.group_data import find_group_by_addr
 from bluebees.common.crypto import crypto
-from bluebees.common.file import file_helper
 from typing import List
 import asyncio
 
 LT_MTU = 12
 
 
+# ! SAR timers, in milliseconds, both grow with the TTL, since each hop adds
+# !   delay to the segments and to the acks
+def ack_interval(ttl: int) -> float:
+    '''Time, in seconds, to wait before ack the received segments'''
+    return (150 + 50 * ttl) / 1000
+
+
+def retransmit_interval(ttl: int) -> float:
+    '''Time, in seconds, to wait an ack before resend the missing segments'''
+    return (200 + 50 * ttl) / 1000
+
+
 # ! Segment Acknowledgment message is a control message and the CTL value is 1,
 # !   and its sizemic is 64-bits
 # ! Control messages has sizemic equals to 64-bits, since access message has
@@ -33,31 +46,68 @@ class TransportLayer:
         self.log = log_sys.get_logger('transport_layer')
         self.log.set_level(INFO)
 
+        self.app_keyring = ApplicationKeyring()
+        self.app_keyring.refresh(force=True)
+
+        # addresses used by this element as source address
+        self.local_addrs = set()
+
+        # time, in seconds, to give up of a incomplete segmented message
+        self.incomplete_timeout = 10
+        # src_addr -> [incomplete timeout], of the messages expected from a
+        #   node. The bigger one is used
+        self.expected_segments = {}
+
+        # (src_addr, dst_addr, seq_zero) -> ReassemblyContext
+        self.reassembly_ctxs = {}
+        # (src_addr, dst_addr, seq_zero) -> block_ack, of completed messages
+        self.completed_ctxs = {}
+        self.max_completed_ctxs = 64
+
+        # times to resend the missing segments of a message without any ack
+        self.max_retransmissions = 4
+
+        # (dst_addr, seq_zero) -> asyncio.Queue of block acks
+        self.ack_waiters = {}
+
+        # (access_pdu: bytes, soft_ctx: SoftContext)
+        self.access_pdus = asyncio.Queue()
+
+    def expect_segments(self, src_addr: bytes, timeout: float):
+        self.expected_segments.setdefault(src_addr, []).append(timeout)
+
+    def forget_segments(self, src_addr: bytes, timeout: float):
+        timeouts = self.expected_segments.get(src_addr, [])
+        if timeout in timeouts:
+            timeouts.remove(timeout)
+        if not timeouts:
+            self.expected_segments.pop(src_addr, None)
+
+    def _incomplete_timeout(self, src_addr: bytes) -> float:
+        timeouts = self.expected_segments.get(src_addr)
+        if not timeouts:
+            return self.incomplete_timeout
+        return max(timeouts)
+
     # * Send Methods
-    def _encrypt_access_pdu(self, pdu: bytes, soft_ctx: SoftContext) -> bytes:
+    def _encrypt_access_pdu(self, pdu: bytes, soft_ctx: SoftContext,
+                            seq: int) -> bytes:
         net_data = NetworkData.load(base_dir + net_dir +
                                     soft_ctx.network_name + '.yml')
-        node_data = NodeData.load(base_dir + node_dir + soft_ctx.node_name +
-                                  '.yml')
-        self.net_layer.hard_ctx.seq = node_data.seq
 
         if not soft_ctx.is_devkey:
             app_data = ApplicationData.load(base_dir + app_dir +
                                             soft_ctx.application_name +
                                             '.yml')
             app_key = app_data.key
-            app_nonce = b'\x01\x00' + \
-                self.net_layer.hard_ctx.seq.to_bytes(3, 'big') + \
-                soft_ctx.src_addr + soft_ctx.dst_addr + net_data.iv_index
         else:
             node_data = NodeData.load(base_dir + node_dir +
                                       soft_ctx.node_name + '.yml')
             app_key = node_data.devkey
-            app_nonce = b'\x02\x00' + \
-                self.net_layer.hard_ctx.seq.to_bytes(3, 'big') + \
-                soft_ctx.src_addr + soft_ctx.dst_addr + net_data.iv_index
+        nonce = app_nonce(soft_ctx.is_devkey, 0, seq, soft_ctx.src_addr,
+                          soft_ctx.dst_addr, net_data.iv_index)
 
-        result, mic = crypto.aes_ccm_complete(key=app_key, nonce=app_nonce,
+        result, mic = crypto.aes_ccm_complete(key=app_key, nonce=nonce,
                                               text=pdu, adata=b'', mic_size=4)
 
         return result + mic
@@ -69,216 +119,151 @@ class TransportLayer:
                                             soft_ctx.application_name +
                                             '.yml')
             aid = crypto.k4(n=app_data.key)
-            unseg_tr_pdu = 0x40
         else:
             node_data = NodeData.load(base_dir + node_dir +
                                       soft_ctx.node_name + '.yml')
             aid = crypto.k4(n=node_data.devkey)
-            unseg_tr_pdu = 0x00
-
-        unseg_tr_pdu = (unseg_tr_pdu | (int.from_bytes(aid, 'big') &
-                        0x3f)).to_bytes(1, 'big')
-        unseg_tr_pdu += pdu
 
-        return unseg_tr_pdu
+        return pack_unseg_header(int(not soft_ctx.is_devkey), aid[0]) + pdu
 
     def __header_segmented_transport_pdu(self, soft_ctx: SoftContext,
-                                         seg_o: int) -> bytes:
-        net_data = NetworkData.load(base_dir + net_dir +
-                                    soft_ctx.network_name + '.yml')
-        node_data = NodeData.load(base_dir + node_dir + soft_ctx.node_name +
-                                  '.yml')
-        seq_auth = (int.from_bytes(net_data.iv_index, 'big') << 24) | \
-            node_data.seq
-        self.net_layer.hard_ctx.seq_zero = seq_auth & 0x1fff
-
-        first_byte = 0x80
+                                         seq_zero: int, seg_o: int,
+                                         seg_n: int) -> bytes:
         if not soft_ctx.is_devkey:
             app_data = ApplicationData.load(base_dir + app_dir +
                                             soft_ctx.application_name +
                                             '.yml')
             aid = crypto.k4(n=app_data.key)
-            first_byte = first_byte | 0x40
         else:
             node_data = NodeData.load(base_dir + node_dir +
                                       soft_ctx.node_name + '.yml')
             aid = crypto.k4(n=node_data.devkey)
-        first_byte = (first_byte | (aid[0] & 0x3f)).to_bytes(1, 'big')
 
-        cont = (self.net_layer.hard_ctx.seg_n & 0x1f)
-        cont = cont | ((seg_o & 0x1f) << 5)
-        cont = cont | ((self.net_layer.hard_ctx.seq_zero & 0x1fff) << 10)
-        cont = cont.to_bytes(3, 'big')
+        return pack_seg_header(int(not soft_ctx.is_devkey), aid[0], 0,
+                               seq_zero, seg_o, seg_n)
 
-        return first_byte + cont
-
-    def _segmented_transport_pdu(self, pdu: bytes,
-                                 soft_ctx: SoftContext) -> List[bytes]:
-        self.net_layer.hard_ctx.seg_n = (len(pdu) - 1) // LT_MTU
+    def _segmented_transport_pdu(self, pdu: bytes, soft_ctx: SoftContext,
+                                 seq: int) -> List[bytes]:
+        # the lower 13 bits of SeqAuth, the iv index is on upper bits
+        seq_zero = seq & 0x1fff
+        seg_n = (len(pdu) - 1) // LT_MTU
         segments = []
 
-        for seg_o in range(self.net_layer.hard_ctx.seg_n + 1):
-            header = self.__header_segmented_transport_pdu(soft_ctx, seg_o)
+        for seg_o in range(seg_n + 1):
+            header = self.__header_segmented_transport_pdu(soft_ctx, seq_zero,
+                                                           seg_o, seg_n)
             segments.append(header + pdu[0:LT_MTU])
             pdu = pdu[LT_MTU:]
 
         return segments
 
-    # * Notes
-    # *  - In this implementation, all received message, with dst addr setted
-    # *  to a group address, will be discard
-    # *  - In this implementation, the nodes contains only one element
-    def __check_addresses(self, recv_ctx: SoftContext,
-                          ctx: SoftContext) -> bool:
-        if address_type(recv_ctx.dst_addr) == UNICAST_ADDRESS:
-            send_dst_type = address_type(ctx.dst_addr)
-            if send_dst_type == UNICAST_ADDRESS:
-                return (recv_ctx.dst_addr == ctx.src_addr) and \
-                    (recv_ctx.src_addr == ctx.dst_addr)
-            elif send_dst_type == GROUP_ADDRESS:
-                group = find_group_by_addr(ctx.dst_addr)
-                if not group:
-                    return False
-
-                return (recv_ctx.dst_addr == ctx.src_addr) and \
-                    (recv_ctx.src_addr in group.sub_addrs)
-        else:
-            return False
+    async def _send_segments(self, soft_ctx: SoftContext,
+                             segments: List[bytes], ack_bits: int):
+        for i, seg in enumerate(segments):
+            if ack_bits & (1 << i):
+                continue
+            meta = self.net_layer.new_meta(soft_ctx, False)
+            await self.net_layer.send_pdu(seg, soft_ctx, meta)
+            self.log.debug(f'Send segment: {i}|{seg.hex()}')
 
-    async def _wait_ack(self, soft_ctx: SoftContext, segments: List[bytes]):
+    async def _wait_ack(self, soft_ctx: SoftContext, segments: List[bytes],
+                        block_acks: asyncio.Queue) -> bool:
         ack_bits = 0
-        expected_ack_bits = (2 ** (self.net_layer.hard_ctx.seg_n + 1)) - 1
+        expected_ack_bits = (2 ** len(segments)) - 1
+        interval = retransmit_interval(self.net_layer.default_ttl)
+        retransmissions = 0
         while True:
             self.log.debug(f'Waiting ack...')
-            ack_pdu, r_ctx, seq_num = await self.net_layer.transport_pdus.get()
-            self.log.debug(f'Got ack')
-
-            # not same src and dst address (discard)
-            if not self.__check_addresses(r_ctx, soft_ctx):
-                self.log.debug(f'Src {r_ctx.src_addr.hex()}, '
-                               f'Dst: {r_ctx.dst_addr.hex()}')
-                continue
-
-            # not control message (discard)
-            if not self.net_layer.hard_ctx.is_ctrl_msg:
-                self.log.debug('Not control message')
-                continue
+            try:
+                block_ack = await asyncio.wait_for(block_acks.get(), interval)
+            except asyncio.TimeoutError:
+                if retransmissions >= self.max_retransmissions:
+                    self.log.debug('Max retransmissions reached')
+                    return False
+                retransmissions += 1
+            else:
+                # block ack equals to 0, the receiver cancelled the message
+                if block_ack == 0:
+                    self.log.debug('Segmented message cancelled')
+                    return False
 
-            # not ack pdu (discard)
-            if ack_pdu[0] != 0x00:
-                self.log.debug('Not ack pdu')
-                continue
+                ack_bits = ack_bits | block_ack
+                self.log.debug(f'Ack bits: {hex(ack_bits)}')
+                if ack_bits == expected_ack_bits:
+                    return True
+                # the receiver is alive, so it has more retries
+                retransmissions = 0
 
-            # seq zero wrong (discard)
-            pdu_seq_zero = (int.from_bytes(ack_pdu[1:3], 'big') & 0x7ffc) >> 2
-            if pdu_seq_zero != self.net_layer.hard_ctx.seq_zero:
-                self.log.debug(f'Seq_zero: {pdu_seq_zero}')
-                continue
-
-            ack_bits = ack_bits | int.from_bytes(ack_pdu[3:7], 'big')
-            self.log.debug(f'Ack bits: {hex(ack_bits)}')
-            if ack_bits == expected_ack_bits:
-                return
-            else:
-                # resend missing segments
-                bits = ack_bits
-                for i, seg in enumerate(segments):
-                    if bits & 0x01 == 0:
-                        self.log.debug(f'Send segment: {i}|{seg.hex()}')
-                        await self.net_layer.send_pdu(seg, soft_ctx)
-                    bits = bits >> 1
-                self.log.debug(f'Ack bits [a]: {hex(ack_bits)}')
+            # resend only the missing segments
+            await self._send_segments(soft_ctx, segments, ack_bits)
 
     async def send_pdu(self, access_pdu: bytes, soft_ctx: SoftContext):
         success = False
 
-        crypt_access_pdu = self._encrypt_access_pdu(access_pdu, soft_ctx)
+        self.local_addrs.add(soft_ctx.src_addr)
+
+        # the first network pdu uses the seq of access pdu nonce (SeqAuth)
+        meta = self.net_layer.new_meta(soft_ctx, False)
+        crypt_access_pdu = self._encrypt_access_pdu(access_pdu, soft_ctx,
+                                                    meta.seq)
 
         if len(crypt_access_pdu) <= LT_MTU:
             transport_pdu = self._unsegmented_transport_pdu(crypt_access_pdu,
                                                             soft_ctx)
-            self.net_layer.hard_ctx.is_ctrl_msg = False
 
-            await self.net_layer.send_pdu(transport_pdu, soft_ctx)
+            await self.net_layer.send_pdu(transport_pdu, soft_ctx, meta)
 
             success = True
         else:
             segments = self._segmented_transport_pdu(crypt_access_pdu,
-                                                     soft_ctx)
-            self.net_layer.hard_ctx.is_ctrl_msg = False
-
-            for i, seg in enumerate(segments):
-                await self.net_layer.send_pdu(seg, soft_ctx)
-                self.log.debug(f'Send segment: {i}|{seg.hex()}')
+                                                     soft_ctx, meta.seq)
+            ack_key = (soft_ctx.dst_addr, meta.seq & 0x1fff)
+            block_acks = asyncio.Queue()
+            self.ack_waiters[ack_key] = block_acks
 
             try:
-                await asyncio.wait_for(self._wait_ack(soft_ctx, segments),
-                                       soft_ctx.ack_timeout)
-                success = True
+                await self.net_layer.send_pdu(segments[0], soft_ctx, meta)
+                self.log.debug(f'Send segment: 0|{segments[0].hex()}')
+                await self._send_segments(soft_ctx, segments, 0x01)
+
+                success = await asyncio.wait_for(
+                    self._wait_ack(soft_ctx, segments, block_acks),
+                    soft_ctx.ack_timeout)
             except asyncio.TimeoutError:
                 self.log.debug('Wait ack timeout')
+            finally:
+                del self.ack_waiters[ack_key]
 
         return success
 
     # * Receive Methods
-    async def __send_ack(self, seg_o_table: dict, soft_ctx: SoftContext):
-        if not seg_o_table:
-            return
-
-        pdu = 0x00
-        pdu = pdu | ((self.net_layer.hard_ctx.seq_zero & 0x1fff) << 2)
-        pdu = pdu.to_bytes(3, 'big')
-        block_ack = 0x0000_0001
-        for k, _ in seg_o_table.items():
-            block_ack = block_ack | (1 << k)
-            self.log.debug(f'block ack: {block_ack}, k: {k}')
-        pdu += block_ack.to_bytes(4, 'big')
-
-        self.log.debug(f'Ack seq zero: '
-                       f'{hex(self.net_layer.hard_ctx.seq_zero)}')
-        self.net_layer.hard_ctx.is_ctrl_msg = True
-        await self.net_layer.send_pdu(pdu, soft_ctx)
-
-    def __search_application_by_aid(self, aid: int) -> str:
-        filenames = file_helper.list_files(base_dir + app_dir)
-
-        for f in filenames:
-            app_data = ApplicationData.load(base_dir + app_dir + f)
-            app_aid = crypto.k4(n=app_data.key)
-            if app_aid == aid:
-                return app_data.name
-
-        return None
-
-    def __search_node_by_addr(self, addr: bytes) -> str:
-        filenames = file_helper.list_files(base_dir + node_dir)
-
-        for f in filenames:
-            node_data = NodeData.load(base_dir + node_dir + f)
-            if addr == node_data.addr:
-                return node_data.name
-
-        return ''
-
-    def _fill_hard_ctx(self, start_pdu: bytes):
-        self.net_layer.hard_ctx.szmic = (start_pdu[1] & 0x80) >> 7
-        self.net_layer.hard_ctx.seq_zero = \
-            (int.from_bytes(start_pdu[1:3], 'big') & 0x7ffc) >> 2
-        self.net_layer.hard_ctx.seg_o = \
-            (int.from_bytes(start_pdu[2:4], 'big') & 0x03e0) >> 5
-        self.net_layer.hard_ctx.seg_n = start_pdu[3] & 0x1f
-
-        self.log.debug(f'Seq zero: {hex(self.net_layer.hard_ctx.seq_zero)}')
+    async def __send_ack(self, seq_zero: int, block_ack: int,
+                         r_ctx: SoftContext):
+        pdu = pack_segment_ack(seq_zero, block_ack)
+
+        # the ack is sent back to the source of segmented message
+        soft_ctx = SoftContext(src_addr=r_ctx.dst_addr,
+                               dst_addr=r_ctx.src_addr,
+                               node_name=r_ctx.node_name,
+                               network_name=r_ctx.network_name,
+                               application_name='', is_devkey=False,
+                               ack_timeout=0, segment_timeout=0)
+
+        self.log.debug(f'Ack seq zero: {hex(seq_zero)}, block ack: '
+                       f'{hex(block_ack)}')
+        meta = self.net_layer.new_meta(soft_ctx, True)
+        await self.net_layer.send_pdu(pdu, soft_ctx, meta)
 
     def _fill_soft_ctx(self, start_pdu: bytes,
                        ctx: SoftContext) -> SoftContext:
-        afk = start_pdu[0] & 0x40 >> 6
+        afk = (start_pdu[0] & 0x40) >> 6
         aid = start_pdu[0] & 0x3f
         if afk == 1:
-            app_name = self.__search_application_by_aid(aid)
-            if not app_name:
+            if not self.app_keyring.search_by_aid(aid):
                 return None
-            ctx.application_name = app_name
+            # * the application is found on decryption, there may be more
+            # *   than one application with this aid
+            ctx.application_name = ''
             ctx.is_devkey = False
         else:
             ctx.application_name = ''
@@ -286,16 +271,10 @@ class TransportLayer:
 
         return ctx
 
-    def _join_segments(self, sorted_segments: List[bytes]) -> bytes:
-        tr_pdu = b''
-        for seg in sorted_segments:
-            tr_pdu += seg[4:]
-
-        return tr_pdu
-
     def _decrypt_transport_pdu(self, pdu: bytes, ctx: SoftContext,
-                               first_seq: int) -> bytes:
-        if self.net_layer.hard_ctx.szmic == 0:
+                               first_seq: int, szmic: int,
+                               aid: int) -> bytes:
+        if szmic == 0:
             encrypted_pdu = pdu[0:-4]
             transport_mic = pdu[-4:]
         else:
@@ -305,8 +284,10 @@ class TransportLayer:
         self.log.debug(f'Encrypted pdu: {encrypted_pdu.hex()}, mic = '
                        f'{transport_mic.hex()}')
 
-        net_data = NetworkData.load(base_dir + net_dir + ctx.network_name +
-                                    '.yml')
+        net_keys = self.net_layer.keyring.search_by_name(ctx.network_name)
+        if not net_keys:
+            self.log.debug('No network found')
+            return None
 
         if ctx.is_devkey:
             self.log.debug(f'Using devkey, node name [{ctx.node_name}]')
@@ -314,163 +295,171 @@ class TransportLayer:
                 self.log.debug('No node found')
                 return None
 
-            node_data = NodeData.load(base_dir + node_dir + ctx.node_name +
-                                      '.yml')
-            key = node_data.devkey
-            nonce = b'\x02'
-        else:
-            app_data = ApplicationData.load(base_dir + app_dir +
-                                            ctx.application_name + '.yml')
-            key = app_data.key
-            nonce = b'\x01'
-
-        nonce += (self.net_layer.hard_ctx.szmic << 7).to_bytes(1, 'big')
-        nonce += (first_seq).to_bytes(3, 'big')
-        nonce += ctx.src_addr
-        nonce += ctx.dst_addr
-        nonce += net_data.iv_index
-
-        access_pdu, mic_is_ok = crypto.aes_ccm_decrypt(key=key, nonce=nonce,
-                                                       text=encrypted_pdu,
-                                                       mic=transport_mic)
-
-        self.log.debug(f'Access PDU: {access_pdu.hex()}, first seq: '
-                       f'{hex(first_seq)}')
-
-        if not mic_is_ok:
-            self.log.debug(f'Mic is wrong, pdu: {access_pdu.hex()}, seq: '
-                           f'{hex(first_seq)}')
-            return None
+            node_data = node_index.search_by_name(ctx.node_name)
+            if not node_data:
+                self.log.debug('No node found')
+                return None
+            candidates = [('', node_data.devkey)]
         else:
-            return access_pdu
-
-    async def _collect_segments(self, soft_ctx: SoftContext) -> List[bytes]:
-        seg_o_table = {}
-        ack_counter = 0
-        while len(seg_o_table) < self.net_layer.hard_ctx.seg_n:
-            self.log.debug('Waiting segment')
-            pdu, r_ctx, seq_num = await self.net_layer.transport_pdus.get()
-            self.log.debug(f'Got segment, pdu: {pdu.hex()}')
-
-            seq_zero = (int.from_bytes(pdu[1:3], 'big') & 0x7ffc) >> 2
-            if seq_zero != self.net_layer.hard_ctx.seq_zero:
-                self.log.debug('Seq zero diff')
-                continue
-
-            # not same src and dst address (discard)
-            if not self.__check_addresses(r_ctx, soft_ctx):
-                self.log.debug('Invalid address')
-                continue
-
-            # each 10 messages received, sent a ack
-            if ack_counter >= 10:
-                await self.__send_ack(seg_o_table, soft_ctx)
-                ack_counter = 0
-            else:
-                ack_counter += 1
-
-            # control message (discard)
-            if self.net_layer.hard_ctx.is_ctrl_msg:
-                self.log.debug('Control message')
-                continue
-
-            # unsegmented pdu (discard)
-            if ((pdu[0] & 0x80) >> 7) == 0:
-                self.log.debug('unsegmented pdu')
-                continue
-
-            seg_o = (int.from_bytes(pdu[2:4], 'big') & 0x03e0) >> 5
-            # segment already received (discard)
-            if seg_o in seg_o_table.keys():
-                self.log.debug('unsegmented pdu')
-                continue
+            candidates = [(k.app_data.name, k.app_data.key) for k in
+                          self.app_keyring.search_by_aid(aid)]
+
+        nonce = app_nonce(ctx.is_devkey, szmic, first_seq, ctx.src_addr,
+                          ctx.dst_addr, net_keys.net_data.iv_index)
+
+        # * on aid collision, the candidates are tried in order
+        for app_name, key in candidates:
+            access_pdu, mic_is_ok = crypto.aes_ccm_decrypt(
+                key=key, nonce=nonce, text=encrypted_pdu, mic=transport_mic)
+            if mic_is_ok:
+                ctx.application_name = app_name
+                self.log.debug(f'Access PDU: {access_pdu.hex()}, first seq: '
+                               f'{hex(first_seq)}')
+                return access_pdu
+
+        self.log.debug(f'Mic is wrong, first seq: {hex(first_seq)}')
+        return None
 
-            self.log.debug('correct segment')
-            seg_o_table[seg_o] = pdu
+    def _recv_ctrl_pdu(self, pdu: bytes, r_ctx: SoftContext):
+        # not ack pdu (discard)
+        if pdu[0] != 0x00 or len(pdu) < 7:
+            self.log.debug('Not ack pdu')
+            return
 
-        # send ack message
-        await self.__send_ack(seg_o_table, soft_ctx)
+        seq_zero, block_ack = unpack_segment_ack(pdu)
+        block_acks = self.ack_waiters.get((r_ctx.src_addr, seq_zero))
+        if block_acks is None:
+            self.log.debug(f'No message waiting ack. Src '
+                           f'{r_ctx.src_addr.hex()}, seq zero: {seq_zero}')
+            return
 
-        segments = []
-        for _, v in seg_o_table.items():
-            segments.append(v)
+        block_acks.put_nowait(block_ack)
 
-        return segments
+    async def _recv_unsegmented_pdu(self, pdu: bytes, r_ctx: SoftContext,
+                                    seq: int):
+        self.log.debug(f'Is unsegmented. PDU: {pdu.hex()}')
 
-    async def recv_pdu(self, segment_timeout: int,
-                       soft_ctx: SoftContext) -> (bytes, SoftContext):
-        start_pdu, r_ctx, seq_num = await self.net_layer.transport_pdus.get()
+        r_ctx = self._fill_soft_ctx(start_pdu=pdu, ctx=r_ctx)
+        if not r_ctx:
+            return
 
-        while self.net_layer.hard_ctx.is_ctrl_msg:
-            start_pdu, r_ctx, seq_num = \
-                await self.net_layer.transport_pdus.get()
+        access_pdu = self._decrypt_transport_pdu(pdu[1:], r_ctx, seq, 0,
+                                                 pdu[0] & 0x3f)
+        if not access_pdu:
+            return
 
-        self.log.debug('Testing if is segmented...')
-        if ((start_pdu[0] & 0x80) >> 7) == 0:
-            # unsegmented pdu
-            self.log.debug(f'Is unsegmented. PDU: {start_pdu.hex()}')
+        await self.access_pdus.put((access_pdu, r_ctx))
+
+    def _drop_reassembly_ctx(self, key: tuple):
+        self.log.debug(f'Giving up of segmented message. Src: '
+                       f'{key[0].hex()}, seq zero: {hex(key[2])}')
+        ctx = self.reassembly_ctxs.pop(key, None)
+        if ctx and ctx.incomplete_timer:
+            ctx.incomplete_timer.cancel()
+        if ctx and ctx.ack_timer:
+            ctx.ack_timer.cancel()
+
+    def _ack_timer_expired(self, ctx: ReassemblyContext):
+        ctx.ack_timer = None
+        asyncio.ensure_future(self.__send_ack(ctx.seq_zero, ctx.block_ack,
+                                              ctx.soft_ctx))
+
+    def _restart_incomplete_timer(self, key: tuple, ctx: ReassemblyContext):
+        if ctx.incomplete_timer:
+            ctx.incomplete_timer.cancel()
+        loop = asyncio.get_event_loop()
+        ctx.incomplete_timer = loop.call_later(ctx.incomplete_timeout,
+                                               self._drop_reassembly_ctx, key)
+
+    def _complete_reassembly_ctx(self, key: tuple, ctx: ReassemblyContext):
+        if ctx.incomplete_timer:
+            ctx.incomplete_timer.cancel()
+        if ctx.ack_timer:
+            ctx.ack_timer.cancel()
+            ctx.ack_timer = None
+        del self.reassembly_ctxs[key]
+
+        self.completed_ctxs[key] = ctx.block_ack
+        if len(self.completed_ctxs) > self.max_completed_ctxs:
+            del self.completed_ctxs[next(iter(self.completed_ctxs))]
+
+    async def _recv_segment(self, pdu: bytes, r_ctx: SoftContext,
+                            meta: NetworkMeta):
+        seq = meta.seq
+        _, aid, szmic, seq_zero, seg_o, seg_n = unpack_seg_header(pdu)
+        key = (r_ctx.src_addr, r_ctx.dst_addr, seq_zero)
+
+        # message already received, the ack was lost
+        if key in self.completed_ctxs:
+            await self.__send_ack(seq_zero, self.completed_ctxs[key], r_ctx)
+            return
 
-            # filling soft context
-            r_ctx = self._fill_soft_ctx(start_pdu=start_pdu, ctx=r_ctx)
+        ctx = self.reassembly_ctxs.get(key)
+        if ctx is None:
+            r_ctx = self._fill_soft_ctx(start_pdu=pdu, ctx=r_ctx)
             if not r_ctx:
-                return None, None
-
-            # checking addresses
-            if not self.__check_addresses(r_ctx, soft_ctx):
-                self.log.debug('Not same address')
-                return None, None
-
-            # decrypting pdu
-            self.log.debug('Start decrypting...')
-            access_pdu = self._decrypt_transport_pdu(
-                start_pdu[1:], r_ctx, seq_num)
-            self.log.debug('End decrypt')
-            if not access_pdu:
-                return None, None
-        else:
-            # segmented pdu
+                self.log.debug(f'not soft ctx')
+                return
 
-            # store the seq number of first segment
-            first_seq = seq_num
-            self.log.debug(f'First seq: {hex(first_seq)}')
+            ctx = ReassemblyContext(
+                soft_ctx=r_ctx, seq_zero=seq_zero, seg_n=seg_n, szmic=szmic,
+                first_seq=seq - ((seq - seq_zero) & 0x1fff), aid=aid,
+                buffer=bytearray((seg_n + 1) * LT_MTU), size=0,
+                block_ack=0,
+                incomplete_timeout=self._incomplete_timeout(r_ctx.src_addr))
+            self.reassembly_ctxs[key] = ctx
+            self.log.debug(f'New segmented message. Src: '
+                           f'{r_ctx.src_addr.hex()}, seq zero: '
+                           f'{hex(seq_zero)}')
+
+        # segment already received (discard)
+        if ctx.block_ack & (1 << seg_o) or seg_o > ctx.seg_n:
+            self.log.debug('Segment already received')
+            return
 
-            # filling hard context
-            self.log.debug(f'Is segmented. PDU: {start_pdu.hex()}')
-            self._fill_hard_ctx(start_pdu)
+        segment = pdu[4:]
+        offset = seg_o * LT_MTU
+        ctx.buffer[offset:offset + len(segment)] = segment
+        if seg_o == ctx.seg_n:
+            ctx.size = offset + len(segment)
+        ctx.block_ack = ctx.block_ack | (1 << seg_o)
+
+        if ctx.is_complete():
+            self._complete_reassembly_ctx(key, ctx)
+            await self.__send_ack(seq_zero, ctx.block_ack, ctx.soft_ctx)
+
+            transport_pdu = memoryview(ctx.buffer)[0:ctx.size]
+            access_pdu = self._decrypt_transport_pdu(transport_pdu,
+                                                     ctx.soft_ctx,
+                                                     ctx.first_seq, ctx.szmic,
+                                                     ctx.aid)
+            if not access_pdu:
+                return
 
-            # filling soft context
-            self.log.debug(f'fill soft ctx')
-            r_ctx = self._fill_soft_ctx(start_pdu=start_pdu, ctx=r_ctx)
-            if not r_ctx:
-                self.log.debug(f'not soft ctx')
-                return None, None
+            await self.access_pdus.put((access_pdu, ctx.soft_ctx))
+            return
 
-            # checking addresses
-            if not self.__check_addresses(r_ctx, soft_ctx):
-                self.log.debug('Not same address')
-                return None, None
+        # a slow transfer isn't dropped while its segments keep arriving
+        self._restart_incomplete_timer(key, ctx)
 
-            # collecting segments
-            try:
-                self.log.debug(f'collect segments')
-                sorted_segments = \
-                    await asyncio.wait_for(self._collect_segments(soft_ctx),
-                                           segment_timeout)
-            except Exception as e:
-                raise e
-            except asyncio.TimeoutError:
-                self.log.debug('Giving up of segmented message')
+        # the segments received until the ack timer expires are acked together
+        if ctx.ack_timer is None:
+            loop = asyncio.get_event_loop()
+            ctx.ack_timer = loop.call_later(ack_interval(meta.ttl),
+                                            self._ack_timer_expired, ctx)
 
-            # join segments
-            self.log.debug(f'join segments')
-            transport_pdu = self._join_segments([start_pdu] + sorted_segments)
+    async def recv_task(self):
+        while True:
+            pdu, r_ctx, meta = await self.net_layer.transport_pdus.get()
 
-            # decrypting pdu
-            self.log.debug(f'decryption pdu')
-            access_pdu = self._decrypt_transport_pdu(transport_pdu, r_ctx,
-                                                     first_seq)
-            if not access_pdu:
-                return None, None
+            # message to another element (discard)
+            if r_ctx.dst_addr not in self.local_addrs:
+                self.log.debug(f'Dst: {r_ctx.dst_addr.hex()}')
+                continue
 
-        self.log.debug(f'ret pdu')
-        return access_pdu, r_ctx
+            if meta.is_ctrl_msg:
+                self._recv_ctrl_pdu(pdu, r_ctx)
+            elif ((pdu[0] & 0x80) >> 7) == 0:
+                await self._recv_unsegmented_pdu(pdu, r_ctx, meta.seq)
+            else:
+                await self._recv_segment(pdu, r_ctx, meta)
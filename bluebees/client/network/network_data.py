@@ -2,7 +2,8 @@ from dataclasses import dataclass
 from bluebees.common.serializable import Serializable
 from typing import List
 from bluebees.client.data_paths import base_dir, net_dir
-from bluebees.common.file import file_helper
+from bluebees.common.storage import storage
+from bluebees.common.crypto import crypto
 
 
 @dataclass
@@ -30,9 +31,13 @@ class NetworkData(Serializable):
                f'IV Index: {self.iv_index.hex()}\n' \
                f'Applications: {self.apps}\nNodes: {self.nodes}'
 
+    def index_columns(self) -> dict:
+        nid = crypto.k2(n=self.key, p=b'\x00')[0] & 0x7f
+        return {'name': self.name, 'nid': nid, 'key_index': self.key_index}
+
 
 def net_name_list() -> list:
-    filenames = file_helper.list_files(base_dir + net_dir)
+    filenames = storage.list_files(base_dir + net_dir)
     if not filenames:
         return False
 
@@ -45,24 +50,8 @@ def net_name_list() -> list:
 
 
 def net_key_list() -> list:
-    filenames = file_helper.list_files(base_dir + net_dir)
-    if not filenames:
-        return []
-
-    netkeys = []
-    for file in filenames:
-        net = NetworkData.load(base_dir + net_dir + file)
-        netkeys.append(net.key)
-    return netkeys
+    return [net.key for net in NetworkData.load_all(base_dir + net_dir)]
 
 
 def net_key_index_list() -> list:
-    filenames = file_helper.list_files(base_dir + net_dir)
-    if not filenames:
-        return []
-
-    net_key_indexes = []
-    for file in filenames:
-        net = NetworkData.load(base_dir + net_dir + file)
-        net_key_indexes.append(net.key_index)
-    return net_key_indexes
+    return NetworkData.values(base_dir + net_dir, 'key_index')
@@ -3,8 +3,11 @@ from bluebees.client.application.application_data import ApplicationData, app_na
 from bluebees.client.network.network_data import NetworkData
 from bluebees.client.data_paths import base_dir, node_dir, app_dir, net_dir
 from bluebees.client.mesh_layers.mesh_context import SoftContext
-from bluebees.client.mesh_layers.element import Element
+from bluebees.client.mesh_layers.rtt_estimator import MAX_CALL_TIMEOUT
+from bluebees.common.storage import storage
 from bluebees.common.utils import run_seq
+from bluebees.client.core.daemon import daemon_call, ctx_to_dict, \
+                                        DaemonTimeout, DaemonError
 import click
 import asyncio
 import traceback
@@ -26,6 +29,29 @@ def validate_app(ctx, param, value):
     return value
 
 
+def check_response(content: bytes, key_index: bytes, node_data: NodeData,
+                   app_data: ApplicationData):
+    if content:
+        if content[0] == 0:
+            if content[1:] == key_index:
+                click.echo(click.style('App key add with successful',
+                                       fg='green'))
+                with storage.transaction():
+                    if app_data.name not in node_data.apps:
+                        node_data.apps.append(app_data.name)
+                        node_data.save()
+
+                    if node_data.name not in app_data.nodes:
+                        app_data.nodes.append(node_data.name)
+                        app_data.save()
+            else:
+                click.echo(click.style(f'Wrong key index: {content[1:].hex()}',
+                                       fg='red'))
+        else:
+            click.echo(click.style(f'Fail. Error code: {content[0:1].hex()}',
+                                   fg='red'))
+
+
 @click.command()
 @click.option('--target', '-t', type=str, default='', required=True,
               help='Specify the name of node target', callback=validate_target)
@@ -48,45 +74,49 @@ def add_appkey(target, app):
     r_opcode = b'\x80\x03'
     parameters = key_index + app_data.key
 
+    context = SoftContext(src_addr=b'\x00\x01',
+                          dst_addr=node_data.addr,
+                          node_name=node_data.name,
+                          network_name=node_data.network,
+                          application_name='',
+                          is_devkey=True,
+                          ack_timeout=None,
+                          segment_timeout=None)
+    try:
+        result = daemon_call('request', {'opcode': opcode.hex(),
+                                         'parameters': parameters.hex(),
+                                         'r_opcode': r_opcode.hex(),
+                                         'ctx': ctx_to_dict(context),
+                                         'segment_timeout': None,
+                                         'timeout': None},
+                             timeout=MAX_CALL_TIMEOUT)
+    except DaemonTimeout:
+        click.echo(click.style('Daemon not responding', fg='red'))
+        return
+    except DaemonError as e:
+        click.echo(click.style(f'Daemon error [{e}]', fg='red'))
+        return
+    if result is not None:
+        content = result['content']
+        check_response(bytes.fromhex(content) if content else None,
+                       key_index, node_data, app_data)
+        return
+
+    # * the mesh layers are imported only when the daemon isn't running
+    from bluebees.client.mesh_layers.element import Element
+
     try:
         loop = asyncio.get_event_loop()
         client_element = Element()
-        context = SoftContext(src_addr=b'\x00\x01',
-                              dst_addr=node_data.addr,
-                              node_name=node_data.name,
-                              network_name=node_data.network,
-                              application_name='',
-                              is_devkey=True,
-                              ack_timeout=10,
-                              segment_timeout=3)
         run_seq_t = run_seq([
             client_element.spwan_tasks(loop),
-            client_element.send_message(opcode=opcode, parameters=parameters,
-                                        ctx=context),
-            client_element.recv_message(opcode=r_opcode, segment_timeout=3,
-                                        timeout=10, ctx=context)
+            client_element.request(opcode=opcode, parameters=parameters,
+                                   r_opcode=r_opcode, ctx=context,
+                                   segment_timeout=None, timeout=None)
         ])
         results = loop.run_until_complete(run_seq_t)
 
-        content = results[2][0]
-        if content:
-            if content[0] == 0:
-                if content[1:] == key_index:
-                    click.echo(click.style('App key add with successful',
-                                           fg='green'))
-                    if app_data.name not in node_data.apps:
-                        node_data.apps.append(app_data.name)
-                        node_data.save()
-
-                    if node_data.name not in app_data.nodes:
-                        app_data.nodes.append(node_data.name)
-                        app_data.save()
-                else:
-                    click.echo(click.style(f'Wrong key index: {content[1:].hex()}',
-                                           fg='red'))
-            else:
-                click.echo(click.style(f'Fail. Error code: {content[0:1].hex()}',
-                                       fg='red'))
+        check_response(results[1][0], key_index, node_data, app_data)
     except KeyboardInterrupt:
         click.echo(click.style('Interruption by user', fg='yellow'))
     except RuntimeError:
@@ -3,6 +3,7 @@ from bluebees.client.application.application_data import ApplicationData, app_na
 from bluebees.client.node.node_data import NodeData
 from bluebees.client.network.network_data import NetworkData
 from bluebees.common.file import file_helper
+from bluebees.common.storage import storage
 from bluebees.common.utils import check_hex_string, order, run_seq
 from bluebees.client.data_paths import base_dir, node_dir, app_dir, net_dir
 from bluebees.client.mesh_layers.element import Element
@@ -15,15 +16,31 @@ from tqdm import tqdm
 import click
 import asyncio
 import traceback
+import fnmatch
 import ruamel
 
 
-def validate_name(ctx, param, value):
+def validate_names(ctx, param, value):
+    names = node_name_list() or []
+    targets = []
+    for pattern in value:
+        matches = sorted(fnmatch.filter(names, pattern))
+        if not matches:
+            raise click.BadParameter(f'The "{pattern}" node not exist')
+        targets += [m for m in matches if m not in targets]
+    return targets
+
+
+def validate_targets_file(ctx, param, value):
     if not value:
-        raise click.BadParameter('This option is required')
-    if not node_name_list() or value not in node_name_list():
-        raise click.BadParameter(f'The "{value}" node not exist')
-    return value
+        return []
+    if not file_helper.file_exist(value):
+        raise click.BadParameter(f'File "{value}" not found')
+
+    with open(value, 'r') as f:
+        lines = [line.split('#')[0].strip() for line in f.readlines()]
+
+    return validate_names(ctx, param, [line for line in lines if line])
 
 
 def validate_app(value):
@@ -237,27 +254,23 @@ async def appkey_add(client_element: Element, target: str,
                           node_name=node_data.name,
                           network_name=node_data.network,
                           application_name='',
-                          is_devkey=True, ack_timeout=3, segment_timeout=3)
+                          is_devkey=True, ack_timeout=None,
+                          segment_timeout=None)
 
-    success = await client_element.send_message(opcode=opcode,
-                                                parameters=parameters,
-                                                ctx=context)
-    if not success:
-        return False
-
-    r_content = await client_element.recv_message(opcode=r_opcode,
-                                                  segment_timeout=1,
-                                                  timeout=3, ctx=context)
+    r_content = await client_element.request(opcode=opcode,
+                                             parameters=parameters,
+                                             r_opcode=r_opcode, ctx=context)
 
     if r_content:
         if r_content[0] == 0 and r_content[1:] == key_index:
-            if app_data.name not in node_data.apps:
-                node_data.apps.append(app_data.name)
-                node_data.save()
+            with storage.transaction():
+                if app_data.name not in node_data.apps:
+                    node_data.apps.append(app_data.name)
+                    node_data.save()
 
-            if node_data.name not in app_data.nodes:
-                app_data.nodes.append(node_data.name)
-                app_data.save()
+                if node_data.name not in app_data.nodes:
+                    app_data.nodes.append(node_data.name)
+                    app_data.save()
 
             return True
 
@@ -279,17 +292,12 @@ async def model_app_bind(client_element: Element, target: str, model_id: bytes,
                           node_name=node_data.name,
                           network_name=node_data.network,
                           application_name='',
-                          is_devkey=True, ack_timeout=3, segment_timeout=3)
-
-    success = await client_element.send_message(opcode=opcode,
-                                                parameters=parameters,
-                                                ctx=context)
-    if not success:
-        return False
+                          is_devkey=True, ack_timeout=None,
+                          segment_timeout=None)
 
-    r_content = await client_element.recv_message(opcode=r_opcode,
-                                                  segment_timeout=1,
-                                                  timeout=3, ctx=context)
+    r_content = await client_element.request(opcode=opcode,
+                                             parameters=parameters,
+                                             r_opcode=r_opcode, ctx=context)
 
     if r_content:
         if r_content[0] == 0 and r_content[1:] == parameters:
@@ -319,17 +327,12 @@ async def model_publication_set(client_element: Element, target: str,
                           node_name=node_data.name,
                           network_name=node_data.network,
                           application_name='',
-                          is_devkey=True, ack_timeout=3, segment_timeout=3)
-
-    success = await client_element.send_message(opcode=opcode,
-                                                parameters=parameters,
-                                                ctx=context)
-    if not success:
-        return False
+                          is_devkey=True, ack_timeout=None,
+                          segment_timeout=None)
 
-    r_content = await client_element.recv_message(opcode=r_opcode,
-                                                  segment_timeout=1,
-                                                  timeout=3, ctx=context)
+    r_content = await client_element.request(opcode=opcode,
+                                             parameters=parameters,
+                                             r_opcode=r_opcode, ctx=context)
 
     if r_content:
         if r_content[0] == 0 and r_content[1:] == parameters:
@@ -350,17 +353,12 @@ async def model_subscription_add(client_element: Element, target: str,
                           node_name=node_data.name,
                           network_name=node_data.network,
                           application_name='',
-                          is_devkey=True, ack_timeout=3, segment_timeout=3)
-
-    success = await client_element.send_message(opcode=opcode,
-                                                parameters=parameters,
-                                                ctx=context)
-    if not success:
-        return False
+                          is_devkey=True, ack_timeout=None,
+                          segment_timeout=None)
 
-    r_content = await client_element.recv_message(opcode=r_opcode,
-                                                  segment_timeout=1,
-                                                  timeout=3, ctx=context)
+    r_content = await client_element.request(opcode=opcode,
+                                             parameters=parameters,
+                                             r_opcode=r_opcode, ctx=context)
 
     if r_content:
         if r_content[0] == 0 and r_content[1:] == parameters:
@@ -379,7 +377,8 @@ async def send_cmd(client_element: Element, target: str, opcode: bytes,
                           node_name=node_data.name,
                           network_name=node_data.network,
                           application_name=app_name,
-                          is_devkey=False, ack_timeout=3, segment_timeout=3)
+                          is_devkey=False, ack_timeout=None,
+                          segment_timeout=None)
 
     success = await client_element.send_message(opcode=opcode,
                                                 parameters=parameters,
@@ -387,7 +386,8 @@ async def send_cmd(client_element: Element, target: str, opcode: bytes,
     return success
 
 
-async def config_task(target: str, client_element: Element, config: dict):
+async def config_task(target: str, client_element: Element, config: dict,
+                      position=0) -> str:
     tries = 3
     total_steps = len(config['applications'])
     for m in config['models']:
@@ -400,7 +400,7 @@ async def config_task(target: str, client_element: Element, config: dict):
         file = file_helper.read(cmd_file)
         total_steps += len(file['commands'])
 
-    with tqdm(range(total_steps)) as pbar:
+    with tqdm(range(total_steps), desc=target, position=position) as pbar:
         success = True
 
         for app in config['applications']:
@@ -409,9 +409,7 @@ async def config_task(target: str, client_element: Element, config: dict):
                 if success:
                     break
             if not success:
-                click.echo(click.style(f'\nError on appkey add. Application: '
-                                       f'{app}', fg='red'))
-                return None
+                return f'Error on appkey add. Application: {app}'
             pbar.update(1)
 
         for model in config['models']:
@@ -422,9 +420,7 @@ async def config_task(target: str, client_element: Element, config: dict):
                 if success:
                     break
             if not success:
-                click.echo(click.style(f'\nError on model app bind. '
-                                       f'Model id: 0x{model["id"]}', fg='red'))
-                return None
+                return f'Error on model app bind. Model id: 0x{model["id"]}'
             pbar.update(1)
 
             if 'publication' in model:
@@ -436,10 +432,8 @@ async def config_task(target: str, client_element: Element, config: dict):
                     if success:
                         break
                 if not success:
-                    click.echo(click.style(f'\nError on model publication set.'
-                                           f' Model id: 0x{model["id"]}',
-                                           fg='red'))
-                    return None
+                    return f'Error on model publication set. Model id: ' \
+                        f'0x{model["id"]}'
                 pbar.update(1)
 
             if 'subscription' in model:
@@ -451,10 +445,8 @@ async def config_task(target: str, client_element: Element, config: dict):
                         if success:
                             break
                     if not success:
-                        click.echo(click.style(f'\nError on model subscription'
-                                               f' add. Model id: 0x'
-                                               f'{model["id"]}', fg='red'))
-                        return None
+                        return f'Error on model subscription add. Model id: ' \
+                            f'0x{model["id"]}'
                     pbar.update(1)
 
         for post_cmd in config['post_cmds']:
@@ -470,23 +462,74 @@ async def config_task(target: str, client_element: Element, config: dict):
                                              application)
                     await asyncio.sleep(.1)
                 if not success:
-                    click.echo(click.style(f'\nError on send cmd. cmd file: '
-                                           f'{post_cmd}', fg='red'))
-                    return None
+                    return f'Error on send cmd. cmd file: {post_cmd}'
                 pbar.update(1)
 
+    return ''
+
+
+async def config_nodes_task(targets: list, client_element: Element,
+                            config: dict, concurrency: int) -> dict:
+    # free progress bar rows, so the bars stay inside the first rows
+    positions = asyncio.Queue()
+    for position in range(concurrency):
+        positions.put_nowait(position)
+
+    async def config_node(target: str) -> str:
+        position = await positions.get()
+        try:
+            return await config_task(target, client_element, config,
+                                     position)
+        except Exception as e:
+            return f'Unknown error [{e}]'
+        finally:
+            positions.put_nowait(position)
+
+    errors = await asyncio.gather(*[config_node(t) for t in targets])
+
+    return dict(zip(targets, errors))
+
+
+def report(results: dict):
+    click.echo(click.style('\nConfiguration report:', fg='cyan'))
+    for target, error in results.items():
+        if not error:
+            click.echo(click.style(f'  {target}: success', fg='green'))
+        else:
+            click.echo(click.style(f'  {target}: {error}', fg='red'))
+
+    fails = len([e for e in results.values() if e])
+    click.echo(click.style(f'{len(results) - fails} of {len(results)} nodes '
+                           f'configured', fg='red' if fails else 'green'))
+
 
 @click.command()
-@click.option('--name', '-n', type=str, default='', required=True,
-              help='Specify the name of node', callback=validate_name)
+@click.option('--name', '-n', type=str, multiple=True,
+              help='Specify the name of node. This option can be repeated '
+                   'and accepts glob patterns, like "vsx-*"',
+              callback=validate_names)
+@click.option('--targets-file', '-f', type=str, default='',
+              help='Specify a file with the name of one node per line',
+              callback=validate_targets_file)
 @click.option('--config', '-c', type=str, default='', required=True,
               help='Specify a YAML config file. A file example is shown in'
                    ' node_config.yml', callback=parse_config)
-def config(name, config):
+@click.option('--concurrency', '-j', type=click.IntRange(min=1), default=4,
+              help='Maximum number of nodes configured at same time',
+              show_default=True)
+def config(name, targets_file, config, concurrency):
     '''Set the node configuration'''
 
-    click.echo(click.style(f'Config "{name}" node using {config[1]} config '
-                           f'file', fg='green'))
+    targets = []
+    for target in list(name) + targets_file:
+        if target not in targets:
+            targets.append(target)
+    if not targets:
+        raise click.BadParameter('At least one node is required, use --name '
+                                 'or --targets-file')
+
+    click.echo(click.style(f'Config {len(targets)} nodes using {config[1]} '
+                           f'config file', fg='green'))
 
     try:
         loop = asyncio.get_event_loop()
@@ -494,9 +537,12 @@ def config(name, config):
 
         run_seq_t = run_seq([
             client_element.spwan_tasks(loop),
-            config_task(name, client_element, config[0])
+            config_nodes_task(targets, client_element, config[0],
+                              concurrency)
         ])
-        loop.run_until_complete(run_seq_t)
+        results = loop.run_until_complete(run_seq_t)
+
+        report(results[1][0])
     except KeyboardInterrupt:
         click.echo(click.style('Interruption by user', fg='yellow'))
     except RuntimeError:
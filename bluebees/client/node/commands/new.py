@@ -2,11 +2,12 @@ from Crypto.Random import get_random_bytes
 from bluebees.client.node.node_data import NodeData, node_name_list, node_addr_list
 from bluebees.client.network.network_data import NetworkData, net_name_list
 from bluebees.client.data_paths import base_dir, net_dir
-from bluebees.client.node.provisioner import Provisioner, LinkOpenError, \
-                                    ProvisioningSuccess, ProvisioningError
+from bluebees.client.node.provisioner import LinkOpenError, ProvisioningError
+from bluebees.client.node.provisioning_manager import ProvisioningManager
 from bluebees.common.file import file_helper
+from bluebees.common.storage import storage
 from bluebees.common.template import template_helper
-from bluebees.common.utils import check_hex_string
+from bluebees.common.utils import check_hex_string, run_seq
 from bluebees.client.mesh_layers.address import address_type, UNICAST_ADDRESS
 import click
 import asyncio
@@ -56,8 +57,8 @@ def validate_addr(ctx, param, value):
     return value
 
 
-def random_addr():
-    addr_list = node_addr_list()
+def random_addr(exclude=[]):
+    addr_list = node_addr_list() + exclude
 
     for x in range(2**16):
         addr = get_random_bytes(2)
@@ -67,49 +68,100 @@ def random_addr():
 
     return None
 
-def provisioning_device(device_uuid: bytes, network: str,
-                        addr: bytes, node_name: str, debug: bool):
-    click.echo(click.style(f'Provisioning device "{device_uuid}" to network '
-                           f'"{network}"', fg='cyan'))
-    success = False
-    devkey = None
-    net_data = NetworkData.load(base_dir + net_dir + network + '.yml')
 
+def uuid_bytes(uuid: str) -> bytes:
+    if len(uuid) < 32:
+        return bytes.fromhex(uuid) + bytes((32 - len(uuid)) // 2)
+    elif len(uuid) > 32:
+        return bytes.fromhex(uuid)[0:16]
+    else:
+        return bytes.fromhex(uuid)
+
+
+def parse_batch(ctx, param, value):
+    '''Each line of batch file is "name uuid [address]"'''
+    if not value:
+        return []
+    if not file_helper.file_exist(value):
+        raise click.BadParameter(f'File "{value}" not found')
+
+    with open(value, 'r') as f:
+        lines = [line.split('#')[0].split() for line in f.readlines()]
+
+    devices = []
+    for fields in [line for line in lines if line]:
+        if len(fields) not in [2, 3]:
+            raise click.BadParameter(f'Bad formatting of line '
+                                     f'"{" ".join(fields)}"')
+
+        name = validate_name(ctx, param, fields[0])
+        if name in [d[0] for d in devices]:
+            raise click.BadParameter(f'The "{name}" node is repeated')
+
+        uuid = uuid_bytes(validate_uuid(ctx, param, fields[1]))
+
+        addrs = [d[2] for d in devices]
+        if len(fields) == 3:
+            address = bytes.fromhex(validate_addr(ctx, param, fields[2]))
+            if address in addrs:
+                raise click.BadParameter(f'The address {address.hex()} is '
+                                         f'repeated')
+        else:
+            address = bytes.fromhex(validate_addr(ctx, param,
+                                                  random_addr(addrs)))
+
+        devices.append((name, uuid, address))
+
+    return devices
+
+
+def provisioning_devices(devices: list, network: str, concurrency: int,
+                         debug: bool) -> dict:
+    '''Returns the devkey of each node provisioned, by node name'''
+    net_data = NetworkData.load(base_dir + net_dir + network + '.yml')
+    devkeys = {}
+
+    async def provision(position: int, name: str, device_uuid: bytes,
+                        addr: bytes):
+        try:
+            devkeys[name] = await manager.provision(
+                device_uuid, net_data.key, net_data.key_index,
+                net_data.iv_index, addr, position)
+        except (LinkOpenError, ProvisioningError):
+            pass
+        except Exception as e:
+            click.echo(f'Unknown error\n{e}')
+
+    async def provision_all():
+        await asyncio.gather(*[provision(i, *device) for i, device in
+                               enumerate(devices)])
+
+    for name, device_uuid, _ in devices:
+        click.echo(click.style(f'Provisioning device "{device_uuid.hex()}" '
+                               f'as "{name}" to network "{network}"',
+                               fg='cyan'))
+
+    loop = asyncio.get_event_loop()
+    manager = ProvisioningManager(max_sessions=concurrency, debug=debug)
     try:
-        loop = asyncio.get_event_loop()
-        prov = Provisioner(loop, device_uuid, net_data.key,
-                           net_data.key_index, net_data.iv_index, addr,
-                           debug=debug)
-        asyncio.gather(prov.spwan_tasks(loop))
-        loop.run_forever()
-    except Exception as e:
-        click.echo(f'Unknown error\n{e}')
-    except LinkOpenError:
-        pass
-    except ProvisioningError:
-        pass
-    except ProvisioningSuccess:
-        devkey = prov.devkey
-        success = True
-        net_data = NetworkData.load(base_dir + net_dir + network + '.yml')
-        net_data.nodes.append(node_name)
-        net_data.save()
+        run_seq_t = run_seq([
+            manager.spwan_tasks(loop),
+            provision_all()
+        ])
+        loop.run_until_complete(run_seq_t)
     except KeyboardInterrupt:
         click.echo(click.style('Interruption by user', fg='yellow'))
-        if prov and prov.tasks_h:
-            prov.tasks_h.cancel()
-            close_task = asyncio.gather(prov.close_link(b'\x02'))
-            loop.run_until_complete(close_task)
+        loop.run_until_complete(manager.close_links(b'\x02'))
     except RuntimeError:
         click.echo('Runtime error')
     finally:
-        prov.disconnect()
+        manager.disconnect()
         tasks_running = asyncio.Task.all_tasks()
         for t in tasks_running:
             t.cancel()
         loop.stop()
 
-    return success, devkey
+    return devkeys
 
 
 def parse_template(ctx, param, value):
@@ -150,11 +202,11 @@ def parse_template(ctx, param, value):
 
 
 @click.command()
-@click.option('--name', '-n', type=str, default='', required=True,
+@click.option('--name', '-n', type=str, default='',
               help='Specify the name of node')
 @click.option('--network', '-w', type=str, default='', required=True,
               help='Specify the name of network')
-@click.option('--uuid', '-i', type=str, default='', required=True,
+@click.option('--uuid', '-i', type=str, default='',
               help='Specify the UUID of target device')
 @click.option('--address', '-a', type=str, default=random_addr(),
               help='Specify the address of node')
@@ -163,9 +215,17 @@ def parse_template(ctx, param, value):
                    ' node_template.yml. This template file must contain the '
                    '"name", "network" and "uuid" keyword.',
                    callback=parse_template, is_eager=True)
-def new(name, network, address, uuid, template):
+@click.option('--batch', '-b', type=str, default='',
+              help='Specify a file with one device per line, in "name uuid '
+                   '[address]" format. When the address is omitted, a random '
+                   'address is used', callback=parse_batch)
+@click.option('--concurrency', '-j', type=click.IntRange(min=1), default=4,
+              help='Maximum number of devices provisioned at same time',
+              show_default=True)
+def new(name, network, address, uuid, template, batch, concurrency):
     '''Create a new node'''
 
+    tmpl = None
     if template:
         if template[0]:
             name = template[0]
@@ -178,35 +238,44 @@ def new(name, network, address, uuid, template):
         if template[4]:
             tmpl = template[4]
 
-    validate_name(None, None, name)
     validate_network(None, None, network)
-    validate_addr(None, None, address)
-    validate_uuid(None, None, uuid)
-
-    if len(uuid) < 32:
-        uuid = bytes.fromhex(uuid) + bytes((32 - len(uuid)) // 2)
-    elif len(uuid) > 32:
-        uuid = bytes.fromhex(uuid)[0:16]
+    if batch:
+        devices = batch
     else:
-        uuid = bytes.fromhex(uuid)
+        validate_name(None, None, name)
+        validate_addr(None, None, address)
+        validate_uuid(None, None, uuid)
 
-    print(f'address: {address}')
-    address = bytes.fromhex(address)
+        devices = [(name, uuid_bytes(uuid), bytes.fromhex(address))]
 
-    # provisioning device
-    success, devkey = provisioning_device(uuid, network, address, name, False)
-    if not success:
-        click.echo(click.style('Error in provisioning', fg='red'))
-    else:
-        if tmpl['name_is_seq']:
+    # provisioning devices
+    devkeys = provisioning_devices(devices, network, concurrency, False)
+
+    # the names and addresses of batch file don't come from the template, so
+    #   its sequences are kept
+    if batch:
+        tmpl = None
+
+    for name, uuid, address in devices:
+        if name not in devkeys:
+            click.echo(click.style(f'Error in provisioning "{name}"',
+                                   fg='red'))
+            continue
+
+        if tmpl and tmpl.get('name_is_seq'):
             template_helper.update_sequence(tmpl, 'name')
 
-        if tmpl['addr_is_seq']:
+        if tmpl and tmpl.get('addr_is_seq'):
             template_helper.update_sequence(tmpl, 'address', custom_pattern=tmpl['name'])
 
         node_data = NodeData(name=name, addr=address, network=network,
-                             device_uuid=uuid, devkey=devkey)
-        node_data.save()
+                             device_uuid=uuid, devkey=devkeys[name])
+        with storage.transaction():
+            node_data.save()
+
+            net_data = NetworkData.load(base_dir + net_dir + network + '.yml')
+            net_data.nodes.append(name)
+            net_data.save()
 
         click.echo(click.style('A new node was created.', fg='green'))
         click.echo(click.style(str(node_data), fg='green'))
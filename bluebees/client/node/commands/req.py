@@ -1,9 +1,11 @@
 from bluebees.client.node.node_data import NodeData, node_name_list
 from bluebees.client.data_paths import base_dir, node_dir
 from bluebees.client.mesh_layers.mesh_context import SoftContext
-from bluebees.client.mesh_layers.element import Element
+from bluebees.client.mesh_layers.rtt_estimator import MAX_CALL_TIMEOUT
 from bluebees.common.utils import run_seq
 from bluebees.common.utils import check_hex_string
+from bluebees.client.core.daemon import daemon_call, ctx_to_dict, \
+                                        DaemonTimeout, DaemonError
 import click
 import asyncio
 
@@ -70,42 +72,68 @@ def req(target, opcode, parameters, r_opcode, devkey, app):
     r_opcode = bytes.fromhex(r_opcode)
     parameters = bytes.fromhex(parameters)
 
+    if devkey:
+        app_name = ''
+        is_devkey = True
+    elif not node_data.apps:
+        click.echo(click.style('Using devkey beacuse node hasn\'t '
+                               'application registred', fg='yellow'))
+        app_name = ''
+        is_devkey = True
+    else:
+        if app in node_data.apps:
+            app_name = app
+            is_devkey = False
+        else:
+            app_name = node_data.apps[0]
+            is_devkey = False
+    context = SoftContext(src_addr=b'\x00\x01',
+                          dst_addr=node_data.addr,
+                          node_name=node_data.name,
+                          network_name=node_data.network,
+                          application_name=app_name,
+                          is_devkey=is_devkey,
+                          ack_timeout=None,
+                          segment_timeout=None)
+    try:
+        result = daemon_call('request', {'opcode': opcode.hex(),
+                                         'parameters': parameters.hex(),
+                                         'r_opcode': r_opcode.hex(),
+                                         'ctx': ctx_to_dict(context),
+                                         'segment_timeout': None,
+                                         'timeout': None},
+                             timeout=MAX_CALL_TIMEOUT)
+    except DaemonTimeout:
+        click.echo(click.style('Daemon not responding', fg='red'))
+        return
+    except DaemonError as e:
+        click.echo(click.style(f'Daemon error [{e}]', fg='red'))
+        return
+    if result is not None:
+        content = result['content']
+        if content is not None:
+            click.echo(click.style(f'Message received: {content}',
+                                   fg='white'))
+        else:
+            click.echo(click.style(f'No message with opcode {r_opcode.hex()} '
+                                   f'received', fg='red'))
+        return
+
+    # * the mesh layers are imported only when the daemon isn't running
+    from bluebees.client.mesh_layers.element import Element
+
     try:
         loop = asyncio.get_event_loop()
         client_element = Element()
-        if devkey:
-            app_name = ''
-            is_devkey = True
-        elif not node_data.apps:
-            click.echo(click.style('Using devkey beacuse node hasn\'t '
-                                   'application registred', fg='yellow'))
-            app_name = ''
-            is_devkey = True
-        else:
-            if app in node_data.apps:
-                app_name = app
-                is_devkey = False
-            else:
-                app_name = node_data.apps[0]
-                is_devkey = False
-        context = SoftContext(src_addr=b'\x00\x01',
-                              dst_addr=node_data.addr,
-                              node_name=node_data.name,
-                              network_name=node_data.network,
-                              application_name=app_name,
-                              is_devkey=is_devkey,
-                              ack_timeout=30,
-                              segment_timeout=10)
         run_seq_t = run_seq([
             client_element.spwan_tasks(loop),
-            client_element.send_message(opcode=opcode, parameters=parameters,
-                                        ctx=context),
-            client_element.recv_message(opcode=r_opcode, segment_timeout=3,
-                                        timeout=10, ctx=context)
+            client_element.request(opcode=opcode, parameters=parameters,
+                                   r_opcode=r_opcode, ctx=context,
+                                   segment_timeout=None, timeout=None)
         ])
         results = loop.run_until_complete(run_seq_t)
 
-        content = results[2][0]
+        content = results[1][0]
         if content:
             click.echo(click.style(f'Message received: {content.hex()}',
                                    fg='white'))
@@ -1,9 +1,11 @@
 from bluebees.client.node.node_data import NodeData, node_name_list
 from bluebees.client.data_paths import base_dir, node_dir
 from bluebees.client.mesh_layers.mesh_context import SoftContext
-from bluebees.client.mesh_layers.element import Element
+from bluebees.client.mesh_layers.rtt_estimator import MAX_CALL_TIMEOUT
 from bluebees.common.utils import check_hex_string
 from bluebees.common.utils import run_seq
+from bluebees.client.core.daemon import daemon_call, ctx_to_dict, \
+                                        DaemonTimeout, DaemonError
 import click
 import asyncio
 
@@ -62,32 +64,51 @@ def send(target, opcode, parameters, devkey, app):
     opcode = bytes.fromhex(opcode)
     parameters = bytes.fromhex(parameters)
 
+    if devkey:
+        app_name = ''
+        is_devkey = True
+    elif not node_data.apps:
+        click.echo(click.style('Using devkey beacuse node hasn\'t '
+                               'application registred', fg='yellow'))
+        app_name = ''
+        is_devkey = True
+    else:
+        if app in node_data.apps:
+            app_name = app
+            is_devkey = False
+        else:
+            app_name = node_data.apps[0]
+            is_devkey = False
+    context = SoftContext(src_addr=b'\x00\x01',
+                          dst_addr=node_data.addr,
+                          node_name=node_data.name,
+                          network_name=node_data.network,
+                          application_name=app_name,
+                          is_devkey=is_devkey,
+                          ack_timeout=None,
+                          segment_timeout=None)
+    try:
+        result = daemon_call('send', {'opcode': opcode.hex(),
+                                      'parameters': parameters.hex(),
+                                      'ctx': ctx_to_dict(context)},
+                             timeout=MAX_CALL_TIMEOUT)
+    except DaemonTimeout:
+        click.echo(click.style('Daemon not responding', fg='red'))
+        return
+    except DaemonError as e:
+        click.echo(click.style(f'Daemon error [{e}]', fg='red'))
+        return
+    if result is not None:
+        if not result['success']:
+            click.echo(click.style('Message not sent', fg='red'))
+        return
+
+    # * the mesh layers are imported only when the daemon isn't running
+    from bluebees.client.mesh_layers.element import Element
+
     try:
         loop = asyncio.get_event_loop()
         client_element = Element()
-        if devkey:
-            app_name = ''
-            is_devkey = True
-        elif not node_data.apps:
-            click.echo(click.style('Using devkey beacuse node hasn\'t '
-                                   'application registred', fg='yellow'))
-            app_name = ''
-            is_devkey = True
-        else:
-            if app in node_data.apps:
-                app_name = app
-                is_devkey = False
-            else:
-                app_name = node_data.apps[0]
-                is_devkey = False
-        context = SoftContext(src_addr=b'\x00\x01',
-                              dst_addr=node_data.addr,
-                              node_name=node_data.name,
-                              network_name=node_data.network,
-                              application_name=app_name,
-                              is_devkey=is_devkey,
-                              ack_timeout=30,
-                              segment_timeout=10)
         run_seq_t = run_seq([
             client_element.spwan_tasks(loop),
             client_element.send_message(opcode=opcode, parameters=parameters,
@@ -0,0 +1,87 @@
+from bluebees.common.utils import crc8
+
+START_PDU = 0x00
+CONTINUATION_PDU = 0x02
+
+
+class GenericProvError(Exception):
+    pass
+
+
+# ! The segments of a transaction can be received out of order and before the
+# !   start segment, so each one is written at its offset and marked in the
+# !   bitmap. The FCS and the total length are checked only at completion.
+class GenericProvReassembler:
+
+    def __init__(self, start_mtu=20, cont_mtu=23, max_segn=63):
+        self.start_mtu = start_mtu
+        self.cont_mtu = cont_mtu
+        self.max_segn = max_segn
+
+        self.buffer = bytearray(start_mtu + max_segn * cont_mtu)
+        self.reset()
+
+    def reset(self):
+        # unknown until the start segment is received
+        self.segn = None
+        self.total_length = 0
+        self.fcs = 0
+
+        self.bitmap = 0
+        self.size = 0
+
+    def _offset(self, index: int) -> int:
+        if index == 0:
+            return 0
+        return self.start_mtu + (index - 1) * self.cont_mtu
+
+    def _put(self, index: int, data: bytes) -> bytes:
+        if self.bitmap & (1 << index):
+            return None
+
+        offset = self._offset(index)
+        self.buffer[offset:offset + len(data)] = data
+        self.size += len(data)
+        self.bitmap |= 1 << index
+
+        return self._complete()
+
+    def _complete(self) -> bytes:
+        if self.segn is None or self.bitmap != (1 << (self.segn + 1)) - 1:
+            return None
+
+        pdu = bytes(self.buffer[0:self.total_length])
+        valid = self.size == self.total_length and crc8(pdu) == self.fcs
+        self.reset()
+
+        if not valid:
+            raise GenericProvError
+        return pdu
+
+    def start(self, segn: int, total_length: int, fcs: int,
+              data: bytes) -> bytes:
+        '''Returns the complete pdu or None. Raises GenericProvError when the
+        FCS or the total length is wrong'''
+        if self.segn is not None and (self.segn, self.total_length,
+                                      self.fcs) != (segn, total_length, fcs):
+            self.reset()
+
+        # continuations received before with a index bigger than segn
+        if self.bitmap >> (segn + 1):
+            self.reset()
+
+        self.segn = segn
+        self.total_length = total_length
+        self.fcs = fcs
+
+        return self._put(0, data[0:self.start_mtu])
+
+    def continuation(self, index: int, data: bytes) -> bytes:
+        '''Returns the complete pdu or None. Raises GenericProvError when the
+        FCS or the total length is wrong'''
+        if index == 0 or index > self.max_segn:
+            return None
+        if self.segn is not None and index > self.segn:
+            return None
+
+        return self._put(index, data[0:self.cont_mtu])
@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from bluebees.common.serializable import Serializable
 from typing import List
 from bluebees.client.data_paths import base_dir, group_dir
-from bluebees.common.file import file_helper
+from bluebees.common.storage import storage
 
 
 @dataclass
@@ -22,9 +22,12 @@ class GroupData(Serializable):
         return f'Name: {self.name}\nAddress: {self.addr.hex()}\n' \
             f'Subscribers Addresses: {[a.hex() for a in self.addrs]}'
 
+    def index_columns(self) -> dict:
+        return {'name': self.name, 'addr': self.addr}
+
 
 def group_name_list() -> list:
-    filenames = file_helper.list_files(base_dir + group_dir)
+    filenames = storage.list_files(base_dir + group_dir)
     if not filenames:
         return False
 
@@ -37,13 +40,5 @@ def group_name_list() -> list:
 
 
 def find_group_by_addr(target_addr: bytes) -> GroupData:
-    filenames = file_helper.list_files(base_dir + group_dir)
-    if not filenames:
-        return False
-
-    for file in filenames:
-        group = GroupData.load(base_dir + group_dir + file)
-        if target_addr == group.addr:
-            return group
-
-    return None
+    groups = GroupData.find(base_dir + group_dir, 'addr', target_addr)
+    return groups[0] if groups else None
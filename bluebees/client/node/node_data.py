@@ -2,7 +2,8 @@ from dataclasses import dataclass
 from bluebees.common.serializable import Serializable
 from typing import List
 from bluebees.client.data_paths import base_dir, node_dir
-from bluebees.common.file import file_helper
+from bluebees.common.storage import storage
+from bluebees.common.file_index import FileIndex
 
 
 @dataclass
@@ -14,8 +15,11 @@ class NodeData(Serializable):
     seq: int            # 03 bytes
     network: str
     apps: List[str]
+    srtt: float         # smoothed rtt, in seconds
+    rttvar: float
 
-    def __init__(self, name, addr, network, device_uuid, devkey, seq=0, apps=[]):
+    def __init__(self, name, addr, network, device_uuid, devkey, seq=0, apps=[],
+                 srtt=None, rttvar=None):
         super().__init__(filename=base_dir + node_dir + name + '.yml')
 
         self.name = name
@@ -25,16 +29,22 @@ class NodeData(Serializable):
         self.network = network
         self.apps = apps
         self.seq = seq
+        self.srtt = srtt
+        self.rttvar = rttvar
 
     def __repr__(self):
         return f'Name: {self.name}\nAddress: {self.addr.hex()}\n' \
                f'Device UUID: {self.device_uuid.hex()}\n' \
                f'Devkey: {self.devkey.hex()}\nNetwork: {self.network}\n' \
-               f'SEQ: {self.seq}\nApps: {self.apps}'
+               f'SEQ: {self.seq}\nApps: {self.apps}\n' \
+               f'RTT: {self.srtt}'
+
+    def index_columns(self) -> dict:
+        return {'name': self.name, 'addr': self.addr}
 
 
 def node_name_list() -> list:
-    filenames = file_helper.list_files(base_dir + node_dir)
+    filenames = storage.list_files(base_dir + node_dir)
     if not filenames:
         return False
 
@@ -46,13 +56,45 @@ def node_name_list() -> list:
     return filenames_fmt
 
 
-def node_addr_list() -> list:
-    filenames = file_helper.list_files(base_dir + node_dir)
-    if not filenames:
-        return []
+class NodeIndex(FileIndex):
 
-    node_addrs = []
-    for file in filenames:
-        node = NodeData.load(base_dir + node_dir + file)
-        node_addrs.append(node.addr)
-    return node_addrs
+    def __init__(self, check_interval=1.0):
+        super().__init__(dirpath=base_dir + node_dir,
+                         check_interval=check_interval)
+
+        # filename -> NodeData
+        self._nodes = {}
+        # addr -> NodeData
+        self._addrs = {}
+
+    def _load_file(self, filename: str):
+        self._nodes[filename] = NodeData.load(self.dirpath + filename)
+
+    def _drop_file(self, filename: str):
+        del self._nodes[filename]
+
+    def _on_change(self):
+        addrs = {}
+        for filename in sorted(self._nodes.keys()):
+            node_data = self._nodes[filename]
+            addrs.setdefault(node_data.addr, node_data)
+        self._addrs = addrs
+
+    def search_by_addr(self, addr: bytes) -> NodeData:
+        self.refresh()
+        return self._addrs.get(addr)
+
+    def search_by_name(self, name: str) -> NodeData:
+        self.refresh()
+        return self._nodes.get(name + '.yml')
+
+    def addrs(self) -> list:
+        self.refresh(force=True)
+        return [node.addr for _, node in sorted(self._nodes.items())]
+
+
+node_index = NodeIndex()
+
+
+def node_addr_list() -> list:
+    return node_index.addrs()
@@ -1,9 +1,10 @@
-from bluebees.common.client import Client
 from dataclasses import dataclass
 from bluebees.common.utils import order, crc8
 from asyncio import wait_for
-from ecdsa import NIST256p, SigningKey
-from ecdsa.ellipticcurve import Point
+from bluebees.client.node.generic_prov import GenericProvReassembler, \
+    GenericProvError, START_PDU, CONTINUATION_PDU
+from bluebees.client.node.retransmit_policy import RetransmitPolicy
+from bluebees.common.ec import ec, KeyPair, EcError, public_key_point
 from bluebees.common.crypto import crypto
 from Crypto.Random import get_random_bytes
 from typing import List
@@ -12,15 +13,11 @@ from tqdm import tqdm
 import asyncio
 
 
-class LinkOpenError(KeyboardInterrupt):
+class LinkOpenError(Exception):
     pass
 
 
-class ProvisioningSuccess(KeyboardInterrupt):
-    pass
-
-
-class ProvisioningError(KeyboardInterrupt):
+class ProvisioningError(Exception):
     pass
 
 
@@ -30,9 +27,8 @@ class ProvisioningContext:
     client_tr_number: int
     node_tr_number: int
 
-    public_key: Point
-    private_key: int
-    node_public_key: Point
+    key_pair: KeyPair
+    node_public_key: bytes
     ecdh_secret: bytes
     random_provisioner: bytes
     random_device: bytes
@@ -58,28 +54,19 @@ class DeviceInfo:
     address: bytes
 
 
-@dataclass
-class GenericProvContext:
-    segn: int
-    total_length: int
-    fcs: int
-    current_index: int
-    content: bytes
-
-    def reset(self):
-        self.segn = 0
-        self.total_length = 0
-        self.fcs = 0
-        self.current_index = 0
-        self.content = b''
-
+# ! A provisioner is a session of the ProvisioningManager. It sends its
+# !   messages on send_queue and receives, on recv_queue, only the prov
+# !   messages of its link
+class Provisioner:
 
-class Provisioner(Client):
-
-    def __init__(self, loop, device_uuid: bytes, netkey: bytes,
-                 key_index: bytes, iv_index: bytes, address: bytes,
-                 flags=b'\x00', attention_duration=5, debug=False):
-        super().__init__(sub_topic_list=[b'prov'], pub_topic_list=[b'prov_s'])
+    def __init__(self, send_queue: asyncio.Queue, recv_queue: asyncio.Queue,
+                 device_uuid: bytes, netkey: bytes, key_index: bytes,
+                 iv_index: bytes, address: bytes, device_link: bytes,
+                 flags=b'\x00', attention_duration=5, debug=False,
+                 position=0):
+        self.messages_to_send = send_queue
+        self.messages_received = recv_queue
+        self.position = position
 
         self.log = log_sys.get_logger('provisioner')
         if debug:
@@ -88,10 +75,7 @@ class Provisioner(Client):
             self.log.set_level(INFO)
 
         self.adv_mtu = 24
-        self.start_pdu = 0
-        self.cont_pdu = 2
 
-        self.loop = loop
         self.device_info = DeviceInfo(uuid=device_uuid,
                                       attention=attention_duration,
                                       netkey=netkey,
@@ -99,11 +83,10 @@ class Provisioner(Client):
                                       flags=flags,
                                       iv_index=iv_index,
                                       address=address)
-        self.prov_ctx = ProvisioningContext(device_link=b'\xaa\xbb\xcc\xdd',
+        self.prov_ctx = ProvisioningContext(device_link=device_link,
                                             client_tr_number=0x00,
                                             node_tr_number=0x80,
-                                            public_key=None,
-                                            private_key=None,
+                                            key_pair=None,
                                             ecdh_secret=None,
                                             random_provisioner=None,
                                             confirmation_key=None,
@@ -115,20 +98,17 @@ class Provisioner(Client):
                                             confirmation_salt=None,
                                             random_device=None,
                                             node_public_key=None)
-        self.g_recv_ctx = GenericProvContext(segn=0, total_length=0, fcs=0,
-                                             current_index=0, content=b'')
+        self.g_recv_ctx = GenericProvReassembler(start_mtu=self.adv_mtu - 4,
+                                                 cont_mtu=self.adv_mtu - 1)
+        # pdu of device received while waiting an ack
+        self.early_pdu = None
 
-        sk = SigningKey.generate(curve=NIST256p)
-        vk = sk.get_verifying_key()
-        self.prov_ctx.private_key = sk.privkey.secret_multiplier
-        self.prov_ctx.public_key = vk.pubkey.point
+        self.policy = RetransmitPolicy()
 
         self.prov_ctx.random_provisioner = get_random_bytes(16)
 
         self.devkey = None
 
-        self.all_tasks += [self._provisioning_device()]
-
     # link method
     def __close_reason(self, reason: bytes) -> str:
         if reason == b'\x00':
@@ -170,7 +150,7 @@ class Provisioner(Client):
 
         for x in range(3):
             await self.messages_to_send.put((msg_type, content))
-            await asyncio.sleep(.3)
+            await asyncio.sleep(self.policy.repeat_delay())
 
     # send pdu methods
     def __mount_generic_prov_pdu(self, content: bytes) -> List[bytes]:
@@ -215,22 +195,31 @@ class Provisioner(Client):
                content[4:5] == expected_tr_number and content[5:6] == b'\x01':
                 return
 
-    async def _send_pdu(self, tries: int, phase_name: str, total_timeout: int,
-                        mount_pdu_func) -> bool:
-        timeout = int(total_timeout / tries)
-        for try_ in range(tries):
-            self.log.debug(f'Send {phase_name} PDU')
-            content = mount_pdu_func()
+            if msg_type == b'prov':
+                await self.__ack_retransmission(content)
 
-            generic_prov_pdus = self.__mount_generic_prov_pdu(content)
+                # the device can send its next pdu before the ack is received
+                pdu = self.__remount_recv_pdu(content)
+                if pdu:
+                    self.early_pdu = pdu
 
+    async def _send_pdu(self, phase_name: str, mount_pdu_func) -> bool:
+        content = mount_pdu_func()
+        generic_prov_pdus = self.__mount_generic_prov_pdu(content)
+
+        loop = asyncio.get_event_loop()
+        for try_, timeout in enumerate(self.policy.timeouts()):
+            self.log.debug(f'Send {phase_name} PDU')
             for pdu in generic_prov_pdus:
                 await self.messages_to_send.put((b'prov_s', pdu))
+            start = loop.time()
 
             try:
                 self.log.debug('Waiting ack...')
                 await wait_for(self.__wait_ack(), timeout=timeout)
 
+                if try_ == 0:
+                    self.policy.sample(loop.time() - start)
                 self.log.debug(f'Send {phase_name} PDU successful')
                 self.prov_ctx.client_tr_number += 1
                 return True
@@ -250,65 +239,53 @@ class Provisioner(Client):
 
         content = content[5:]
 
-        pdu_type = content[0] & 0x03
-        if pdu_type == self.start_pdu:
-            self.g_recv_ctx.reset()
-            self.g_recv_ctx.segn = (content[0] & 0xfc) >> 2
-            self.g_recv_ctx.total_length = int.from_bytes(content[1:3], 'big')
-            self.g_recv_ctx.fcs = content[3]
-            self.g_recv_ctx.current_index = 1
-            self.g_recv_ctx.content = content[4:self.adv_mtu]
-
-            if self.g_recv_ctx.segn == 0:
-                calc_fcs = crc8(self.g_recv_ctx.content)
-                total_len = len(self.g_recv_ctx.content)
-                if total_len != self.g_recv_ctx.total_length:
-                    self.g_recv_ctx.reset()
-                    self.log.debug('Wrong total len')
-                elif calc_fcs != self.g_recv_ctx.fcs:
-                    self.g_recv_ctx.reset()
-                    self.log.debug('Wrong FCS')
-                else:
-                    pdu = self.g_recv_ctx.content
-                    self.g_recv_ctx.reset()
-                    return pdu
-        elif pdu_type == self.cont_pdu:
-            index = (content[0] & 0xfc) >> 2
-            if index == self.g_recv_ctx.current_index:
-                if index != self.g_recv_ctx.segn:
-                    self.g_recv_ctx.current_index += 1
-                    self.g_recv_ctx.content += content[1:self.adv_mtu]
-                else:
-                    self.g_recv_ctx.content += content[1: self.adv_mtu]
-                    calc_fcs = crc8(self.g_recv_ctx.content)
-                    total_len = len(self.g_recv_ctx.content)
-                    if total_len != self.g_recv_ctx.total_length:
-                        self.g_recv_ctx.reset()
-                        self.log.debug('Wrong total len')
-                    elif calc_fcs != self.g_recv_ctx.fcs:
-                        self.g_recv_ctx.reset()
-                        self.log.debug('Wrong FCS')
-                    else:
-                        pdu = self.g_recv_ctx.content
-                        self.g_recv_ctx.reset()
-                        return pdu
+        try:
+            pdu_type = content[0] & 0x03
+            if pdu_type == START_PDU:
+                return self.g_recv_ctx.start(
+                    segn=(content[0] & 0xfc) >> 2,
+                    total_length=int.from_bytes(content[1:3], 'big'),
+                    fcs=content[3], data=content[4:self.adv_mtu])
+            elif pdu_type == CONTINUATION_PDU:
+                return self.g_recv_ctx.continuation(
+                    index=(content[0] & 0xfc) >> 2,
+                    data=content[1:self.adv_mtu])
+        except GenericProvError:
+            self.log.debug('Wrong FCS or total len')
 
         return None
 
-    async def __send_ack(self):
+    async def __send_ack(self, node_tr_number: int):
         content = self.prov_ctx.device_link
-        content += self.prov_ctx.node_tr_number.to_bytes(1, 'big')
+        content += node_tr_number.to_bytes(1, 'big')
         content += b'\x01'
 
         await self.messages_to_send.put((b'prov_s', content))
 
+    async def __ack_retransmission(self, content):
+        '''The device resends its last transaction when the ack was lost'''
+        last_tr_number = self.prov_ctx.node_tr_number - 1
+        if last_tr_number < 0x80 or len(content) < 6:
+            return
+
+        if content[0:4] == self.prov_ctx.device_link and \
+           content[4] == last_tr_number and content[5] & 0x01 == 0:
+            self.log.debug('Send ack pdu again')
+            await self.__send_ack(last_tr_number)
+
     async def __wait_pdu_atomic(self, check_pdu_func):
+        pdu, self.early_pdu = self.early_pdu, None
+        if pdu and check_pdu_func(pdu):
+            return
+
         while True:
             (msg_type, content) = await self.messages_received.get()
 
             if msg_type != b'prov':
                 continue
 
+            await self.__ack_retransmission(content)
+
             if content[0:4] == self.prov_ctx.device_link and \
                content[5:6] == b'\x0b' and content[6:7] != b'\x00':
                 self.log.error(f'The device close link. Reason: '
@@ -320,20 +297,20 @@ class Provisioner(Client):
             if pdu and check_pdu_func(pdu):
                 return
 
-    async def _wait_pdu(self, ack_tries: int, phase_name: str, timeout: int,
-                        check_pdu_func) -> bool:
+    async def _wait_pdu(self, phase_name: str, check_pdu_func) -> bool:
         try:
             self.log.debug(f'Waiting {phase_name} PDU...')
-            await wait_for(self.__wait_pdu_atomic(check_pdu_func), timeout)
+            await wait_for(self.__wait_pdu_atomic(check_pdu_func),
+                           self.policy.total_timeout)
 
-            for try_ in range(ack_tries):
-                self.log.debug(f'Send {try_ + 1}{order(try_ + 1)} ack pdu')
-                await self.__send_ack()
-                await asyncio.sleep(.3)
+            # * a lost ack is sent again when the device retransmits
+            self.log.debug('Send ack pdu')
+            await self.__send_ack(self.prov_ctx.node_tr_number)
 
             self.prov_ctx.node_tr_number += 1
+            self.g_recv_ctx.reset()
             return True
-        except TimeoutError:
+        except asyncio.TimeoutError:
             return False
 
     # invite phase
@@ -370,26 +347,29 @@ class Provisioner(Client):
         return content
 
     def _mount_public_key_pdu(self) -> bytes:
-        public_key_x = self.prov_ctx.public_key.x().to_bytes(32, 'big')
-        public_key_y = self.prov_ctx.public_key.y().to_bytes(32, 'big')
+        public_key = self.prov_ctx.key_pair.public_key
 
         content = b'\x03'
-        content += public_key_x
-        content += public_key_y
+        content += public_key
 
-        self.log.debug(f'Pub key x {public_key_x.hex()}')
-        self.log.debug(f'Pub key y {public_key_y.hex()}')
+        self.log.debug(f'Pub key x {public_key[0:32].hex()}')
+        self.log.debug(f'Pub key y {public_key[32:64].hex()}')
 
         return content
 
     def _check_public_key_pdu(self, content) -> bool:
-        self.prov_ctx.node_public_key = Point(curve=NIST256p.curve,
-                                              x=int.from_bytes(content[1:33], 'big'),
-                                              y=int.from_bytes(content[33:65], 'big'))
+        if content[0:1] != b'\x03' or len(content[1:]) != 64:
+            return False
 
-        self.prov_ctx.ecdh_secret = (self.prov_ctx.private_key * self.prov_ctx.node_public_key).x().to_bytes(32, 'big')
+        # the ecdh secret is calculated after, out of event loop
+        try:
+            public_key_point(bytes(content[1:65]))
+        except EcError:
+            self.log.debug('Invalid public key')
+            return False
 
-        return content[0:1] == b'\x03' and len(content[1:]) == 64
+        self.prov_ctx.node_public_key = bytes(content[1:65])
+        return True
 
     # authentication phase
     def _mount_confirmation_pdu(self) -> bytes:
@@ -398,20 +378,18 @@ class Provisioner(Client):
         confirmation_inputs = self.prov_ctx.invite_pdu
         confirmation_inputs += self.prov_ctx.capabilities_pdu
         confirmation_inputs += self.prov_ctx.start_pdu
-        confirmation_inputs += self.prov_ctx.public_key.x().to_bytes(32, 'big')
-        confirmation_inputs += self.prov_ctx.public_key.y().to_bytes(32, 'big')
-        confirmation_inputs += self.prov_ctx.node_public_key.x().to_bytes(32, 'big')
-        confirmation_inputs += self.prov_ctx.node_public_key.y().to_bytes(32, 'big')
+        confirmation_inputs += self.prov_ctx.key_pair.public_key
+        confirmation_inputs += self.prov_ctx.node_public_key
 
         self.prov_ctx.confirmation_salt = crypto.s1(text=confirmation_inputs)
         self.prov_ctx.confirmation_key = crypto.k1(n=self.prov_ctx.ecdh_secret,
                                                    salt=self.prov_ctx.confirmation_salt,
-                                                   p=b'prck')
+                                                   p=b'prck', cache=False)
 
         content = b'\x05'
         content += crypto.aes_cmac(key=self.prov_ctx.confirmation_key,
                                    text=self.prov_ctx.random_provisioner +
-                                   self.prov_ctx.auth_value)
+                                   self.prov_ctx.auth_value, cache=False)
 
         self.log.debug(f'ConfInputs[0]   {confirmation_inputs[0:64].hex()}')
         self.log.debug(f'ConfInputs[64]  {confirmation_inputs[64:128].hex()}')
@@ -438,7 +416,8 @@ class Provisioner(Client):
 
         calc_confirmation = crypto.aes_cmac(key=self.prov_ctx.confirmation_key,
                                             text=self.prov_ctx.random_device +
-                                            self.prov_ctx.auth_value)
+                                            self.prov_ctx.auth_value,
+                                            cache=False)
 
         return content[0:1] == b'\x06' and len(content[1:]) == 16 and \
             self.prov_ctx.node_confirmation == calc_confirmation
@@ -455,9 +434,9 @@ class Provisioner(Client):
 
         prov_salt = crypto.s1(text=prov_input)
         session_key = crypto.k1(n=self.prov_ctx.ecdh_secret, salt=prov_salt,
-                                p=b'prsk')
+                                p=b'prsk', cache=False)
         session_nonce = crypto.k1(n=self.prov_ctx.ecdh_secret, salt=prov_salt,
-                                  p=b'prsn')[3:]
+                                  p=b'prsn', cache=False)[3:]
 
         encrypted_data, data_mic = crypto.aes_ccm_complete(key=session_key,
                                                            nonce=session_nonce,
@@ -465,7 +444,7 @@ class Provisioner(Client):
                                                            adata=b'')
 
         self.devkey = crypto.k1(n=self.prov_ctx.ecdh_secret, salt=prov_salt,
-                                p=b'prdk')[0:16]
+                                p=b'prdk', cache=False)[0:16]
 
         content = b'\x07'
         content += encrypted_data
@@ -476,22 +455,31 @@ class Provisioner(Client):
     def _check_complete_pdu(self, content) -> bool:
         return content[0:1] == b'\x08'
 
-    async def _provisioning_device(self):
+    async def provision(self) -> bytes:
+        '''Returns the devkey of the provisioned device'''
         success = False
 
         # need for broker get the first message
         await asyncio.sleep(.1)
 
         # link open phase
+        # the key pair is ready in the pool, generally
+        self.prov_ctx.key_pair = await ec.key_pair()
+
         self.log.info(f'Opening link with device {self.device_info.uuid}')
-        for try_ in range(10):
+        loop = asyncio.get_event_loop()
+        for try_, timeout in enumerate(self.policy.timeouts()):
             self.log.debug(f'Open device link {self.prov_ctx.device_link}')
             await self._open_link()
+            start = loop.time()
 
             try:
                 self.log.debug(f'Waiting link ack...')
-                await wait_for(self._wait_link_ack(), timeout=3)
+                await wait_for(self._wait_link_ack(), timeout=timeout)
 
+                # the first timeout of all phases comes from this rtt
+                if try_ == 0:
+                    self.policy.sample(loop.time() - start)
                 self.log.success('Link open successfull')
                 success = True
                 break
@@ -504,10 +492,10 @@ class Provisioner(Client):
             self.log.error('Link open fail')
             raise LinkOpenError
 
-        with tqdm(range(11)) as pbar:
+        with tqdm(range(11), desc=self.device_info.uuid.hex(),
+                  position=self.position) as pbar:
             # invitation phase
-            success = await self._send_pdu(tries=10, phase_name='invite',
-                                           total_timeout=30,
+            success = await self._send_pdu(phase_name='invite',
                                            mount_pdu_func=self._mount_invite_pdu)
             if not success:
                 self.log.error('FAIL')
@@ -515,8 +503,7 @@ class Provisioner(Client):
                 raise ProvisioningError
 
             pbar.update(1)
-            success = await self._wait_pdu(ack_tries=3, phase_name='capabilities',
-                                           timeout=30,
+            success = await self._wait_pdu(phase_name='capabilities',
                                            check_pdu_func=self._check_capabilities_pdu)
             if not success:
                 self.log.error('FAIL')
@@ -525,8 +512,7 @@ class Provisioner(Client):
 
             # exchanging public keys phase
             pbar.update(1)
-            success = await self._send_pdu(tries=10, phase_name='start',
-                                           total_timeout=30,
+            success = await self._send_pdu(phase_name='start',
                                            mount_pdu_func=self._mount_start_pdu)
             if not success:
                 self.log.error('FAIL')
@@ -534,8 +520,7 @@ class Provisioner(Client):
                 raise ProvisioningError
 
             pbar.update(1)
-            success = await self._send_pdu(tries=10, phase_name='exchange keys',
-                                           total_timeout=30,
+            success = await self._send_pdu(phase_name='exchange keys',
                                            mount_pdu_func=self._mount_public_key_pdu)
             if not success:
                 self.log.error('FAIL')
@@ -543,18 +528,19 @@ class Provisioner(Client):
                 raise ProvisioningError
 
             pbar.update(1)
-            success = await self._wait_pdu(ack_tries=3, phase_name='exchange keys',
-                                           timeout=30,
+            success = await self._wait_pdu(phase_name='exchange keys',
                                            check_pdu_func=self._check_public_key_pdu)
             if not success:
                 self.log.error('FAIL')
                 await self.close_link(b'\x01')  # timeout
                 raise ProvisioningError
 
+            self.prov_ctx.ecdh_secret = await ec.ecdh(
+                self.prov_ctx.key_pair, self.prov_ctx.node_public_key)
+
             # authentication phase
             pbar.update(1)
-            success = await self._send_pdu(tries=10, phase_name='confirmation',
-                                           total_timeout=30,
+            success = await self._send_pdu(phase_name='confirmation',
                                            mount_pdu_func=self._mount_confirmation_pdu)
             if not success:
                 self.log.error('FAIL')
@@ -562,8 +548,7 @@ class Provisioner(Client):
                 raise ProvisioningError
 
             pbar.update(1)
-            success = await self._wait_pdu(ack_tries=3, phase_name='confirmation',
-                                           timeout=30,
+            success = await self._wait_pdu(phase_name='confirmation',
                                            check_pdu_func=self._check_confirmation_pdu)
             if not success:
                 self.log.error('FAIL')
@@ -571,8 +556,7 @@ class Provisioner(Client):
                 raise ProvisioningError
 
             pbar.update(1)
-            success = await self._send_pdu(tries=10, phase_name='random',
-                                           total_timeout=30,
+            success = await self._send_pdu(phase_name='random',
                                            mount_pdu_func=self._mount_random_pdu)
             if not success:
                 self.log.error('FAIL')
@@ -580,8 +564,7 @@ class Provisioner(Client):
                 raise ProvisioningError
 
             pbar.update(1)
-            success = await self._wait_pdu(ack_tries=3, phase_name='random',
-                                           timeout=30,
+            success = await self._wait_pdu(phase_name='random',
                                            check_pdu_func=self._check_random_pdu)
             if not success:
                 self.log.error('FAIL')
@@ -590,8 +573,7 @@ class Provisioner(Client):
 
             # distribuition of provisioning data phase
             pbar.update(1)
-            success = await self._send_pdu(tries=10, phase_name='data',
-                                           total_timeout=30,
+            success = await self._send_pdu(phase_name='data',
                                            mount_pdu_func=self._mount_data_pdu)
             if not success:
                 self.log.error('FAIL')
@@ -599,8 +581,7 @@ class Provisioner(Client):
                 raise ProvisioningError
 
             pbar.update(1)
-            success = await self._wait_pdu(ack_tries=3, phase_name='complete',
-                                           timeout=30,
+            success = await self._wait_pdu(phase_name='complete',
                                            check_pdu_func=self._check_complete_pdu)
             if not success:
                 self.log.error('FAIL')
@@ -610,4 +591,5 @@ class Provisioner(Client):
             await self.close_link(b'\x00')
 
             pbar.update(1)
-            raise ProvisioningSuccess
+
+        return self.devkey
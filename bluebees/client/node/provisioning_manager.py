@@ -0,0 +1,79 @@
+from bluebees.common.client import Client
+from bluebees.client.node.provisioner import Provisioner
+from bluebees.common.logging import log_sys, INFO, DEBUG
+from Crypto.Random import get_random_bytes
+import asyncio
+
+
+# ! Runs many provisioning sessions on the same broker connection. Each
+# !   session has a random link id and the prov messages received are
+# !   dispatched to the session of the link id (first 4 bytes)
+class ProvisioningManager(Client):
+
+    def __init__(self, max_sessions=4, debug=False, sub_topic_list=None):
+        super().__init__(sub_topic_list=[b'prov'] + (sub_topic_list or []),
+                         pub_topic_list=[b'prov_s'])
+
+        self.log = log_sys.get_logger('provisioning_manager')
+        if debug:
+            self.log.set_level(DEBUG)
+        else:
+            self.log.set_level(INFO)
+        self.debug = debug
+
+        # link id -> Provisioner
+        self.sessions = {}
+        self.semaphore = asyncio.Semaphore(max_sessions)
+
+        self.all_tasks += [self._demux_task()]
+
+    def _new_link(self) -> bytes:
+        while True:
+            device_link = get_random_bytes(4)
+            if device_link not in self.sessions:
+                return device_link
+
+    async def provision(self, device_uuid: bytes, netkey: bytes,
+                        key_index: bytes, iv_index: bytes, address: bytes,
+                        position=0) -> bytes:
+        '''Returns the devkey of the provisioned device. Raises LinkOpenError
+        or ProvisioningError on fail'''
+
+        async with self.semaphore:
+            device_link = self._new_link()
+            prov = Provisioner(send_queue=self.messages_to_send,
+                               recv_queue=asyncio.Queue(),
+                               device_uuid=device_uuid, netkey=netkey,
+                               key_index=key_index, iv_index=iv_index,
+                               address=address, device_link=device_link,
+                               debug=self.debug, position=position)
+            self.sessions[device_link] = prov
+            self.log.debug(f'Link {device_link.hex()} to device '
+                           f'{device_uuid.hex()}')
+
+            try:
+                return await prov.provision()
+            finally:
+                del self.sessions[device_link]
+
+    async def close_links(self, reason: bytes):
+        await asyncio.gather(*[prov.close_link(reason) for prov in
+                               list(self.sessions.values())])
+
+    async def _on_message(self, msg_type: bytes, content: bytes):
+        '''Called with the messages of the others topics subscribed'''
+        pass
+
+    async def _demux_task(self):
+        while True:
+            (msg_type, content) = await self.messages_received.get()
+            if msg_type != b'prov':
+                await self._on_message(msg_type, content)
+                continue
+
+            prov = self.sessions.get(bytes(content[0:4]))
+            if not prov:
+                self.log.debug(f'Link {content[0:4].hex()} unknown')
+                continue
+
+            await prov.messages_received.put((msg_type, content))
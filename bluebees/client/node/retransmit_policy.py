@@ -0,0 +1,34 @@
+from bluebees.client.mesh_layers.rtt_estimator import RttEstimator
+
+
+# ! Shared by all phases of a provisioning. The first timeout comes from the
+# !   rtt measured on link ack and on the transaction acks, and each expired
+# !   try doubles the timeout, until the total timeout of the phase.
+class RetransmitPolicy:
+
+    def __init__(self, total_timeout=30, min_timeout=.2, max_timeout=4.0,
+                 initial_timeout=3.0, repeat_interval=.3):
+        self.total_timeout = total_timeout
+        self.repeat_interval = repeat_interval
+
+        self.rtt = RttEstimator(min_rto=min_timeout, max_rto=max_timeout,
+                                initial_rto=initial_timeout)
+
+    def timeouts(self):
+        '''Yields the timeout of each try. Asking the next one means the
+        previous try expired'''
+        elapsed = 0
+        while elapsed < self.total_timeout:
+            timeout = min(self.rtt.rto(), self.total_timeout - elapsed)
+            yield timeout
+
+            elapsed += timeout
+            self.rtt.timeout()
+
+    def sample(self, rtt: float):
+        '''Only the acks of a PDU sent once are samples (Karn algorithm)'''
+        self.rtt.update(rtt)
+
+    def repeat_delay(self) -> float:
+        '''Delay between the copies of unacknowledged messages'''
+        return min(self.repeat_interval, self.rtt.rto() / 2)
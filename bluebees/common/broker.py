@@ -5,6 +5,9 @@ from bluebees.common.logging import log_sys, INFO
 from bluebees.common.asyncio_fixup import wakeup
 
 
+# ! All clients send their messages to the same ROUTER socket and receive the
+# !   messages of the broker from the same PUB socket. So, there isn't
+# !   handshake or port allocation when a new client is connected
 class Broker:
 
     def __init__(self, loop):
@@ -19,42 +22,32 @@ class Broker:
         self.ctx = Context.instance()
 
         self.pub_sock = self.ctx.socket(zmq.PUB)
-        self.listen_sock = self.ctx.socket(zmq.REP)
-        self.subs = {}
+        self.listen_sock = self.ctx.socket(zmq.ROUTER)
+        self.clients = set()
 
         self.pub_sock.bind(self.pub_url)
         self.listen_sock.bind(self.listen_url)
 
-    def _gen_client_port(self):
-        port = 9502
-        while port in self.subs.keys():
-            port += 1
-            if port >= 9603:
-                raise Exception('Max number of clients')
-
-        return port
-
-    async def _spawn_client(self, topic_list: list):
-        client_port = self._gen_client_port()
-        await self.listen_sock.send(str(client_port).encode('utf-8'))
-        self.subs[client_port] = self.ctx.socket(zmq.SUB)
-        self.subs[client_port].connect(f'tcp://127.0.0.1:{client_port}')
-        for topic in topic_list:
-            self.subs[client_port].setsockopt(zmq.SUBSCRIBE, topic)
-
-        # ! spawn corroutine to receive data from topic_list on client port
-        self.loop.create_task(self._subscribe_task(self.subs[client_port],
-                                                   client_port))
-        self.broker_log.info(f'New client connected using port {client_port}')
-
-    async def _subscribe_task(self, sub_socket, port):
+    async def _listen_task(self):
         while True:
-            [topic, content] = await sub_socket.recv_multipart()
-
-            if topic == b'disconnect' and content != b'broker':
-                del self.subs[port]
-                self.broker_log.warning(f'Client on port {port} diconnected')
-                break
+            # * the frames are forwarded without copy
+            frames = await self.listen_sock.recv_multipart(copy=False)
+            if len(frames) != 3:
+                self.broker_log.warning(f'Malformed message with '
+                                        f'{len(frames)} frames discarded')
+                continue
+            [identity, topic, content] = frames
+            identity = identity.bytes
+
+            if identity not in self.clients:
+                self.clients.add(identity)
+                self.broker_log.info(f'New client connected '
+                                     f'({len(self.clients)} clients)')
+
+            if topic.bytes == b'disconnect' and content.bytes != b'broker':
+                self.clients.discard(identity)
+                self.broker_log.warning(f'Client diconnected '
+                                        f'({len(self.clients)} clients)')
 
             await self.publish_queue.put((topic, content))
 
@@ -62,16 +55,7 @@ class Broker:
         while True:
             (topic, content) = await self.publish_queue.get()
 
-            await self.pub_sock.send_multipart([topic, content])
-
-    async def _listen_task(self):
-        while True:
-            content = await self.listen_sock.recv_multipart()
-            topic_list = content[0].split(b' ')
-
-            await asyncio.sleep(1)
-
-            await self._spawn_client(topic_list)
+            await self.pub_sock.send_multipart([topic, content], copy=False)
 
     def disconnect(self):
         self.pub_sock.send_multipart([b'disconnect', b'broker'])
@@ -1,5 +1,6 @@
 import asyncio
 import zmq.asyncio
+import os
 from zmq.asyncio import Context
 from bluebees.common.logging import log_sys, INFO
 from bluebees.common.asyncio_fixup import wakeup
@@ -7,21 +8,28 @@ from bluebees.common.asyncio_fixup import wakeup
 
 class Client:
 
-    def __init__(self, sub_topic_list: list, pub_topic_list: list):
+    def __init__(self, sub_topic_list: list, pub_topic_list: list,
+                 zero_copy=False):
         self.pub_topic_list = pub_topic_list + [b'disconnect']
+        # ! when zero_copy is set, the content received is a memoryview of
+        # !   the zmq frame
+        self.zero_copy = zero_copy
         self.messages_to_send = asyncio.Queue()
         self.messages_received = asyncio.Queue()
 
         self.client_log = log_sys.get_logger('client')
         self.client_log.set_level(INFO)
 
-        self.pub_url = 'tcp://127.0.0.1:'
         self.broker_listen_url = 'tcp://127.0.0.1:9500'
         self.broker_pub_url = 'tcp://127.0.0.1:9501'
+        # time, in seconds, to wait the subscriptions reach the broker
+        self.probe_timeout = 1.0
 
         self.ctx = Context.instance()
 
-        self.pub_sock = self.ctx.socket(zmq.PUB)
+        self.pub_sock = self.ctx.socket(zmq.DEALER)
+        # ! don't block the exit when the broker is not running
+        self.pub_sock.setsockopt(zmq.LINGER, 100)
         self.sub_sock = self.ctx.socket(zmq.SUB)
 
         self.sub_sock.connect(self.broker_pub_url)
@@ -36,29 +44,50 @@ class Client:
         self.client_tasks = [self._subscribe_task(), self._publish_task()]
         self.all_tasks = []
 
-    async def connect_to_broker(self):
-        pub_topics = b' '.join(self.pub_topic_list)
-
-        req_sock = self.ctx.socket(zmq.REQ)
-        req_sock.connect(self.broker_listen_url)
-
-        await req_sock.send(pub_topics)
-
-        # ! blocking command
-        pub_port = await req_sock.recv_multipart()
-        pub_port = pub_port[0].decode('utf-8')
+    async def _wait_probe(self, probe: bytes):
+        while True:
+            [topic, content] = await self.sub_sock.recv_multipart()
+            if topic == probe:
+                return
+            await self.messages_received.put((topic, content))
 
-        self.pub_url += pub_port
-        self.pub_sock.bind(self.pub_url)
+    async def connect_to_broker(self):
+        # * the messages sent before the connection is done are queued
+        self.pub_sock.connect(self.broker_listen_url)
+
+        # ! the SUB socket loses the messages published before its
+        # !   subscriptions reach the broker. So, a probe is sent until the
+        # !   broker echoes it back, usually in a few milliseconds
+        probe = b'probe' + os.urandom(8)
+        self.sub_sock.setsockopt(zmq.SUBSCRIBE, probe)
+        for _ in range(int(self.probe_timeout / .05)):
+            await self.pub_sock.send_multipart([probe, b''])
+            try:
+                await asyncio.wait_for(self._wait_probe(probe), .05)
+                break
+            except asyncio.TimeoutError:
+                continue
+        else:
+            self.client_log.debug('Broker not responding')
+        self.sub_sock.setsockopt(zmq.UNSUBSCRIBE, probe)
 
         self.is_connected = True
 
     async def _subscribe_task(self):
         while self.is_connected:
-            [topic, content] = await self.sub_sock.recv_multipart()
+            if self.zero_copy:
+                [topic, content] = await self.sub_sock.recv_multipart(
+                    copy=False)
+                topic, content = topic.bytes, content.buffer
+            else:
+                [topic, content] = await self.sub_sock.recv_multipart()
+
+            # late echo of a connection probe
+            if topic.startswith(b'probe'):
+                continue
 
             self.client_log.debug(f'Receive message from "{topic}" topic with '
-                                  f'{content} content')
+                                  f'{content.hex()} content')
             if topic == b'disconnect' and content == b'broker':
                 self.is_connected = False
                 self.client_log.critical('Disconnected from broker')
@@ -69,10 +98,13 @@ class Client:
     async def _publish_task(self):
         while self.is_connected:
             (topic, content) = await self.messages_to_send.get()
+            if topic not in self.pub_topic_list:
+                self.client_log.warning(f'Topic "{topic}" not allowed')
+                continue
 
             self.client_log.debug(f'Sending message to "{topic}" topic with '
                                   f'{content} content')
-            await self.pub_sock.send_multipart([topic, content])
+            await self.pub_sock.send_multipart([topic, content], copy=False)
             self.client_log.debug('Message sent')
 
     def disconnect(self):
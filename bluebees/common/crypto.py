@@ -1,20 +1,117 @@
 from Crypto.Cipher import AES
 from Crypto.Hash import CMAC
 from Crypto.Random import get_random_bytes
+from collections import OrderedDict
+
+
+class KeyCache:
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def evict(self, key):
+        if self._entries.pop(key, None) is not None:
+            self.evictions += 1
+
+    def purge(self):
+        self.evictions += len(self._entries)
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
 
 
 class Crypto:
 
-    def __init__(self):
-        pass
+    def __init__(self, cache_size=256):
+        # (function name, *inputs) -> derived key material
+        self.derived_cache = KeyCache(maxsize=cache_size)
+        # ('ecb' | 'cmac', key) -> cipher object ready to be used
+        self.cipher_cache = KeyCache(maxsize=cache_size)
+        # salt constants (s1 of b'smk2', b'smk3', b'smk4')
+        self._salts = {}
+
+    def _salt(self, text: bytes):
+        salt = self._salts.get(text)
+        if salt is None:
+            salt = self.s1(text)
+            self._salts[text] = salt
+        return salt
+
+    def _derive(self, key: tuple, derive_func):
+        value = self.derived_cache.get(key)
+        if value is None:
+            value = derive_func()
+            self.derived_cache.put(key, value)
+        return value
+
+    # ! Must be called when a network key or an application key is rotated
+    def purge_cache(self):
+        self.derived_cache.purge()
+        self.cipher_cache.purge()
+
+    def _ecb(self, key: bytes):
+        cipher = self.cipher_cache.get(('ecb', key))
+        if cipher is None:
+            cipher = AES.new(key, mode=AES.MODE_ECB)
+            self.cipher_cache.put(('ecb', key), cipher)
+        return cipher
+
+    def _cmac(self, key: bytes, cache=True):
+        # ! one-shot keys (intermediate keys of k1..k4 and provisioning
+        # !   secrets) aren't cached, so they don't evict the long-lived keys
+        if not cache:
+            return CMAC.new(key=key, ciphermod=AES)
+
+        # * the cached object is never updated, only its copies. The copy
+        # *   reuses the subkeys of the cached object
+        cobj = self.cipher_cache.get(('cmac', key))
+        if cobj is None:
+            cobj = CMAC.new(key=key, ciphermod=AES)
+            self.cipher_cache.put(('cmac', key), cobj)
+        return cobj.copy()
 
     def e(self, key: bytes, plaintext: bytes):
-        cipher = AES.new(key, mode=AES.MODE_ECB)
-        msg = cipher.encrypt(plaintext)
+        msg = self._ecb(key).encrypt(plaintext)
         return msg[0:6]
 
-    def aes_cmac(self, key: bytes, text: bytes):
-        cobj = CMAC.new(key=key, ciphermod=AES)
+    def aes_cmac(self, key: bytes, text: bytes, cache=True):
+        cobj = self._cmac(key, cache)
         cobj.update(text)
         return cobj.digest()
 
@@ -42,28 +139,42 @@ class Crypto:
     def s1(self, text: bytes):
         return self.aes_cmac(key=b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00', text=text)
 
-    def k1(self, n: bytes, salt: bytes, p: bytes):
-        t = self.aes_cmac(salt, n)
-        return self.aes_cmac(key=t, text=p)
+    def k1(self, n: bytes, salt: bytes, p: bytes, cache=True):
+        if not cache:
+            return self._k1(n, salt, p, cache)
+        return self._derive(('k1', n, salt, p),
+                            lambda: self._k1(n, salt, p, cache))
 
     def k2(self, n: bytes, p: bytes):
-        salt = self.s1(b'smk2')
+        return self._derive(('k2', n, p), lambda: self._k2(n, p))
+
+    def k3(self, n: bytes):
+        return self._derive(('k3', n), lambda: self._k3(n))
+
+    def k4(self, n: bytes):
+        return self._derive(('k4', n), lambda: self._k4(n))
+
+    def _k1(self, n: bytes, salt: bytes, p: bytes, cache=True):
+        t = self.aes_cmac(salt, n, cache)
+        return self.aes_cmac(key=t, text=p, cache=False)
+
+    def _k2(self, n: bytes, p: bytes):
+        salt = self._salt(b'smk2')
         t = self.aes_cmac(salt, n)
         t0 = b''
-        t1 = self.aes_cmac(t, t0 + p + b'\x01')
-        t2 = self.aes_cmac(t, t1 + p + b'\x02')
-        t3 = self.aes_cmac(t, t2 + p + b'\x03')
+        t1 = self.aes_cmac(t, t0 + p + b'\x01', cache=False)
+        t2 = self.aes_cmac(t, t1 + p + b'\x02', cache=False)
+        t3 = self.aes_cmac(t, t2 + p + b'\x03', cache=False)
         return (int.from_bytes((t1 + t2 + t3), 'big') % (2**263)).to_bytes(33, 'big')
 
-    def k3(self, n: bytes):
-        salt = self.s1(b'smk3')
+    def _k3(self, n: bytes):
+        salt = self._salt(b'smk3')
         t = self.aes_cmac(salt, n)
-        return (int.from_bytes(self.aes_cmac(t, b'id64' + b'\x01'), 'big') % (2**64)).to_bytes(8, 'big')
+        return (int.from_bytes(self.aes_cmac(t, b'id64' + b'\x01', cache=False), 'big') % (2**64)).to_bytes(8, 'big')
 
-    def k4(self, n: bytes):
-        salt = self.s1(b'smk4')
+    def _k4(self, n: bytes):
+        salt = self._salt(b'smk4')
         t = self.aes_cmac(salt, n)
-        return (int.from_bytes(self.aes_cmac(t, b'id6' + b'\x01'), 'big') % (2 ** 6)).to_bytes(1, 'big')
-
+        return (int.from_bytes(self.aes_cmac(t, b'id6' + b'\x01', cache=False), 'big') % (2 ** 6)).to_bytes(1, 'big')
 
 crypto = Crypto()
@@ -0,0 +1,74 @@
+from collections import OrderedDict
+import time
+
+
+class DedupCache:
+    '''Remembers the messages seen in the last `ttl` seconds.
+
+    Each entry expires `ttl` seconds after it was first seen, so a message
+    repeated forever (like a beacon) is delivered again once per `ttl`. At
+    most `capacity` entries are kept, the least recently seen is evicted
+    first.'''
+
+    def __init__(self, ttl=300.0, capacity=1024, clock=time.monotonic):
+        self.ttl = ttl
+        self.capacity = capacity
+        self.clock = clock
+
+        self.duplicates = 0
+        self.uniques = 0
+        self.expirations = 0
+        self.evictions = 0
+
+        # key -> expiry time
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expire(self, now: float):
+        # * a duplicate is moved to the tail, so an expired entry out of the
+        # *   head is removed on its next lookup or by capacity eviction
+        while self._entries:
+            key, expiry = next(iter(self._entries.items()))
+            if expiry > now:
+                break
+            del self._entries[key]
+            self.expirations += 1
+
+    def seen(self, key) -> bool:
+        now = self.clock()
+        self._expire(now)
+
+        expiry = self._entries.get(key)
+        if expiry is not None and expiry > now:
+            self._entries.move_to_end(key)
+            self.duplicates += 1
+            return True
+
+        if expiry is not None:
+            self.expirations += 1
+        self._entries[key] = now + self.ttl
+        self._entries.move_to_end(key)
+        self.uniques += 1
+
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+        return False
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        total = self.duplicates + self.uniques
+        return {
+            'size': len(self._entries),
+            'capacity': self.capacity,
+            'duplicates': self.duplicates,
+            'uniques': self.uniques,
+            'expirations': self.expirations,
+            'evictions': self.evictions,
+            'duplicate_rate': self.duplicates / total if total else 0.0
+        }
@@ -0,0 +1,180 @@
+from dataclasses import dataclass
+from Crypto.PublicKey import ECC
+from ecdsa import NIST256p, SigningKey
+from ecdsa.ellipticcurve import Point
+import asyncio
+import queue
+import threading
+
+# * optional backend, it is the fastest when installed
+try:
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives.asymmetric import ec as crypto_ec
+except ImportError:
+    crypto_ec = None
+
+# NIST P-256 curve: y^2 = x^3 - 3x + b (mod p)
+_p = NIST256p.curve.p()
+_b = NIST256p.curve.b()
+
+
+class EcError(Exception):
+    pass
+
+
+class EcBackendNotFound(Exception):
+    pass
+
+
+@dataclass
+class KeyPair:
+    private_key: object     # backend specific
+    public_key: bytes       # x and y, 64 bytes
+
+
+def public_key_point(public_key: bytes) -> (int, int):
+    if len(public_key) != 64:
+        raise EcError('The length of public key must be 64 bytes')
+
+    x = int.from_bytes(public_key[0:32], 'big')
+    y = int.from_bytes(public_key[32:64], 'big')
+    if x >= _p or y >= _p or (y * y - (x * x * x - 3 * x + _b)) % _p != 0:
+        raise EcError('The public key is not a point of P-256 curve')
+
+    return x, y
+
+
+def point_bytes(x: int, y: int) -> bytes:
+    return int(x).to_bytes(32, 'big') + int(y).to_bytes(32, 'big')
+
+
+class CryptographyBackend:
+
+    name = 'cryptography'
+
+    @staticmethod
+    def available() -> bool:
+        return crypto_ec is not None
+
+    def generate(self) -> KeyPair:
+        private_key = crypto_ec.generate_private_key(crypto_ec.SECP256R1(),
+                                                     default_backend())
+        numbers = private_key.public_key().public_numbers()
+        return KeyPair(private_key, point_bytes(numbers.x, numbers.y))
+
+    def ecdh(self, private_key, public_key: bytes) -> bytes:
+        x, y = public_key_point(public_key)
+        peer_key = crypto_ec.EllipticCurvePublicNumbers(
+            x, y, crypto_ec.SECP256R1()).public_key(default_backend())
+        return private_key.exchange(crypto_ec.ECDH(), peer_key)
+
+
+class PycryptodomeBackend:
+
+    name = 'pycryptodome'
+
+    @staticmethod
+    def available() -> bool:
+        return True
+
+    def generate(self) -> KeyPair:
+        key = ECC.generate(curve='P-256')
+        return KeyPair(int(key.d), point_bytes(key.pointQ.x, key.pointQ.y))
+
+    def ecdh(self, private_key, public_key: bytes) -> bytes:
+        x, y = public_key_point(public_key)
+        secret = ECC.EccPoint(x, y) * private_key
+        return int(secret.x).to_bytes(32, 'big')
+
+
+class EcdsaBackend:
+
+    name = 'ecdsa'
+
+    @staticmethod
+    def available() -> bool:
+        return True
+
+    def generate(self) -> KeyPair:
+        sk = SigningKey.generate(curve=NIST256p)
+        point = sk.get_verifying_key().pubkey.point
+        return KeyPair(sk.privkey.secret_multiplier,
+                       point_bytes(point.x(), point.y()))
+
+    def ecdh(self, private_key, public_key: bytes) -> bytes:
+        x, y = public_key_point(public_key)
+        secret = Point(NIST256p.curve, x, y) * private_key
+        return secret.x().to_bytes(32, 'big')
+
+
+# from the fastest to the slowest
+backends = [CryptographyBackend, PycryptodomeBackend, EcdsaBackend]
+
+
+# ! The key pairs are generated in a worker thread, so the event loop (and
+# !   the PB-ADV timers) never wait the key generation
+class KeyPairPool:
+
+    def __init__(self, backend, size=4):
+        self.backend = backend
+        self._pairs = queue.Queue(maxsize=size)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _fill(self):
+        while not self._stop.is_set():
+            key_pair = self.backend.generate()
+            while not self._stop.is_set():
+                try:
+                    self._pairs.put(key_pair, timeout=.5)
+                    break
+                except queue.Full:
+                    continue
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._fill, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    async def acquire(self) -> KeyPair:
+        self.start()
+        try:
+            return self._pairs.get_nowait()
+        except queue.Empty:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(None, self._pairs.get)
+
+
+class Ec:
+
+    def __init__(self):
+        self.backend = None
+        self.pool = None
+        self.set_backend(next(b.name for b in backends if b.available()))
+
+    def set_backend(self, name: str):
+        for backend in backends:
+            if backend.name == name and backend.available():
+                break
+        else:
+            raise EcBackendNotFound(name)
+
+        if self.pool:
+            self.pool.stop()
+        self.backend = backend()
+        self.pool = KeyPairPool(self.backend)
+
+    async def key_pair(self) -> KeyPair:
+        return await self.pool.acquire()
+
+    async def ecdh(self, key_pair: KeyPair, public_key: bytes) -> bytes:
+        '''Returns the x coordinate of shared point (32 bytes)'''
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.backend.ecdh,
+                                          key_pair.private_key, public_key)
+
+
+ec = Ec()
@@ -0,0 +1,66 @@
+from bluebees.common.storage import storage
+from abc import ABC, abstractmethod
+import time
+
+
+class FileIndex(ABC):
+    '''Keeps an in-memory view of the records stored in a directory.
+
+    Subclasses load each file once and get notified when a file is created,
+    changed or removed. Changes are detected by comparing the stamps of the
+    storage (mtime and size of the YAML files or the version of the SQLite
+    records), at most once every `check_interval` seconds.'''
+
+    def __init__(self, dirpath: str, check_interval=1.0):
+        self.dirpath = dirpath
+        self.check_interval = check_interval
+
+        self._stamps = {}
+        self._last_check = None
+
+    @abstractmethod
+    def _load_file(self, filename: str):
+        pass
+
+    @abstractmethod
+    def _drop_file(self, filename: str):
+        pass
+
+    def _on_change(self):
+        pass
+
+    def invalidate(self):
+        self._last_check = None
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and self._last_check is not None and \
+           now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+
+        stamps = storage.stamps(self.dirpath)
+
+        changed = False
+        for filename in list(self._stamps.keys()):
+            if filename not in stamps:
+                self._drop_file(filename)
+                changed = True
+
+        for filename, stamp in sorted(stamps.items()):
+            if self._stamps.get(filename) == stamp:
+                continue
+
+            try:
+                self._load_file(filename)
+            except Exception:
+                # file being written by another process, retry on next check
+                if filename in self._stamps:
+                    self._drop_file(filename)
+                del stamps[filename]
+                self._last_check = None
+            changed = True
+
+        self._stamps = stamps
+        if changed:
+            self._on_change()
@@ -1,4 +1,4 @@
-from bluebees.common.file import file_helper
+from bluebees.common.storage import storage
 from dataclasses import asdict
 
 
@@ -7,9 +7,42 @@ class Serializable:
     def __init__(self, filename):
         self.filename = filename
 
+    def index_columns(self) -> dict:
+        '''Values of indexed columns, used by the finds of storage'''
+        return {}
+
+    def _column(self, column: str):
+        # * plain fields are read directly, only the derived columns (like
+        # *   nid and aid) need the index_columns
+        if column in self.__dataclass_fields__:
+            return getattr(self, column)
+        return self.index_columns().get(column)
+
     def save(self):
-        file_helper.write(self.filename, asdict(self))
+        storage.write(self.filename, asdict(self), self.index_columns)
 
     @classmethod
     def load(cls, filename):
-        return cls(**file_helper.read(filename))
+        return cls(**storage.read(filename))
+
+    @classmethod
+    def load_all(cls, dirpath) -> list:
+        return [cls(**content) for _, content in
+                sorted(storage.read_all(dirpath).items())]
+
+    @classmethod
+    def find(cls, dirpath, column, value) -> list:
+        filenames = storage.find(dirpath, column, value)
+        if filenames is not None:
+            return [cls.load(dirpath + f) for f in filenames]
+
+        return [data for data in cls.load_all(dirpath)
+                if data._column(column) == value]
+
+    @classmethod
+    def values(cls, dirpath, column) -> list:
+        values = storage.values(dirpath, column)
+        if values is not None:
+            return values
+
+        return [data._column(column) for data in cls.load_all(dirpath)]
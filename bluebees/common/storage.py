@@ -0,0 +1,239 @@
+from bluebees.common.file import file_helper
+from bluebees.client.data_paths import base_dir, db_file
+from contextlib import contextmanager
+import sqlite3
+import json
+import time
+import os
+
+# columns of records indexed by the SQLite storage
+INDEX_COLUMNS = ['name', 'addr', 'nid', 'aid', 'key_index']
+
+
+class StorageError(Exception):
+    pass
+
+
+def _split(filename: str) -> (str, str):
+    dirpath, name = os.path.split(filename)
+    return dirpath + '/', name
+
+
+def _encode(value):
+    if isinstance(value, (bytes, bytearray)):
+        return {'__bytes__': bytes(value).hex()}
+    if isinstance(value, dict):
+        return {k: _encode(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        if list(value.keys()) == ['__bytes__']:
+            return bytes.fromhex(value['__bytes__'])
+        return {k: _decode(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    return value
+
+
+# ! One YAML file per record. There isn't index, so the finds scan the
+# !   directory and parse all files
+class YamlStorage:
+
+    def read(self, filename: str) -> dict:
+        return file_helper.read(filename)
+
+    def write(self, filename: str, content: dict, index_columns=None):
+        file_helper.write(filename, content)
+
+    def list_files(self, dirpath: str) -> list:
+        return file_helper.list_files(dirpath)
+
+    def read_all(self, dirpath: str) -> dict:
+        return {f: self.read(dirpath + f) for f in self.list_files(dirpath)}
+
+    def stamps(self, dirpath: str) -> dict:
+        stamps = {}
+        for filename in self.list_files(dirpath):
+            try:
+                stat = os.stat(dirpath + filename)
+            except FileNotFoundError:
+                continue
+            stamps[filename] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+
+    def find(self, dirpath: str, column: str, value) -> list:
+        return None
+
+    def values(self, dirpath: str, column: str) -> list:
+        return None
+
+    @contextmanager
+    def transaction(self):
+        yield
+
+
+# ! All records in a single file. The filenames of YAML tree are kept as
+# !   keys, so the callers don't know which storage is used. The writes are
+# !   committed only at the end of the outermost transaction.
+class SqliteStorage:
+
+    def __init__(self, path: str, timeout=10.0):
+        self.path = path
+
+        if not file_helper.dir_exist(path):
+            os.makedirs(os.path.dirname(path))
+        # * the transactions are managed by hand
+        self.conn = sqlite3.connect(path, timeout=timeout,
+                                    isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self._create_tables()
+
+        self._depth = 0
+
+    def _create_tables(self):
+        self.conn.execute('CREATE TABLE IF NOT EXISTS records ('
+                          'dir TEXT NOT NULL, filename TEXT NOT NULL, '
+                          'content TEXT NOT NULL, '
+                          'updated INTEGER NOT NULL, '
+                          'version INTEGER NOT NULL, '
+                          'name TEXT, addr BLOB, nid INTEGER, aid INTEGER, '
+                          'key_index BLOB, '
+                          'PRIMARY KEY (dir, filename))')
+        for column in INDEX_COLUMNS:
+            self.conn.execute(f'CREATE INDEX IF NOT EXISTS records_{column} '
+                              f'ON records (dir, {column})')
+
+    def close(self):
+        self.conn.close()
+
+    def _check_column(self, column: str):
+        if column not in INDEX_COLUMNS:
+            raise StorageError(f'Column "{column}" is not indexed')
+
+    def read(self, filename: str) -> dict:
+        row = self.conn.execute('SELECT content FROM records WHERE dir = ? '
+                                'AND filename = ?',
+                                _split(filename)).fetchone()
+        if not row:
+            return {}
+        return _decode(json.loads(row[0]))
+
+    def write(self, filename: str, content: dict, index_columns=None):
+        # * the columns are computed only here, since some are derived keys
+        columns = index_columns() if index_columns else {}
+        for column in columns.keys():
+            self._check_column(column)
+
+        dirpath, name = _split(filename)
+        values = [columns.get(c) for c in INDEX_COLUMNS]
+        self.conn.execute('INSERT OR REPLACE INTO records VALUES '
+                          '(?, ?, ?, ?, COALESCE((SELECT version FROM records '
+                          'WHERE dir = ? AND filename = ?), 0) + 1, '
+                          '?, ?, ?, ?, ?)',
+                          [dirpath, name, json.dumps(_encode(content)),
+                           time.time_ns(), dirpath, name] + values)
+
+    def list_files(self, dirpath: str) -> list:
+        rows = self.conn.execute('SELECT filename FROM records WHERE dir = ? '
+                                 'ORDER BY filename', (dirpath,))
+        return [r[0] for r in rows]
+
+    def read_all(self, dirpath: str) -> dict:
+        rows = self.conn.execute('SELECT filename, content FROM records '
+                                 'WHERE dir = ?', (dirpath,))
+        return {r[0]: _decode(json.loads(r[1])) for r in rows}
+
+    def stamps(self, dirpath: str) -> dict:
+        rows = self.conn.execute('SELECT filename, updated, version FROM '
+                                 'records WHERE dir = ?', (dirpath,))
+        return {r[0]: (r[1], r[2]) for r in rows}
+
+    def find(self, dirpath: str, column: str, value) -> list:
+        self._check_column(column)
+        rows = self.conn.execute(f'SELECT filename FROM records WHERE '
+                                 f'dir = ? AND {column} = ? ORDER BY filename',
+                                 (dirpath, value))
+        return [r[0] for r in rows]
+
+    def values(self, dirpath: str, column: str) -> list:
+        self._check_column(column)
+        rows = self.conn.execute(f'SELECT {column} FROM records WHERE dir = ? '
+                                 f'ORDER BY filename', (dirpath,))
+        return [r[0] for r in rows]
+
+    @contextmanager
+    def transaction(self):
+        if self._depth == 0:
+            # * takes the write lock now, so the reads inside the transaction
+            # *   aren't changed by another process
+            self.conn.execute('BEGIN IMMEDIATE')
+        self._depth += 1
+
+        try:
+            yield
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                self.conn.execute('ROLLBACK')
+            raise
+
+        self._depth -= 1
+        if self._depth == 0:
+            self.conn.execute('COMMIT')
+
+
+# ! The SQLite storage is used when its file exists, created by the
+# !   "core storage --import" command. Otherwise the YAML tree is used
+class Storage:
+
+    def __init__(self):
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            if file_helper.file_exist(base_dir + db_file):
+                self._backend = SqliteStorage(base_dir + db_file)
+            else:
+                self._backend = YamlStorage()
+        return self._backend
+
+    def use(self, backend):
+        self._backend = backend
+
+    def read(self, filename: str) -> dict:
+        return self.backend.read(filename)
+
+    def write(self, filename: str, content: dict, index_columns=None):
+        '''index_columns is a function returning the values of the indexed
+        columns, called only by the storages with index'''
+        self.backend.write(filename, content, index_columns)
+
+    def list_files(self, dirpath: str) -> list:
+        return self.backend.list_files(dirpath)
+
+    def read_all(self, dirpath: str) -> dict:
+        return self.backend.read_all(dirpath)
+
+    def stamps(self, dirpath: str) -> dict:
+        return self.backend.stamps(dirpath)
+
+    def find(self, dirpath: str, column: str, value) -> list:
+        '''Returns the filenames where column is equal value or None when the
+        storage hasn't index'''
+        return self.backend.find(dirpath, column, value)
+
+    def values(self, dirpath: str, column: str) -> list:
+        '''Returns the column of all records or None when the storage hasn't
+        index'''
+        return self.backend.values(dirpath, column)
+
+    def transaction(self):
+        return self.backend.transaction()
+
+
+storage = Storage()
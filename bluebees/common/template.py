@@ -57,6 +57,12 @@ class TemplateHelper:
 
         return field_value
 
+    def is_random(self, template, field_name) -> bool:
+        field_raw_value = template[field_name]
+        if type(field_raw_value) != str:
+            return False
+        return bool(re.findall(self._random_pattern, field_raw_value))
+
     def update_sequence(self, template, field_name, custom_pattern=None):
         field_raw_value = template[field_name]
 
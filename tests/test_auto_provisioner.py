@@ -0,0 +1,153 @@
+from bluebees.client.device.auto_provisioner import AutoProvisioner, \
+    NodeNameError
+from bluebees.client.device.commands.provision_all import report
+from bluebees.client.node.provisioner import LinkOpenError
+from bluebees.client.network.network_data import NetworkData
+from bluebees.client.data_paths import base_dir, net_dir
+from Crypto.Random import get_random_bytes
+import asyncio
+import pathlib
+import pytest
+
+
+def beacon(uuid: bytes) -> bytes:
+    return b'\x00' + uuid + b'\x00\x00'
+
+
+def test_beacon_pipeline():
+    async def run():
+        auto_prov = AutoProvisioner(network='test_net',
+                                    template={'name': 'test_auto_node'},
+                                    patterns=['0011*', '00AB*'],
+                                    allow_list=['FF' * 16], max_sessions=1)
+        uuid_a = bytes.fromhex('0011') + bytes(14)
+        uuid_b = b'\xff' * 16
+        uuid_c = bytes.fromhex('0022') + bytes(14)
+
+        # duplicated beacons, filtered uuid and provisioned device beacon
+        for content in [beacon(uuid_a), beacon(uuid_a), beacon(uuid_c),
+                        beacon(uuid_b), b'\x01' + bytes(21)]:
+            await auto_prov._on_message(b'beacon', content)
+        assert auto_prov.pending.qsize() == 2
+        assert auto_prov.pending.get_nowait() == uuid_a
+        assert auto_prov.pending.get_nowait() == uuid_b
+        assert auto_prov.accept(bytes.fromhex('00ab') + bytes(14))
+
+        # bounded queue, the device is queued on a later beacon
+        for i in range(1, 6):
+            await auto_prov._on_message(b'beacon', beacon(uuid_a[0:2] +
+                                                          bytes([i]) * 14))
+        assert auto_prov.pending.full()
+        assert bytes.fromhex('0011') + bytes([5]) * 14 not in auto_prov.seen
+
+        # failed devices are retried until max attempts
+        for _ in range(auto_prov.max_attempts):
+            auto_prov.seen.add(uuid_a)
+            auto_prov._provisioning_fail(uuid_a)
+        assert uuid_a in auto_prov.seen
+        assert auto_prov.attempts[uuid_a] == auto_prov.max_attempts
+
+        for coro in auto_prov.client_tasks + auto_prov.all_tasks:
+            coro.close()
+        auto_prov.pub_sock.close()
+        auto_prov.sub_sock.close()
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+def test_retry_reuses_reservation():
+    NetworkData(name='test_auto_net', key=get_random_bytes(16),
+                key_index=b'\x00\x00', iv_index=bytes(4)).save()
+
+    async def run():
+        auto_prov = AutoProvisioner(network='test_auto_net',
+                                    template={'name': 'test_auto_node'},
+                                    max_sessions=1)
+        uuid_a = bytes.fromhex('0011') + bytes(14)
+        uuid_b = bytes.fromhex('0022') + bytes(14)
+
+        name, address = auto_prov._next_node(uuid_a)
+        assert auto_prov._next_node(uuid_a) == (name, address)
+        with pytest.raises(NodeNameError):
+            auto_prov._next_node(uuid_b)
+
+        # fails once, then succeeds with the same name and address
+        attempts = []
+        saved = []
+
+        async def provision(uuid, *args):
+            attempts.append((uuid, args[3]))
+            if len(attempts) == 1:
+                raise LinkOpenError
+            return bytes(16)
+
+        auto_prov.provision = provision
+        auto_prov._save_node = lambda *args: saved.append(args)
+        session = asyncio.ensure_future(auto_prov._session_task(0))
+        auto_prov.pending.put_nowait(uuid_a)
+        await asyncio.sleep(0)
+        assert auto_prov.results[uuid_a] == (name, 'Provisioning fail')
+
+        auto_prov.pending.put_nowait(uuid_a)
+        await asyncio.sleep(0)
+        session.cancel()
+
+        assert attempts == [(uuid_a, address), (uuid_a, address)]
+        assert saved == [(name, uuid_a, address, bytes(16))]
+        assert auto_prov.results == {uuid_a: (name, '')}
+
+        for coro in auto_prov.client_tasks + auto_prov.all_tasks:
+            coro.close()
+        auto_prov.pub_sock.close()
+        auto_prov.sub_sock.close()
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+def test_random_name_redraw():
+    async def run():
+        auto_prov = AutoProvisioner(network='test_auto_net',
+                                    template={'name': 'test_rand_node\\d'},
+                                    max_sessions=1)
+        auto_prov.max_name_draws = 200
+
+        # the colliding names are drawn again
+        names = set()
+        for x in range(10):
+            name, _ = auto_prov._next_node(bytes([x]) * 16)
+            names.add(name)
+        assert len(names) == 10
+
+        with pytest.raises(NodeNameError):
+            auto_prov._next_node(b'\xaa' * 16)
+
+        # the device without name is reported
+        session = asyncio.ensure_future(auto_prov._session_task(0))
+        auto_prov.pending.put_nowait(b'\xaa' * 16)
+        await asyncio.sleep(0)
+        session.cancel()
+        name, error = auto_prov.results[b'\xaa' * 16]
+        assert name is None and error
+
+        for coro in auto_prov.client_tasks + auto_prov.all_tasks:
+            coro.close()
+        auto_prov.pub_sock.close()
+        auto_prov.sub_sock.close()
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+def test_report(capsys):
+    results = {b'\x01' * 16: ('node1', ''), b'\x02' * 16: ('node2', ''),
+               b'\x03' * 16: ('node3', 'Provisioning fail')}
+    config_results = {b'\x01' * 16: '', b'\x02' * 16: 'Error on bind'}
+    report(results, config_results)
+
+    out = capsys.readouterr().out
+    assert 'node2 (' + '02' * 16 + '): created, config fail' in out
+    assert '2 of 3 nodes created' in out
+    assert '1 of 2 nodes configured' in out
+
+
+def test_cleanup():
+    pathlib.Path(base_dir + net_dir + 'test_auto_net.yml').unlink()
@@ -0,0 +1,51 @@
+from bluebees.common.broker import Broker
+from bluebees.common.client import Client
+import asyncio
+
+
+def test_broker_loopback():
+    async def run():
+        loop = asyncio.get_event_loop()
+        broker = Broker(loop)
+        broker_tasks = broker.tasks()
+
+        client_a = Client(sub_topic_list=[b'prov'], pub_topic_list=[b'message'])
+        client_b = Client(sub_topic_list=[b'message'],
+                          pub_topic_list=[b'prov'])
+        await client_b.spwan_tasks(loop)
+        await client_a.spwan_tasks(loop)
+
+        # first messages, sent right after connecting
+        await client_a.messages_to_send.put((b'message', b'\x01\x02'))
+        await client_b.messages_to_send.put((b'prov', b'\x03\x04'))
+
+        assert await asyncio.wait_for(client_b.messages_received.get(), 1) \
+            == (b'message', b'\x01\x02')
+        assert await asyncio.wait_for(client_a.messages_received.get(), 1) \
+            == (b'prov', b'\x03\x04')
+
+        # topics not subscribed aren't delivered
+        await asyncio.sleep(0.1)
+        assert client_a.messages_received.empty()
+        assert client_b.messages_received.empty()
+
+        # a malformed message doesn't stop the broker
+        await client_a.pub_sock.send_multipart([b'message'])
+        await client_a.pub_sock.send_multipart([b'message', b'\x05', b'\x06'])
+        await client_a.messages_to_send.put((b'message', b'\x07'))
+        assert await asyncio.wait_for(client_b.messages_received.get(), 1) \
+            == (b'message', b'\x07')
+
+        for client in [client_a, client_b]:
+            client.is_connected = False
+            client.pub_sock.close()
+            client.sub_sock.close()
+        broker_tasks.cancel()
+        broker.pub_sock.close()
+        broker.listen_sock.close()
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(run())
+    for task in asyncio.Task.all_tasks() if hasattr(asyncio.Task, 'all_tasks') \
+            else asyncio.all_tasks(loop):
+        task.cancel()
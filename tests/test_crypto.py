@@ -1,4 +1,5 @@
-from bluebees.common.crypto import crypto
+from bluebees.common.crypto import crypto, Crypto
+from Crypto.Random import get_random_bytes
 
 
 def test_s1():
@@ -127,3 +128,63 @@ def test_aes_ccm_mic_check():
                                            encrypted_pdu, mic)
     assert result == expected_result
     assert check is True
+
+
+def test_derived_key_cache():
+    cache_crypto = Crypto(cache_size=2)
+    n = bytes.fromhex('3216d1509884b533248541792b877f98')
+
+    assert cache_crypto.k4(n) == bytes.fromhex('38')
+    assert cache_crypto.derived_cache.misses == 1
+    assert cache_crypto.derived_cache.hits == 0
+
+    assert cache_crypto.k4(n) == bytes.fromhex('38')
+    assert cache_crypto.derived_cache.hits == 1
+
+    cache_crypto.k3(n)
+    cache_crypto.k2(n, b'\x00')
+    assert len(cache_crypto.derived_cache) == 2
+    assert cache_crypto.derived_cache.evictions == 1
+    assert ('k4', n) not in cache_crypto.derived_cache
+
+    cache_crypto.purge_cache()
+    assert len(cache_crypto.derived_cache) == 0
+    assert cache_crypto.k4(n) == bytes.fromhex('38')
+    assert cache_crypto.derived_cache.stats()['misses'] == 4
+
+
+def test_cipher_cache():
+    cache_crypto = Crypto(cache_size=4)
+    key = bytes.fromhex('8b84eedec100067d670971dd2aa700cf')
+    plaintext = bytes.fromhex('000000000012345678b5e5bfdacbaf6c')
+
+    pecb = cache_crypto.e(key, plaintext)
+    assert cache_crypto.e(key, plaintext) == pecb
+    assert cache_crypto.cipher_cache.hits == 1
+
+    mac = cache_crypto.aes_cmac(key, b'text')
+    assert cache_crypto.aes_cmac(key, b'text') == mac
+    assert cache_crypto.aes_cmac(key, b'other text') != mac
+    assert mac == crypto.aes_cmac(key, b'text')
+    assert cache_crypto.cipher_cache.hits == 3
+
+
+def test_cipher_cache_one_shot_keys():
+    cache_crypto = Crypto(cache_size=4)
+    n = bytes.fromhex('7dd7364cd842ad18c17c2b820c84c3d6')
+
+    # only the salt keys are cached, not the intermediate t keys
+    for x in range(4):
+        cache_crypto.k2(bytes([x]) + n[1:], b'\x00')
+        cache_crypto.k4(bytes([x]) + n[1:])
+    assert len(cache_crypto.cipher_cache) == 3
+    assert cache_crypto.cipher_cache.evictions == 0
+
+    # provisioning secrets
+    salt = get_random_bytes(16)
+    uncached = cache_crypto.k1(n, salt, b'prck', cache=False)
+    assert uncached == crypto.k1(n, salt, b'prck')
+    assert cache_crypto.aes_cmac(salt, b'text', cache=False) == \
+        crypto.aes_cmac(salt, b'text')
+    assert ('cmac', salt) not in cache_crypto.cipher_cache
+    assert ('k1', n, salt, b'prck') not in cache_crypto.derived_cache
@@ -0,0 +1,59 @@
+from bluebees.client.core.daemon import Daemon, ctx_to_dict, ctx_from_dict, \
+                                        _call, daemon_call, daemon_filename
+from bluebees.client.mesh_layers.mesh_context import SoftContext
+from bluebees.common.file import file_helper
+import subprocess
+import asyncio
+import time
+import sys
+import os
+
+
+def test_ctx_dict():
+    ctx = SoftContext(src_addr=b'\x00\x01', dst_addr=b'\x00\x20',
+                      node_name='node', network_name='net',
+                      application_name='app', is_devkey=False,
+                      ack_timeout=30, segment_timeout=10)
+    assert ctx_from_dict(ctx_to_dict(ctx)) == ctx
+
+
+def test_rpc():
+    url = 'tcp://127.0.0.1:9519'
+
+    async def run():
+        daemon = Daemon(url=url)
+        rpc_task = asyncio.ensure_future(daemon._rpc_task())
+
+        loop = asyncio.get_event_loop()
+        result = await loop.run_in_executor(None, _call, url, 'ping', {}, 1)
+        assert result == {'pid': os.getpid()}
+        result = await loop.run_in_executor(None, _call, url, 'unknown', {},
+                                            1)
+        assert 'error' in result
+
+        rpc_task.cancel()
+        for coro in daemon.element.client_tasks + daemon.element.all_tasks:
+            coro.close()
+        daemon.rpc_sock.close()
+        daemon.element.pub_sock.close()
+        daemon.element.sub_sock.close()
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+def test_stale_daemon_file():
+    # killed daemon, the pid isn't alive anymore
+    proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+    proc.wait()
+    file_helper.write(daemon_filename, {'url': 'tcp://127.0.0.1:9518',
+                                        'pid': proc.pid})
+    start = time.monotonic()
+    assert daemon_call('ping', {}, 1) is None
+    assert time.monotonic() - start < .5
+    assert not file_helper.file_exist(daemon_filename)
+
+    # the pid was reused by another process, the ping fails
+    file_helper.write(daemon_filename, {'url': 'tcp://127.0.0.1:9518',
+                                        'pid': os.getpid()})
+    assert daemon_call('ping', {}, 1) is None
+    assert not file_helper.file_exist(daemon_filename)
@@ -0,0 +1,46 @@
+from bluebees.common.dedup_cache import DedupCache
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_duplicate():
+    cache = DedupCache(ttl=10, capacity=8, clock=FakeClock())
+
+    assert not cache.seen(b'a')
+    assert cache.seen(b'a')
+    assert not cache.seen(b'b')
+    assert cache.stats()['duplicate_rate'] == 1 / 3
+
+
+def test_expiry():
+    clock = FakeClock()
+    cache = DedupCache(ttl=10, capacity=8, clock=clock)
+
+    assert not cache.seen(b'a')
+    clock.now = 9.9
+    assert cache.seen(b'a')
+    # expiry is counted from the first time the message was seen
+    clock.now = 10.0
+    assert not cache.seen(b'a')
+    assert cache.stats()['expirations'] == 1
+
+
+def test_capacity():
+    cache = DedupCache(ttl=10, capacity=2, clock=FakeClock())
+
+    cache.seen(b'a')
+    cache.seen(b'b')
+    cache.seen(b'a')
+    cache.seen(b'c')
+
+    assert len(cache) == 2
+    assert cache.stats()['evictions'] == 1
+    assert cache.seen(b'a')
+    assert not cache.seen(b'b')
@@ -0,0 +1,80 @@
+from bluebees.client.core.dongle import PipelinedWriter, SerialMessage, \
+                                        LineFramer, serial_frame, parse_frame
+import asyncio
+
+
+class LoopbackSerial:
+
+    def __init__(self, received=b'', chunk=7):
+        self.written = []
+        self.received = received
+        self.chunk = chunk
+
+    @property
+    def in_waiting(self) -> int:
+        return min(self.chunk, len(self.received))
+
+    async def read(self, n: int) -> bytes:
+        data, self.received = self.received[:n], self.received[n:]
+        return data
+
+    async def write(self, data: bytes):
+        self.written.append(data)
+
+
+def frame(n: int) -> bytes:
+    return serial_frame(SerialMessage(msg_type=b'message', xmit=b'2',
+                                      intms=b'20', content_b64=b'%d' % n,
+                                      address=None))
+
+
+def test_serial_frame():
+    msg = SerialMessage(msg_type=b'reset', xmit=b'0', intms=b'00',
+                        content_b64=b'bm9uZQ==', address=None)
+    assert serial_frame(msg) == b'@reset 0 00 bm9uZQ==\r\n'
+
+
+def test_pipelined_writer():
+    async def run():
+        ser = LoopbackSerial()
+        writer = PipelinedWriter(ser, window=2, echo_timeout=0.2)
+
+        await writer.write(frame(0))
+        await writer.write(frame(1))
+        blocked = asyncio.ensure_future(writer.write(frame(2)))
+        await asyncio.sleep(0.05)
+        assert ser.written == [frame(0), frame(1)]
+
+        # the echo of second frame releases the first one too
+        assert writer.echo(frame(1))
+        await asyncio.wait_for(blocked, 0.1)
+        assert ser.written == [frame(0), frame(1), frame(2)]
+        assert not writer.echo(frame(0))
+
+        # frames without echo are released by timeout
+        await writer.write(frame(3))
+        await asyncio.wait_for(writer.write(frame(4)), 0.5)
+        assert writer.echo_timeouts == 2
+        assert writer.frames_written == 5
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+def test_line_framer():
+    stream = b'@message bm9uZQ== 0001\r\n***** BLE Mesh Dongle v1.0 *****\r\n' \
+             b'@message 2 20 bm9uZQ==\r\n@beacon AAE= 0002\r\n'
+
+    async def run():
+        framer = LineFramer(LoopbackSerial(received=stream))
+        frames = [await framer.read_frame() for _ in range(4)]
+        assert b''.join(frames) == stream
+        assert framer.stats()['frames'] == 4
+        assert framer.stats()['bytes'] == len(stream)
+
+        assert parse_frame(frames[0]) == SerialMessage(
+            msg_type=b'message', xmit=None, intms=None,
+            content_b64=b'bm9uZQ==', address=b'0001')
+        assert parse_frame(frames[1]) is None
+        assert parse_frame(frames[2]) is None
+
+    asyncio.get_event_loop().run_until_complete(run())
@@ -0,0 +1,41 @@
+from bluebees.common.ec import Ec, EcError, EcBackendNotFound, backends
+import asyncio
+import pytest
+
+
+def test_backends_ecdh():
+    available = [b() for b in backends if b.available()]
+    assert available
+
+    # the secrets are the same between backends
+    key_pairs = [backend.generate() for backend in available]
+    for backend_a, key_pair_a in zip(available, key_pairs):
+        for backend_b, key_pair_b in zip(available, key_pairs):
+            assert backend_a.ecdh(key_pair_a.private_key,
+                                  key_pair_b.public_key) == \
+                backend_b.ecdh(key_pair_b.private_key, key_pair_a.public_key)
+
+    for backend, key_pair in zip(available, key_pairs):
+        assert len(key_pair.public_key) == 64
+        bad_public_key = key_pair.public_key[0:63] + \
+            bytes([key_pair.public_key[63] ^ 0x01])
+        with pytest.raises(EcError):
+            backend.ecdh(key_pair.private_key, bad_public_key)
+
+
+def test_key_pair_pool():
+    async def run():
+        ec = Ec()
+        ec.set_backend('ecdsa')
+        with pytest.raises(EcBackendNotFound):
+            ec.set_backend('unknown')
+
+        key_pair_a = await ec.key_pair()
+        key_pair_b = await ec.key_pair()
+        assert key_pair_a.public_key != key_pair_b.public_key
+
+        secret = await ec.ecdh(key_pair_a, key_pair_b.public_key)
+        assert secret == await ec.ecdh(key_pair_b, key_pair_a.public_key)
+        ec.pool.stop()
+
+    asyncio.get_event_loop().run_until_complete(run())
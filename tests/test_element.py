@@ -0,0 +1,80 @@
+from bluebees.client.mesh_layers.element import Element
+from bluebees.client.mesh_layers.mesh_context import SoftContext
+import asyncio
+
+
+def ctx_to(dst_addr: bytes) -> SoftContext:
+    return SoftContext(src_addr=b'\x00\x01', dst_addr=dst_addr, node_name='',
+                       network_name='', application_name='', is_devkey=True,
+                       ack_timeout=1, segment_timeout=1)
+
+
+def response_from(src_addr: bytes) -> SoftContext:
+    return SoftContext(src_addr=src_addr, dst_addr=b'\x00\x01', node_name='',
+                       network_name='', application_name='', is_devkey=True,
+                       ack_timeout=0, segment_timeout=0)
+
+
+def test_response_dispatch():
+    async def run():
+        element = Element()
+        dispatch_task = asyncio.ensure_future(element._dispatch_task())
+
+        recv_a = asyncio.ensure_future(element.recv_message(
+            opcode=b'\x80\x03', ctx=ctx_to(b'\x00\x20'), timeout=1))
+        recv_b = asyncio.ensure_future(element.recv_message(
+            opcode=b'\x80\x03', ctx=ctx_to(b'\x00\x21'), timeout=1))
+        recv_c = asyncio.ensure_future(element.recv_message(
+            opcode=b'\x80\x3e', ctx=ctx_to(b'\x00\x20'), timeout=.2))
+        await asyncio.sleep(0)
+
+        # response with unexpected opcode, response of b, response of a
+        await element.tr_layer.access_pdus.put((b'\x80\x19\x00',
+                                                response_from(b'\x00\x20')))
+        await element.tr_layer.access_pdus.put((b'\x80\x03\x0b',
+                                                response_from(b'\x00\x21')))
+        await element.tr_layer.access_pdus.put((b'\x80\x03\x0a',
+                                                response_from(b'\x00\x20')))
+
+        assert await recv_a == b'\x0a'
+        assert await recv_b == b'\x0b'
+        assert await recv_c is None
+        assert not element.response_waiters
+
+        dispatch_task.cancel()
+        for coro in element.client_tasks + element.all_tasks:
+            coro.close()
+        element.pub_sock.close()
+        element.sub_sock.close()
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+def test_segment_timeout_per_node():
+    async def run():
+        element = Element()
+        tr_layer = element.tr_layer
+
+        recv_a = asyncio.ensure_future(element.recv_message(
+            opcode=b'\x80\x03', ctx=ctx_to(b'\x00\x20'), segment_timeout=2,
+            timeout=.1))
+        recv_b = asyncio.ensure_future(element.recv_message(
+            opcode=b'\x80\x03', ctx=ctx_to(b'\x00\x21'), segment_timeout=5,
+            timeout=.1))
+        await asyncio.sleep(0)
+
+        # each node keeps its own timeout, the last request doesn't win
+        assert tr_layer._incomplete_timeout(b'\x00\x20') == 2
+        assert tr_layer._incomplete_timeout(b'\x00\x21') == 5
+        assert tr_layer._incomplete_timeout(b'\x00\x22') == \
+            tr_layer.incomplete_timeout
+
+        await asyncio.gather(recv_a, recv_b)
+        assert not tr_layer.expected_segments
+
+        for coro in element.client_tasks + element.all_tasks:
+            coro.close()
+        element.pub_sock.close()
+        element.sub_sock.close()
+
+    asyncio.get_event_loop().run_until_complete(run())
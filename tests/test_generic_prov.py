@@ -0,0 +1,49 @@
+from bluebees.client.node.generic_prov import GenericProvReassembler, \
+    GenericProvError
+from bluebees.common.utils import crc8
+import pytest
+
+
+def segments(pdu: bytes) -> list:
+    conts = [pdu[i:i + 23] for i in range(20, len(pdu), 23)]
+    return [pdu[0:20]] + conts
+
+
+def test_out_of_order_reassembly():
+    pdu = bytes(range(65))
+    segs = segments(pdu)
+    segn = len(segs) - 1
+    reassembler = GenericProvReassembler()
+
+    # continuations before the start, with a duplicate
+    assert reassembler.continuation(2, segs[2]) is None
+    assert reassembler.continuation(2, segs[2]) is None
+    assert reassembler.start(segn, len(pdu), crc8(pdu), segs[0]) is None
+    assert reassembler.bitmap == 0b101
+    assert reassembler.continuation(1, segs[1]) == pdu
+    assert reassembler.bitmap == 0 and reassembler.segn is None
+
+    # single segment
+    assert reassembler.start(0, 3, crc8(b'\x01\x02\x03'),
+                             b'\x01\x02\x03') == b'\x01\x02\x03'
+
+
+def test_reassembly_errors():
+    pdu = bytes(range(40))
+    segs = segments(pdu)
+    reassembler = GenericProvReassembler()
+
+    assert reassembler.start(1, len(pdu), crc8(pdu) ^ 0xff, segs[0]) is None
+    with pytest.raises(GenericProvError):
+        reassembler.continuation(1, segs[1])
+    assert reassembler.bitmap == 0
+
+    # index out of segn is discarded
+    assert reassembler.start(1, len(pdu), crc8(pdu), segs[0]) is None
+    assert reassembler.continuation(2, segs[1]) is None
+
+    # wrong total length
+    reassembler.reset()
+    reassembler.start(1, len(pdu) + 1, crc8(pdu), segs[0])
+    with pytest.raises(GenericProvError):
+        reassembler.continuation(1, segs[1])
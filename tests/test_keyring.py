@@ -0,0 +1,54 @@
+from bluebees.client.mesh_layers.keyring import NetworkKeyring
+from bluebees.client.network.network_data import NetworkData
+from bluebees.client.data_paths import base_dir, net_dir
+from bluebees.common.crypto import crypto
+from bluebees.common.file_index import FileIndex
+import pathlib
+import pytest
+
+
+def test_network_keyring():
+    key = bytes.fromhex('7dd7364cd842ad18c17c2b820c84c3d6')
+    data = NetworkData(name='test_keyring_net', key=key,
+                       key_index=b'\x00\x00', iv_index=bytes.fromhex('12345678'))
+    data.save()
+
+    expected = crypto.k2(key, b'\x00')
+    expected_nid = expected[0] & 0x7f
+
+    keyring = NetworkKeyring()
+    keyring.refresh(force=True)
+
+    candidates = keyring.search_by_nid(expected_nid)
+    names = [c.net_data.name for c in candidates]
+    assert 'test_keyring_net' in names
+
+    net_keys = keyring.search_by_name('test_keyring_net')
+    assert net_keys.nid == expected_nid
+    assert net_keys.encryption_key == expected[1:17]
+    assert net_keys.privacy_key == expected[17:33]
+
+    new_key = bytes.fromhex('f7a2a44f8e8a8029064f173ddc1e2b00')
+    data.key = new_key
+    data.save()
+    keyring.refresh(force=True)
+
+    net_keys = keyring.search_by_name('test_keyring_net')
+    assert net_keys.encryption_key == crypto.k2(new_key, b'\x00')[1:17]
+
+    pathlib.Path(base_dir + net_dir + 'test_keyring_net.yml').unlink()
+    keyring.refresh(force=True)
+
+    assert keyring.search_by_name('test_keyring_net') is None
+    names = [c.net_data.name for c in keyring.search_by_nid(expected_nid)]
+    assert 'test_keyring_net' not in names
+
+
+def test_file_index_abstract():
+    class NoDropIndex(FileIndex):
+
+        def _load_file(self, filename: str):
+            pass
+
+    with pytest.raises(TypeError):
+        NoDropIndex(dirpath=base_dir + net_dir)
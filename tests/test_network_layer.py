@@ -0,0 +1,67 @@
+from bluebees.client.mesh_layers.network_layer import NetworkLayer
+from bluebees.client.mesh_layers.mesh_context import SoftContext, NetworkMeta
+from bluebees.client.network.network_data import NetworkData
+from bluebees.client.node.node_data import NodeData, node_index
+from bluebees.client.data_paths import base_dir, net_dir, node_dir
+from Crypto.Random import get_random_bytes
+from dataclasses import FrozenInstanceError
+import asyncio
+import pathlib
+import pytest
+
+
+def test_loopback():
+    NetworkData(name='test_nl_net', key=get_random_bytes(16),
+                key_index=b'\x00\x00', iv_index=bytes.fromhex('12345679')).save()
+    NodeData(name='test_nl_node', addr=b'\x00\x30', network='test_nl_net',
+             device_uuid=get_random_bytes(16),
+             devkey=get_random_bytes(16)).save()
+    node_index.invalidate()
+
+    async def run():
+        send_queue = asyncio.Queue()
+        recv_queue = asyncio.Queue()
+        sender = NetworkLayer(send_queue=send_queue,
+                              recv_queue=asyncio.Queue())
+        receiver = NetworkLayer(send_queue=asyncio.Queue(),
+                                recv_queue=recv_queue)
+
+        ctx = SoftContext(src_addr=b'\x00\x30', dst_addr=b'\x00\x01',
+                          node_name='test_nl_node',
+                          network_name='test_nl_net', application_name='',
+                          is_devkey=True, ack_timeout=0, segment_timeout=0)
+        transport_pdu = bytes(range(16))
+        meta = sender.new_meta(ctx, False)
+        await sender.send_pdu(transport_pdu, ctx, meta)
+
+        msg_type, net_pdu = send_queue.get_nowait()
+        assert msg_type == b'message_s'
+        # ivi bit is the last bit of iv index
+        assert net_pdu[0] & 0x80 == 0x80
+
+        # the element receives a memoryview of zmq frame
+        recv_task = asyncio.ensure_future(receiver.recv_pdu())
+        await recv_queue.put((b'message', memoryview(net_pdu)))
+        pdu, r_ctx, r_meta = await asyncio.wait_for(
+            receiver.transport_pdus.get(), 1)
+        recv_task.cancel()
+
+        assert bytes(pdu) == transport_pdu
+        assert r_ctx.src_addr == b'\x00\x30'
+        assert r_ctx.dst_addr == b'\x00\x01'
+        assert r_ctx.node_name == 'test_nl_node'
+        assert r_meta == meta
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+def test_network_meta():
+    meta = NetworkMeta(seq=1, ttl=2, is_ctrl_msg=True)
+    with pytest.raises(FrozenInstanceError):
+        meta.seq = 2
+    assert not hasattr(meta, '__dict__')
+
+
+def test_cleanup():
+    pathlib.Path(base_dir + net_dir + 'test_nl_net.yml').unlink()
+    pathlib.Path(base_dir + node_dir + 'test_nl_node.yml').unlink()
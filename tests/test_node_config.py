@@ -0,0 +1,77 @@
+from bluebees.client.node.node_data import NodeData
+from bluebees.client.data_paths import base_dir, node_dir
+from Crypto.Random import get_random_bytes
+import importlib
+import asyncio
+import pathlib
+import pytest
+import click
+
+config_cmd = importlib.import_module('bluebees.client.node.commands.config')
+
+names = ['test_cfg_node0', 'test_cfg_node1', 'test_cfg_node2',
+         'test_cfg_other']
+
+
+def test_validate_names():
+    for x, name in enumerate(names):
+        NodeData(name=name, addr=bytes([0x7e, x]), network='test_net',
+                 device_uuid=get_random_bytes(16),
+                 devkey=get_random_bytes(16)).save()
+
+    targets = config_cmd.validate_names(None, None, ['test_cfg_node*',
+                                                     'test_cfg_node1',
+                                                     'test_cfg_oth?r'])
+    assert targets == names
+
+    with pytest.raises(click.BadParameter):
+        config_cmd.validate_names(None, None, ['test_cfg_none*'])
+
+
+def test_validate_targets_file(tmp_path):
+    targets_file = tmp_path / 'targets.txt'
+    targets_file.write_text('# nodes\ntest_cfg_node2\n\n'
+                            'test_cfg_node0  # first\n')
+    assert config_cmd.validate_targets_file(None, None, str(targets_file)) \
+        == ['test_cfg_node2', 'test_cfg_node0']
+
+    with pytest.raises(click.BadParameter):
+        config_cmd.validate_targets_file(None, None,
+                                         str(tmp_path / 'none.txt'))
+
+    targets_file.write_text('test_cfg_node0\ntest_cfg_unknown\n')
+    with pytest.raises(click.BadParameter):
+        config_cmd.validate_targets_file(None, None, str(targets_file))
+
+
+def test_config_nodes_task(monkeypatch):
+    running = []
+    max_running = []
+    positions = []
+
+    async def config_task(target, client_element, config, position=0):
+        assert position not in [p for _, p in running]
+        running.append((target, position))
+        max_running.append(len(running))
+        positions.append(position)
+        await asyncio.sleep(0.01)
+        running.remove((target, position))
+        if target == 'node5':
+            raise RuntimeError('fail')
+        return ''
+
+    monkeypatch.setattr(config_cmd, 'config_task', config_task)
+    targets = [f'node{x}' for x in range(20)]
+    results = asyncio.get_event_loop().run_until_complete(
+        config_cmd.config_nodes_task(targets, None, {}, 3))
+
+    assert max(max_running) == 3
+    assert set(positions) == {0, 1, 2}
+    assert list(results.keys()) == targets
+    assert results['node5'] == 'Unknown error [fail]'
+    assert not [e for t, e in results.items() if t != 'node5' and e]
+
+
+def test_cleanup():
+    for name in names:
+        pathlib.Path(base_dir + node_dir + name + '.yml').unlink()
@@ -1,5 +1,5 @@
 from bluebees.common.file import file_helper
-from bluebees.client.node.node_data import NodeData
+from bluebees.client.node.node_data import NodeData, NodeIndex
 from bluebees.client.data_paths import base_dir, node_dir
 from Crypto.Random import get_random_bytes
 import pathlib
@@ -33,5 +33,31 @@ def test_application_data():
     assert data == r_data
 
 
+def test_node_index():
+    index = NodeIndex()
+    data = NodeData(name='test_index_node', addr=b'\x7f\xf0',
+                    network='test_net', device_uuid=get_random_bytes(16),
+                    devkey=get_random_bytes(16))
+    data.save()
+    index.refresh(force=True)
+
+    assert index.search_by_addr(b'\x7f\xf0').name == 'test_index_node'
+    assert index.search_by_name('test_index_node').addr == b'\x7f\xf0'
+    assert b'\x7f\xf0' in index.addrs()
+
+    data.addr = b'\x7f\xf1'
+    data.save()
+    index.refresh(force=True)
+
+    assert index.search_by_addr(b'\x7f\xf0') is None
+    assert index.search_by_addr(b'\x7f\xf1').name == 'test_index_node'
+
+    pathlib.Path(base_dir + node_dir + 'test_index_node.yml').unlink()
+    index.refresh(force=True)
+
+    assert index.search_by_name('test_index_node') is None
+    assert b'\x7f\xf1' not in index.addrs()
+
+
 def test_cleanup():
     pathlib.Path(base_dir + node_dir + 'test_node.yml').unlink()
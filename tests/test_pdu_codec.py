@@ -0,0 +1,65 @@
+from bluebees.client.mesh_layers.pdu_codec import xor, pack_net_header, \
+    unpack_net_header, net_nonce, privacy_plaintext, pack_network_pdu, \
+    app_nonce, pack_unseg_header, pack_seg_header, unpack_seg_header, \
+    pack_segment_ack, unpack_segment_ack, split_access_pdu
+
+
+def test_xor():
+    a = bytes.fromhex('800000011201')
+    b = bytes.fromhex('6ca487507564ff')
+    assert xor(a, b) == bytes(x ^ y for x, y in zip(a, b))
+
+
+def test_net_header():
+    header = pack_net_header(True, 0, 1, b'\x12\x01')
+    assert header == bytes.fromhex('800000011201')
+    assert unpack_net_header(header) == (True, 0, 1, b'\x12\x01')
+
+    header = pack_net_header(False, 0x7f, 0xffffff, b'\x7f\xff')
+    assert unpack_net_header(header) == (False, 0x7f, 0xffffff, b'\x7f\xff')
+
+
+def test_nonces():
+    iv_index = bytes.fromhex('12345678')
+    assert net_nonce(True, 0, 1, b'\x12\x01', iv_index) == \
+        bytes.fromhex('00800000011201000012345678')
+    assert app_nonce(False, 0, 0x3129ab, b'\x00\x03', b'\x12\x01',
+                     iv_index) == \
+        bytes.fromhex('01003129ab0003120112345678')
+    assert app_nonce(True, 1, 7, b'\x00\x01', b'\x00\x20', iv_index) == \
+        bytes.fromhex('02800000070001002012345678')
+
+    assert privacy_plaintext(iv_index, bytes.fromhex('b5e5bfdacbaf6c')) == \
+        bytes.fromhex('000000000012345678b5e5bfdacbaf6c')
+
+
+def test_network_pdu():
+    pdu = pack_network_pdu(0, 0x68, bytes.fromhex('eca487516765'),
+                           bytes.fromhex('b5e5'), bytes.fromhex('bfdacbaf'),
+                           bytes.fromhex('6cb7fb5b'))
+    assert pdu == bytes.fromhex('68eca487516765b5e5bfdacbaf6cb7fb5b')
+    assert pack_network_pdu(1, 0x68, b'', b'', b'', b'') == b'\xe8'
+
+
+def test_transport_headers():
+    assert pack_unseg_header(1, 0x26) == b'\x66'
+    assert pack_unseg_header(0, 0) == b'\x00'
+
+    header = pack_seg_header(1, 0x26, 0, 0x1fff, 2, 3)
+    assert header[0] == 0xe6
+    assert unpack_seg_header(header + b'payload') == (1, 0x26, 0, 0x1fff, 2,
+                                                      3)
+    assert unpack_seg_header(pack_seg_header(0, 0, 1, 0x3a, 31, 31)) == \
+        (0, 0, 1, 0x3a, 31, 31)
+
+
+def test_segment_ack():
+    ack = pack_segment_ack(0x1fff, 0x00000003)
+    assert ack == bytes.fromhex('007ffc00000003')
+    assert unpack_segment_ack(ack) == (0x1fff, 3)
+
+
+def test_access_pdu():
+    assert split_access_pdu(b'\x00\x01\x02') == (b'\x00', b'\x01\x02')
+    assert split_access_pdu(b'\x80\x03\x00') == (b'\x80\x03', b'\x00')
+    assert split_access_pdu(b'\xc0\x59\x00\x01') == (b'\xc0\x59\x00', b'\x01')
@@ -0,0 +1,56 @@
+from bluebees.client.node.provisioning_manager import ProvisioningManager
+from bluebees.client.node.provisioner import Provisioner
+from Crypto.Random import get_random_bytes
+import asyncio
+
+
+def new_session(manager: ProvisioningManager) -> Provisioner:
+    device_link = manager._new_link()
+    prov = Provisioner(send_queue=manager.messages_to_send,
+                       recv_queue=asyncio.Queue(),
+                       device_uuid=get_random_bytes(16),
+                       netkey=get_random_bytes(16), key_index=b'\x00\x00',
+                       iv_index=bytes(4), address=b'\x00\x20',
+                       device_link=device_link)
+    manager.sessions[device_link] = prov
+    return prov
+
+
+def test_link_demux():
+    async def run():
+        manager = ProvisioningManager()
+        demux_task = asyncio.ensure_future(manager._demux_task())
+
+        prov_a = new_session(manager)
+        prov_b = new_session(manager)
+        link_a = prov_a.prov_ctx.device_link
+        link_b = prov_b.prov_ctx.device_link
+        assert link_a != link_b
+
+        await manager.messages_received.put((b'prov', link_a + b'\x00\x07'))
+        await manager.messages_received.put((b'prov', b'\xff' * 4 + b'\x01'))
+        await manager.messages_received.put((b'prov', link_b + b'\x80\x01'))
+        await manager.messages_received.put((b'prov', link_a + b'\x01\x01'))
+        await asyncio.sleep(.1)
+
+        assert prov_a.messages_received.get_nowait() == \
+            (b'prov', link_a + b'\x00\x07')
+        assert prov_a.messages_received.get_nowait() == \
+            (b'prov', link_a + b'\x01\x01')
+        assert prov_a.messages_received.empty()
+        assert prov_b.messages_received.get_nowait() == \
+            (b'prov', link_b + b'\x80\x01')
+        assert prov_b.messages_received.empty()
+
+        # the messages of all sessions are sent by the manager
+        await prov_a._open_link()
+        await prov_b._open_link()
+        assert manager.messages_to_send.qsize() == 2
+
+        demux_task.cancel()
+        for coro in manager.client_tasks + manager.all_tasks:
+            coro.close()
+        manager.pub_sock.close()
+        manager.sub_sock.close()
+
+    asyncio.get_event_loop().run_until_complete(run())
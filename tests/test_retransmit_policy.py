@@ -0,0 +1,61 @@
+from bluebees.client.node.retransmit_policy import RetransmitPolicy
+from bluebees.client.node.provisioner import Provisioner
+from bluebees.common.utils import crc8
+from Crypto.Random import get_random_bytes
+import asyncio
+import pytest
+
+
+def test_policy_timeouts():
+    policy = RetransmitPolicy(total_timeout=10, max_timeout=4.0,
+                              initial_timeout=3.0)
+    assert list(policy.timeouts()) == [3.0, 4.0, 3.0]
+
+    # fast device, measured on link ack
+    policy.sample(.08)
+    timeouts = policy.timeouts()
+    assert next(timeouts) == pytest.approx(.24)
+    assert next(timeouts) == pytest.approx(.48)
+    assert next(timeouts) == pytest.approx(.96)
+
+    # the third try was acked, the backoff is kept until the next sample
+    assert next(policy.timeouts()) == pytest.approx(.96)
+    policy.sample(.08)
+    assert next(policy.timeouts()) < .48
+    assert policy.repeat_delay() < .3
+
+
+def test_ack_retransmission():
+    async def run():
+        device_link = get_random_bytes(4)
+        send_queue = asyncio.Queue()
+        recv_queue = asyncio.Queue()
+        prov = Provisioner(send_queue=send_queue, recv_queue=recv_queue,
+                           device_uuid=get_random_bytes(16),
+                           netkey=get_random_bytes(16),
+                           key_index=b'\x00\x00', iv_index=bytes(4),
+                           address=b'\x00\x20', device_link=device_link)
+        prov.prov_ctx.node_tr_number = 0x81
+
+        capabilities = b'\x01' + bytes(11)
+        start_pdu = b'\x00' + len(capabilities).to_bytes(2, 'big') + \
+            crc8(capabilities).to_bytes(1, 'big') + capabilities
+
+        # device retransmits the last transaction, sends the next one and
+        #   acks the invite
+        await recv_queue.put((b'prov', device_link + b'\x80\x00\x00\x01'))
+        await recv_queue.put((b'prov', device_link + b'\x81' + start_pdu))
+        await recv_queue.put((b'prov', device_link + b'\x00\x01'))
+
+        assert await prov._send_pdu('invite', prov._mount_invite_pdu)
+        assert prov.prov_ctx.client_tr_number == 0x01
+        assert send_queue.get_nowait()[1][4:5] == b'\x00'
+        assert send_queue.get_nowait()[1] == device_link + b'\x80\x01'
+        assert prov.early_pdu == capabilities
+
+        assert await prov._wait_pdu('capabilities',
+                                    prov._check_capabilities_pdu)
+        assert send_queue.get_nowait()[1] == device_link + b'\x81\x01'
+        assert prov.prov_ctx.node_tr_number == 0x82
+
+    asyncio.get_event_loop().run_until_complete(run())
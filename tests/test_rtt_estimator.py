@@ -0,0 +1,87 @@
+from bluebees.client.mesh_layers.rtt_estimator import RttEstimator, RttTable, \
+    INITIAL_RTO, MIN_RTO, MAX_RTO
+from bluebees.client.node.node_data import NodeData, node_index
+from bluebees.client.data_paths import base_dir, node_dir
+from Crypto.Random import get_random_bytes
+import pathlib
+
+
+def test_rtt_estimator():
+    estimator = RttEstimator()
+    assert estimator.rto() == INITIAL_RTO
+
+    estimator.update(1.0)
+    assert estimator.srtt == 1.0
+    assert estimator.rttvar == 0.5
+    assert estimator.rto() == 3.0
+
+    estimator.update(0.2)
+    assert estimator.srtt == 0.9
+    assert estimator.rttvar == 0.575
+
+    # fast and stable node
+    for _ in range(50):
+        estimator.update(0.05)
+    assert estimator.rto() == MIN_RTO
+
+    estimator.timeout()
+    estimator.timeout()
+    assert estimator.backoff == 4
+    estimator.update(0.05)
+    assert estimator.backoff == 1
+
+    # slow node
+    for _ in range(50):
+        estimator.update(20.0)
+    assert estimator.rto() == MAX_RTO
+    estimator.timeout()
+    assert estimator.rto() == MAX_RTO
+
+
+def test_rtt_table():
+    name = 'test_rtt_node'
+    filename = base_dir + node_dir + name + '.yml'
+    NodeData(name=name, addr=b'\x00\x30', network='test_net',
+             device_uuid=get_random_bytes(16),
+             devkey=get_random_bytes(16), seq=5).save()
+    node_index.invalidate()
+
+    table = RttTable()
+    assert table.estimator(b'\x00\x30').srtt is None
+    table.update(b'\x00\x30', 0.4)
+
+    # kept in memory until the flush
+    assert NodeData.load(filename).srtt is None
+    table.flush()
+    node_data = NodeData.load(filename)
+    assert node_data.srtt == 0.4
+    assert node_data.rttvar == 0.2
+    assert node_data.seq == 5
+
+    # small changes aren't saved
+    table.update(b'\x00\x30', 0.42)
+    table.flush()
+    assert NodeData.load(filename).srtt == 0.4
+    table.update(b'\x00\x30', 2.0)
+    table.flush()
+    assert NodeData.load(filename).srtt == round(table.estimator(
+        b'\x00\x30').srtt, 4)
+
+    # saved in batch, after the flush interval
+    table.flush_interval = 0
+    table.update(b'\x00\x30', 0.1)
+    assert NodeData.load(filename).srtt == round(table.estimator(
+        b'\x00\x30').srtt, 4)
+
+    # the rtt is loaded from the node file
+    node_index.invalidate()
+    assert RttTable().estimator(b'\x00\x30').srtt == \
+        NodeData.load(filename).srtt
+
+    # group address, only in memory
+    table.update(b'\xc0\x00', 0.4)
+    assert table.estimator(b'\xc0\x00').srtt == 0.4
+
+
+def test_cleanup():
+    pathlib.Path(base_dir + node_dir + 'test_rtt_node.yml').unlink()
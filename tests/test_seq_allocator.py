@@ -0,0 +1,63 @@
+from bluebees.client.mesh_layers.seq_allocator import SeqAllocator
+from bluebees.client.node.node_data import NodeData, node_index
+from bluebees.client.data_paths import base_dir, node_dir
+from Crypto.Random import get_random_bytes
+import pathlib
+
+
+def test_seq_allocator():
+    name = 'test_seq_node'
+    filename = base_dir + node_dir + name + '.yml'
+    data = NodeData(name=name, addr=b'\x00\x10', network='test_net',
+                    device_uuid=get_random_bytes(16),
+                    devkey=get_random_bytes(16), seq=10)
+    data.save()
+
+    allocator = SeqAllocator(block_size=4)
+
+    assert allocator.current(name) == 10
+    assert [allocator.allocate(name) for _ in range(4)] == [10, 11, 12, 13]
+    assert NodeData.load(filename).seq == 14
+
+    assert allocator.allocate(name) == 14
+    assert NodeData.load(filename).seq == 18
+
+    allocator.observe(name, 16)
+    assert allocator.allocate(name) == 16
+    allocator.observe(name, 2)
+    assert allocator.allocate(name) == 17
+
+    # crash recovery: restart on the next reserved block
+    allocator = SeqAllocator(block_size=4)
+    assert allocator.allocate(name) == 18
+    assert NodeData.load(filename).seq == 22
+
+    # the observed seq is persisted only on the next reserve
+    allocator = SeqAllocator(block_size=4)
+    allocator.observe(name, 30)
+    assert NodeData.load(filename).seq == 22
+    assert allocator.allocate(name) == 30
+    assert NodeData.load(filename).seq == 34
+
+
+def test_seq_allocator_shared_node():
+    name = 'test_seq_node'
+    filename = base_dir + node_dir + name + '.yml'
+    node_index.invalidate()
+
+    # the daemon and a command running without it
+    daemon = SeqAllocator(block_size=4)
+    command = SeqAllocator(block_size=4)
+    start = daemon.allocate(name)
+    assert command.allocate(name) == start + 4
+    assert NodeData.load(filename).seq == start + 8
+
+    # the daemon moves to a block after the block of command
+    node_index.invalidate()
+    assert daemon.allocate(name) == start + 8
+    assert daemon.allocate(name) == start + 9
+    assert NodeData.load(filename).seq == start + 12
+
+
+def test_cleanup():
+    pathlib.Path(base_dir + node_dir + 'test_seq_node.yml').unlink()
@@ -0,0 +1,127 @@
+from bluebees.common.storage import storage, YamlStorage, SqliteStorage, \
+                                    StorageError
+from bluebees.client.core.commands.storage import migrate
+from bluebees.client.node.node_data import NodeData, NodeIndex, \
+                                           node_name_list
+from bluebees.client.network.network_data import NetworkData, \
+                                                 net_key_index_list
+from bluebees.client.node.group_data import GroupData, find_group_by_addr
+from bluebees.client.data_paths import base_dir, node_dir, net_dir
+from bluebees.common.crypto import crypto
+from Crypto.Random import get_random_bytes
+import pathlib
+from dataclasses import asdict
+import pytest
+
+
+@pytest.fixture
+def sqlite_storage(tmp_path):
+    backend = SqliteStorage(str(tmp_path / 'bluebees.db'))
+    storage.use(backend)
+    yield backend
+    storage.use(YamlStorage())
+    backend.close()
+
+
+def node(name: str, addr: bytes) -> NodeData:
+    return NodeData(name=name, addr=addr, network='test_net',
+                    device_uuid=get_random_bytes(16),
+                    devkey=get_random_bytes(16), apps=['test_app'])
+
+
+def test_sqlite_round_trip(sqlite_storage):
+    data = node('test_sql_node', b'\x01\x02')
+    data.save()
+
+    assert NodeData.load(base_dir + node_dir + 'test_sql_node.yml') == data
+    assert node_name_list() == ['test_sql_node']
+
+    net = NetworkData(name='test_sql_net', key=get_random_bytes(16),
+                      key_index=b'\x01\x23', iv_index=bytes(4))
+    net.save()
+    assert net_key_index_list() == [b'\x01\x23']
+    assert NetworkData.find(base_dir + net_dir, 'nid',
+                            net.index_columns()['nid']) == [net]
+
+    with pytest.raises(StorageError):
+        NodeData.find(base_dir + node_dir, 'devkey', data.devkey)
+
+
+def test_sqlite_indexed_find(sqlite_storage):
+    with storage.transaction():
+        for x in range(5000):
+            node(f'test_sql_node{x}', x.to_bytes(2, 'big')).save()
+
+    found = NodeData.find(base_dir + node_dir, 'addr', (4321).to_bytes(2,
+                                                                       'big'))
+    assert [n.name for n in found] == ['test_sql_node4321']
+
+    group = GroupData(name='test_sql_group', addr=b'\xc0\x01',
+                      sub_addrs=[b'\x00\x01'])
+    group.save()
+    assert find_group_by_addr(b'\xc0\x01') == group
+    assert find_group_by_addr(b'\xc0\x02') is None
+
+
+def test_sqlite_transaction(sqlite_storage):
+    data = node('test_sql_node', b'\x01\x02')
+    data.save()
+
+    with pytest.raises(RuntimeError):
+        with storage.transaction():
+            data.seq = 100
+            data.save()
+            with storage.transaction():
+                node('test_sql_node2', b'\x01\x03').save()
+            raise RuntimeError
+
+    assert NodeData.load(base_dir + node_dir + 'test_sql_node.yml').seq == 0
+    assert node_name_list() == ['test_sql_node']
+
+
+def test_sqlite_node_index(sqlite_storage):
+    index = NodeIndex()
+    data = node('test_sql_node', b'\x01\x02')
+    data.save()
+    index.refresh(force=True)
+    assert index.search_by_addr(b'\x01\x02').name == 'test_sql_node'
+
+    data.addr = b'\x01\x03'
+    data.save()
+    index.refresh(force=True)
+    assert index.search_by_addr(b'\x01\x02') is None
+    assert index.search_by_name('test_sql_node').addr == b'\x01\x03'
+
+
+def test_migrate(tmp_path):
+    base = str(tmp_path) + '/'
+    yaml = YamlStorage()
+    nodes = [node(f'test_node{x}', bytes([0, x])) for x in range(1, 4)]
+    for data in nodes:
+        yaml.write(base + node_dir + data.name + '.yml', asdict(data))
+
+    sqlite = SqliteStorage(str(tmp_path / 'bluebees.db'))
+    assert migrate(yaml, sqlite, base=base) == 3
+    assert sqlite.find(base + node_dir, 'addr', b'\x00\x02') == \
+        ['test_node2.yml']
+
+    export_base = str(tmp_path / 'export') + '/'
+    sqlite.write(export_base + node_dir + 'test_node1.yml', asdict(nodes[0]))
+    assert migrate(sqlite, yaml, base=export_base) == 1
+    assert NodeData(**yaml.read(export_base + node_dir + 'test_node1.yml')) \
+        == nodes[0]
+    sqlite.close()
+
+
+def test_yaml_skips_derived_columns(monkeypatch):
+    def k2(*args, **kwargs):
+        raise AssertionError('k2 computed on YAML storage')
+
+    monkeypatch.setattr(crypto, 'k2', k2)
+    net = NetworkData(name='test_yaml_net', key=get_random_bytes(16),
+                      key_index=b'\x04\x56', iv_index=bytes(4))
+    net.save()
+    assert b'\x04\x56' in net_key_index_list()
+    assert NetworkData.find(base_dir + net_dir, 'key_index',
+                            b'\x04\x56') == [net]
+    pathlib.Path(base_dir + net_dir + 'test_yaml_net.yml').unlink()
@@ -0,0 +1,237 @@
+from bluebees.client.mesh_layers.transport_layer import TransportLayer, \
+    ack_interval
+from bluebees.client.mesh_layers.mesh_context import SoftContext, NetworkMeta
+from bluebees.client.network.network_data import NetworkData
+from bluebees.client.node.node_data import NodeData, node_index
+from bluebees.client.application.application_data import ApplicationData
+from bluebees.client.data_paths import base_dir, net_dir, node_dir, app_dir
+from bluebees.common.crypto import crypto
+from Crypto.Random import get_random_bytes
+import asyncio
+import pathlib
+
+
+def node_ctx(name: str, addr: bytes) -> SoftContext:
+    return SoftContext(src_addr=addr, dst_addr=b'\x00\x01', node_name=name,
+                       network_name='test_tr_net', application_name='',
+                       is_devkey=True, ack_timeout=1, segment_timeout=1)
+
+
+def segments_from_node(sender: TransportLayer, ctx: SoftContext,
+                       access_pdu: bytes) -> list:
+    seq = sender.net_layer.seq_allocator.allocate(ctx.node_name)
+    crypt_access_pdu = sender._encrypt_access_pdu(access_pdu, ctx, seq)
+    segments = sender._segmented_transport_pdu(crypt_access_pdu, ctx, seq)
+    return [(seg, seq + i) for i, seg in enumerate(segments)]
+
+
+def test_concurrent_reassembly():
+    NetworkData(name='test_tr_net', key=get_random_bytes(16),
+                key_index=b'\x00\x00', iv_index=bytes(4)).save()
+    NodeData(name='test_tr_node0', addr=b'\x00\x20', network='test_tr_net',
+             device_uuid=get_random_bytes(16),
+             devkey=get_random_bytes(16)).save()
+    NodeData(name='test_tr_node1', addr=b'\x00\x21', network='test_tr_net',
+             device_uuid=get_random_bytes(16),
+             devkey=get_random_bytes(16)).save()
+    node_index.invalidate()
+
+    async def run():
+        sender = TransportLayer(send_queue=asyncio.Queue(),
+                                recv_queue=asyncio.Queue())
+        receiver_queue = asyncio.Queue()
+        receiver = TransportLayer(send_queue=receiver_queue,
+                                  recv_queue=asyncio.Queue())
+        receiver.local_addrs.add(b'\x00\x01')
+
+        ctx0 = node_ctx('test_tr_node0', b'\x00\x20')
+        ctx1 = node_ctx('test_tr_node1', b'\x00\x21')
+        pdu0 = b'\x80\x03' + bytes(range(30))
+        pdu1 = b'\x80\x3e' + bytes(range(40))
+        segs0 = segments_from_node(sender, ctx0, pdu0)
+        segs1 = segments_from_node(sender, ctx1, pdu1)
+        assert len(segs0) > 1 and len(segs1) > 1
+
+        # interleaved and out of order segments of two nodes
+        interleaved = []
+        for i in reversed(range(max(len(segs0), len(segs1)))):
+            for (ctx, segs) in [(ctx0, segs0), (ctx1, segs1)]:
+                if i < len(segs):
+                    interleaved.append((ctx, segs[i]))
+
+        recv_task = asyncio.ensure_future(receiver.recv_task())
+        for ctx, (seg, seq) in interleaved:
+            r_ctx = SoftContext(src_addr=ctx.src_addr, dst_addr=b'\x00\x01',
+                                node_name=ctx.node_name,
+                                network_name=ctx.network_name,
+                                application_name='', is_devkey=False,
+                                ack_timeout=0, segment_timeout=0)
+            meta = NetworkMeta(seq=seq, ttl=2, is_ctrl_msg=False)
+            await receiver.net_layer.transport_pdus.put((seg, r_ctx, meta))
+
+        results = {}
+        for _ in range(2):
+            access_pdu, r_ctx = await asyncio.wait_for(
+                receiver.access_pdus.get(), 1)
+            results[r_ctx.src_addr] = access_pdu
+        recv_task.cancel()
+
+        assert results[b'\x00\x20'] == pdu0
+        assert results[b'\x00\x21'] == pdu1
+        assert not receiver.reassembly_ctxs
+        # one block ack was sent to each node
+        assert receiver_queue.qsize() == 2
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+def test_ack_timer():
+    async def run():
+        sender = TransportLayer(send_queue=asyncio.Queue(),
+                                recv_queue=asyncio.Queue())
+        receiver_queue = asyncio.Queue()
+        receiver = TransportLayer(send_queue=receiver_queue,
+                                  recv_queue=asyncio.Queue())
+        receiver.local_addrs.add(b'\x00\x01')
+
+        ctx = node_ctx('test_tr_node0', b'\x00\x20')
+        segs = segments_from_node(sender, ctx, b'\x80\x03' + bytes(range(30)))
+        r_ctx = SoftContext(src_addr=ctx.src_addr, dst_addr=b'\x00\x01',
+                            node_name=ctx.node_name,
+                            network_name=ctx.network_name,
+                            application_name='', is_devkey=False,
+                            ack_timeout=0, segment_timeout=0)
+
+        # the last segment is lost
+        for seg, seq in segs[:-1]:
+            meta = NetworkMeta(seq=seq, ttl=2, is_ctrl_msg=False)
+            await receiver._recv_segment(seg, r_ctx, meta)
+        assert receiver_queue.empty()
+
+        # the received segments are acked together, when the timer expires
+        await asyncio.sleep(ack_interval(2) + 0.05)
+        assert receiver_queue.qsize() == 1
+        key = next(iter(receiver.reassembly_ctxs))
+        assert receiver.reassembly_ctxs[key].ack_timer is None
+
+        seg, seq = segs[-1]
+        meta = NetworkMeta(seq=seq, ttl=2, is_ctrl_msg=False)
+        await receiver._recv_segment(seg, r_ctx, meta)
+        assert receiver_queue.qsize() == 2
+        assert receiver.access_pdus.qsize() == 1
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+def test_incomplete_timer():
+    async def run():
+        sender = TransportLayer(send_queue=asyncio.Queue(),
+                                recv_queue=asyncio.Queue())
+        receiver = TransportLayer(send_queue=asyncio.Queue(),
+                                  recv_queue=asyncio.Queue())
+        receiver.incomplete_timeout = 0.2
+
+        ctx = node_ctx('test_tr_node0', b'\x00\x20')
+        segs = segments_from_node(sender, ctx, b'\x80\x03' + bytes(range(40)))
+        assert len(segs) > 2
+        r_ctx = SoftContext(src_addr=ctx.src_addr, dst_addr=b'\x00\x01',
+                            node_name=ctx.node_name,
+                            network_name=ctx.network_name,
+                            application_name='', is_devkey=False,
+                            ack_timeout=0, segment_timeout=0)
+
+        # slow but progressing transfer, longer than the incomplete timeout
+        for seg, seq in segs[:-1]:
+            meta = NetworkMeta(seq=seq, ttl=2, is_ctrl_msg=False)
+            await receiver._recv_segment(seg, r_ctx, meta)
+            await asyncio.sleep(0.15)
+        assert len(receiver.reassembly_ctxs) == 1
+
+        # the transfer stalls
+        await asyncio.sleep(0.1)
+        assert not receiver.reassembly_ctxs
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+def test_selective_retransmission():
+    async def run():
+        sender = TransportLayer(send_queue=asyncio.Queue(),
+                                recv_queue=asyncio.Queue())
+        sender.max_retransmissions = 2
+        resent = []
+
+        async def send_segments(soft_ctx, segments, ack_bits):
+            resent.append(ack_bits)
+
+        sender._send_segments = send_segments
+        ctx = node_ctx('test_tr_node0', b'\x00\x20')
+        segments = [b'\x00', b'\x01', b'\x02', b'\x03']
+
+        # partial ack, only the missing segments are resent
+        block_acks = asyncio.Queue()
+        block_acks.put_nowait(0b0101)
+        block_acks.put_nowait(0b1010)
+        assert await sender._wait_ack(ctx, segments, block_acks)
+        assert resent == [0b0101]
+
+        # without acks, gives up after the retransmissions
+        resent.clear()
+        assert not await sender._wait_ack(ctx, segments, asyncio.Queue())
+        assert resent == [0, 0]
+
+        # the receiver cancelled the message
+        block_acks.put_nowait(0)
+        assert not await sender._wait_ack(ctx, segments, block_acks)
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+def test_aid_collision():
+    # two application keys with same aid
+    aids = {}
+    while True:
+        key = get_random_bytes(16)
+        aid = crypto.k4(n=key)[0] & 0x3f
+        if aid in aids:
+            break
+        aids[aid] = key
+    ApplicationData(name='test_tr_app0', key=aids[aid], key_index=b'\x00\x01',
+                    network='test_tr_net').save()
+    ApplicationData(name='test_tr_app1', key=key, key_index=b'\x00\x02',
+                    network='test_tr_net').save()
+
+    async def run():
+        sender = TransportLayer(send_queue=asyncio.Queue(),
+                                recv_queue=asyncio.Queue())
+        receiver = TransportLayer(send_queue=asyncio.Queue(),
+                                  recv_queue=asyncio.Queue())
+        assert len(receiver.app_keyring.search_by_aid(aid)) == 2
+
+        ctx = node_ctx('test_tr_node0', b'\x00\x20')
+        ctx.is_devkey = False
+        ctx.application_name = 'test_tr_app1'
+        seq = sender.net_layer.seq_allocator.allocate(ctx.node_name)
+        pdu = sender._unsegmented_transport_pdu(
+            sender._encrypt_access_pdu(b'\x82\x04\x01', ctx, seq), ctx)
+
+        r_ctx = SoftContext(src_addr=ctx.src_addr, dst_addr=b'\x00\x01',
+                            node_name=ctx.node_name,
+                            network_name=ctx.network_name,
+                            application_name='', is_devkey=True,
+                            ack_timeout=0, segment_timeout=0)
+        await receiver._recv_unsegmented_pdu(pdu, r_ctx, seq)
+
+        access_pdu, r_ctx = receiver.access_pdus.get_nowait()
+        assert access_pdu == b'\x82\x04\x01'
+        assert r_ctx.application_name == 'test_tr_app1'
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+def test_cleanup():
+    pathlib.Path(base_dir + net_dir + 'test_tr_net.yml').unlink()
+    pathlib.Path(base_dir + node_dir + 'test_tr_node0.yml').unlink()
+    pathlib.Path(base_dir + node_dir + 'test_tr_node1.yml').unlink()
+    pathlib.Path(base_dir + app_dir + 'test_tr_app0.yml').unlink()
+    pathlib.Path(base_dir + app_dir + 'test_tr_app1.yml').unlink()